@@ -341,7 +341,8 @@ class ConnectedGlobalMapMap
         this.client.onmessage = (message) => {
             try {
                 let data = JSON.parse(message.data);
-                this.handlePositions([data])
+                // The server sends a list with the current traffic when the location changes, and then single positions
+                this.handlePositions(Array.isArray(data) ? data : [data])
             } catch (e) {
                 console.log(e)
                 console.log(message.data)
@@ -65,6 +65,8 @@ export class ConnectedNavigationTask extends Component {
         this.timeout = 1000
         this.tracklist = []
         this.waitingInitialLoading = {}
+        // The latest score sequence number received for each contestant, used to ask for missed score updates
+        this.scoreSequences = {}
         this.remainingTracks = 999999
         this.renderedTracks = []
         this.lastTimeReceived = null
@@ -87,6 +89,35 @@ export class ConnectedNavigationTask extends Component {
         if (!this.client || this.client.readyState === WebSocket.CLOSED) this.initiateSession(); //check if websocket instance is closed, if so call `connect` function.
     };
 
+    messageData(message) {
+        // The message data is encoded as part of the message, but older servers encoded it as a separate JSON string
+        return typeof message.data === "string" ? JSON.parse(message.data) : message.data
+    }
+
+    requestScoresSince(sequences) {
+        if (Object.keys(sequences).length > 0 && this.client && this.client.readyState === WebSocket.OPEN) {
+            this.client.send(JSON.stringify({type: "score_since", contestants: sequences}))
+        }
+    }
+
+    /**
+     * Keeps track of the score sequence number of the contestant. Returns false if the data is a score delta that does
+     * not follow directly after the data we already have. In that case the missing entries are requested from the
+     * server, and the score part of the delta must be discarded.
+     */
+    updateScoreSequence(trackData) {
+        if (trackData.sequence === undefined) {
+            return true
+        }
+        const known = this.scoreSequences[trackData.contestant_id]
+        if (trackData.delta && known !== undefined && trackData.previous_sequence !== known) {
+            this.requestScoresSince({[trackData.contestant_id]: known})
+            return false
+        }
+        this.scoreSequences[trackData.contestant_id] = trackData.sequence
+        return true
+    }
+
     cacheDataWhileLoading(contestantId, data) {
         if (this.waitingInitialLoading[contestantId] !== undefined) {
             this.waitingInitialLoading[contestantId].push(data)
@@ -107,6 +138,8 @@ export class ConnectedNavigationTask extends Component {
             this.checkReceivedTimeInterval = setInterval(() => this.checkReceivedTime(), 5000)
             console.log("Client connected")
             clearTimeout(this.connectInterval)
+            // Fetch any score updates we have missed while disconnected
+            this.requestScoresSince(this.scoreSequences)
         };
         this.client.onmessage = (message) => {
             let data = JSON.parse(message.data);
@@ -115,14 +148,21 @@ export class ConnectedNavigationTask extends Component {
                 this.lastTimeReceived = new Date()
             } else if (data.type === "contestant" && this.props.contestantIds.length === 0) {
                 // Do not add new contestants if we are filtering contestant IDs
-                this.props.dispatchNewContestant(JSON.parse(data.data))
+                this.props.dispatchNewContestant(this.messageData(data))
             } else if (data.type === "contestant_delete") {
-                this.props.dispatchDeleteContestant(JSON.parse(data.data))
+                const deleteData = this.messageData(data)
+                delete this.scoreSequences[deleteData.contestant_id]
+                this.props.dispatchDeleteContestant(deleteData)
             } else {
-                const trackData = JSON.parse(data.data)
+                const trackData = this.messageData(data)
                 if (this.waitingInitialLoading[trackData.contestant_id] !== undefined) {
                     this.cacheDataWhileLoading(trackData.contestant_id, trackData)
                 } else {
+                    if (!this.updateScoreSequence(trackData)) {
+                        delete trackData.annotations
+                        delete trackData.score_log_entries
+                        delete trackData.sequence
+                    }
                     this.props.dispatchContestantData(trackData)
                 }
             }
@@ -198,6 +238,9 @@ export class ConnectedNavigationTask extends Component {
                 if (!this.renderedTracks.includes(key)) {
                     this.renderedTracks.push(key)
                     console.log(value)
+                    if (value.sequence !== undefined) {
+                        this.scoreSequences[key] = value.sequence
+                    }
                     this.props.dispatchContestantData(value)
                     if (this.waitingInitialLoading[key] !== undefined) {
                         // for(let p of this.waitingInitialLoading[key]){
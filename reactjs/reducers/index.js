@@ -105,7 +105,9 @@ function emptyContestantData() {
         latest_time: "1970-01-01T00:00:00Z",
         positions: [],
         annotations: [],
+        all_annotations: [],
         log_entries: [],
+        score_sequence: null,
         playing_cards: [],
         gate_scores: [],
         more_data: true,
@@ -221,15 +223,30 @@ function rootReducer(state = initialState, action) {
         if (state.contestants[action.payload.contestant_id] === undefined) {
             return state
         }
+        const previousData = state.contestantData[action.payload.contestant_id]
+        // Score deltas only contain the annotations and log entries created since the previous sequence number, and
+        // are appended to what we already have. Annotations are only passed on to the renderer when they change.
+        let annotations = undefined
+        let allAnnotations = previousData.all_annotations || []
+        if (action.payload.annotations !== undefined) {
+            allAnnotations = action.payload.delta ? allAnnotations.concat(action.payload.annotations) : action.payload.annotations
+            annotations = allAnnotations
+        }
+        let logEntries = previousData.log_entries
+        if (action.payload.score_log_entries !== undefined) {
+            logEntries = action.payload.delta ? (logEntries || []).concat(action.payload.score_log_entries) : action.payload.score_log_entries
+        }
         return {
             ...state,
             contestantData: {
                 ...state.contestantData,
                 [action.payload.contestant_id]: {
-                    annotations: action.payload.annotations,
+                    annotations: annotations,
+                    all_annotations: allAnnotations,
                     positions: action.payload.positions,
 
-                    log_entries: action.payload.score_log_entries !== undefined ? action.payload.score_log_entries : state.contestantData[action.payload.contestant_id].log_entries,
+                    log_entries: logEntries,
+                    score_sequence: action.payload.sequence !== undefined ? action.payload.sequence : previousData.score_sequence,
                     gate_scores: action.payload.gate_scores !== undefined ? action.payload.gate_scores : state.contestantData[action.payload.contestant_id].gate_scores,
                     playing_cards: action.payload.playing_cards !== undefined ? action.payload.playing_cards : state.contestantData[action.payload.contestant_id].playing_cards,
                     latest_position_time: action.payload.positions !== undefined && action.payload.positions.length > 0 ? new Date(action.payload.positions.slice(-1)[0].time) : null,
@@ -7,16 +7,20 @@ import sys
 
 from django.core.exceptions import ObjectDoesNotExist
 
+from utilities.startup_timer import StartupTimer
 
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
+    startup_timer = StartupTimer(f"Calculator job {sys.argv[1]}")
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "live_tracking_map.settings")
     import django
 
-    django.setup()
+    with startup_timer.phase("django setup"):
+        django.setup()
 from display.models import Contestant
 from display.calculators.contestant_processor import ContestantProcessor
+from display.utilities.metrics import start_metrics_server
 
 if __name__ == "__main__":
     contestant_pk = sys.argv[1]
@@ -26,7 +30,8 @@ if __name__ == "__main__":
         # Contestant has been deleted, gracefully terminate
         sys.exit(0)
     if not contestant.contestanttrack.calculator_finished:
-        contestant_processor = ContestantProcessor(contestant, live_processing=True)
+        start_metrics_server()
+        contestant_processor = ContestantProcessor(contestant, live_processing=True, startup_timer=startup_timer)
         contestant_processor.run()
     else:
         logger.warning(
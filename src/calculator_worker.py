@@ -0,0 +1,34 @@
+"""
+This script is run by the calculator worker stateful set to run calculators for all contestants that are assigned to the
+worker. The worker index is given as the first argument, or taken from the ordinal suffix of the host name
+(e.g. tracker-calculator-worker-3) when running in kubernetes.
+"""
+import logging
+import os
+import socket
+import sys
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "live_tracking_map.settings")
+    import django
+
+    django.setup()
+
+from live_tracking_map import settings
+from display.calculators.calculator_worker import CalculatorWorker
+from display.utilities.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        worker_index = int(sys.argv[1])
+    else:
+        worker_index = int(socket.gethostname().rsplit("-", 1)[-1])
+    if not 0 <= worker_index < settings.CALCULATOR_WORKERS:
+        logger.error(
+            f"Calculator worker index {worker_index} is outside the {settings.CALCULATOR_WORKERS} configured workers"
+        )
+        sys.exit(1)
+    start_metrics_server()
+    CalculatorWorker(worker_index, settings.CALCULATOR_WORKER_MAX_CALCULATORS).run()
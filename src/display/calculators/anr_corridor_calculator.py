@@ -1,13 +1,14 @@
 import datetime
 from multiprocessing import Queue
 
-import matplotlib.pyplot as plt
 import logging
 from typing import List, Optional, Tuple
 import numpy as np
+from django.conf import settings
 from shapely.geometry import Polygon
 
 from display.calculators.calculator import Calculator
+from display.calculators.contestant_track_state import ContestantTrackState
 from display.calculators.calculator_utilities import PolygonHelper, get_shortest_intersection_time
 from display.calculators.positions_and_gates import Position, Gate
 from display.calculators.update_score_message import UpdateScoreMessage
@@ -44,8 +45,9 @@ class AnrCorridorCalculator(Calculator):
         gates: List["Gate"],
         route: "Route",
         score_processing_queue: Queue,
+        track_state: Optional["ContestantTrackState"] = None,
     ):
-        super().__init__(contestant, scorecard, gates, route, score_processing_queue)
+        super().__init__(contestant, scorecard, gates, route, score_processing_queue, track_state)
         self.corridor_state = self.INSIDE_CORRIDOR
         self.previous_corridor_state = self.INSIDE_CORRIDOR
         self.crossed_outside_time = None
@@ -61,7 +63,8 @@ class AnrCorridorCalculator(Calculator):
         self.track_polygon = self.build_polygon()
         self.existing_reference = None
         self.accumulated_score = 0
-        self.plot_polygon()
+        if settings.CALCULATOR_DIAGNOSTICS:
+            self.plot_polygon()
         self.previous_existing_reference = None
 
     def get_danger_level_and_accumulated_score(self, track: List["Position"]) -> Tuple[float, float]:
@@ -108,6 +111,11 @@ class AnrCorridorCalculator(Calculator):
         return Polygon(transformed_points)
 
     def plot_polygon(self):
+        """
+        Debug rendering of the corridor polygon to polygon.png. Only used if CALCULATOR_DIAGNOSTICS is enabled.
+        """
+        import matplotlib.pyplot as plt
+
         # imagery = OSM()
         ax = plt.axes(projection=self.polygon_helper.utm)
         # ax.add_image(imagery, 8)
@@ -4,6 +4,7 @@ from multiprocessing import Queue
 from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from display.calculators.calculator import Calculator
+from display.calculators.contestant_track_state import ContestantTrackState
 from display.calculators.calculator_utilities import bearing_between
 from display.calculators.update_score_message import UpdateScoreMessage
 from display.utilities.coordinate_utilities import get_heading_difference, bearing_difference
@@ -55,8 +56,9 @@ class BacktrackingAndProcedureTurnsCalculator(Calculator):
         gates: List["Gate"],
         route: "Route",
         score_processing_queue: Queue,
+        track_state: Optional["ContestantTrackState"] = None,
     ):
-        super().__init__(contestant, scorecard, gates, route, score_processing_queue)
+        super().__init__(contestant, scorecard, gates, route, score_processing_queue, track_state)
         self.contestant = contestant
         self.scorecard = scorecard
         self.current_procedure_turn_gate = None
@@ -89,7 +91,7 @@ class BacktrackingAndProcedureTurnsCalculator(Calculator):
             return
         logger.info("{}: Changing state to {}".format(self.contestant, self.TRACKING_MAP[tracking_state]))
         self.tracking_state = tracking_state
-        self.contestant.contestanttrack.updates_current_state(self.TRACKING_MAP[tracking_state])
+        self.track_state.update_current_state(self.TRACKING_MAP[tracking_state])
 
     def calculate_enroute(
         self, track: List["Position"], last_gate: "Gate", in_range_of_gate: "Gate", next_gate: Optional["Gate"]
@@ -104,9 +106,9 @@ class BacktrackingAndProcedureTurnsCalculator(Calculator):
 
     def update_current_leg(self, current_leg):
         if current_leg:
-            self.contestant.contestanttrack.update_current_leg(current_leg.name)
+            self.track_state.update_current_leg(current_leg.name)
         else:
-            self.contestant.contestanttrack.update_current_leg("")
+            self.track_state.update_current_leg("")
 
     TIME_FORMAT = "%H:%M:%S"
 
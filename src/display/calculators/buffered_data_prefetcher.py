@@ -0,0 +1,210 @@
+import datetime
+import logging
+import threading
+import time
+from collections import deque
+from queue import Queue
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from display.utilities.metrics import BUFFERED_DATA_BACKFILLS, BUFFERED_DATA_POSITIONS_RECOVERED
+from traccar_facade import Traccar
+
+logger = logging.getLogger(__name__)
+
+# Seconds without positions from a device before traccar is checked for buffered positions in the gap
+CHECK_BUFFERED_DATA_TIME_LIMIT = 6
+# Minimum number of seconds between two backfill requests for the same contestant
+BACKFILL_MINIMUM_INTERVAL = 10
+# Seconds to wait for traccar to return the positions of a backfill, and the longest time that positions from the
+# stream are held back while waiting for it
+BACKFILL_TIMEOUT = 5
+# Number of recent position times remembered for each device to remove duplicates from the backfilled positions
+WINDOW_SIZE = 600
+
+
+class BufferedDataPrefetcher:
+    """
+    Recovers positions that were buffered by a tracker while it had no coverage, and that were therefore never received
+    through the position stream. Every position from the stream is passed to add(). If the time since the previous
+    position from the device is greater than CHECK_BUFFERED_DATA_TIME_LIMIT, the positions in the gap are requested
+    from traccar by a background thread, so that the caller never waits for traccar.
+
+    While a backfill is in flight, positions from the stream are held back for at most BACKFILL_TIMEOUT seconds. When
+    the backfill completes (or fails), the recovered positions that are not already in the rolling window of recent
+    positions of the device are merged with the held positions in time order and passed to the deliver callback
+    together. Otherwise positions are passed on to the deliver callback immediately. If the backfill takes longer than
+    BACKFILL_TIMEOUT, the held positions are released, and the positions it recovers are delivered late.
+
+    Backfills are rate limited to one every BACKFILL_MINIMUM_INTERVAL seconds. A gap that occurs before the next
+    backfill is permitted is counted as rate limited and is not backfilled, since its positions would be older than the
+    positions that have already been delivered by the time it is permitted.
+    """
+
+    def __init__(
+        self,
+        traccar: Traccar,
+        start_time: datetime.datetime,
+        deliver: Callable[[List[Optional[Dict]]], None],
+        minimum_interval: float = BACKFILL_MINIMUM_INTERVAL,
+    ):
+        """
+        :param start_time: The time to check for buffered positions from if nothing has been received from any device
+        :param deliver: Called with the positions to process, in order. None (the end of the stream) is always last.
+        """
+        self.traccar = traccar
+        self.start_time = start_time
+        self.deliver = deliver
+        self.minimum_interval = minimum_interval
+        self.lock = threading.Lock()
+        self.latest_times = {}  # type: Dict[int, datetime.datetime]
+        self.windows = {}  # type: Dict[int, Deque[datetime.datetime]]
+        self.seen = {}  # type: Dict[int, Set[datetime.datetime]]
+        self.held = []  # type: List[Optional[Dict]]
+        self.hold_deadline = None  # type: Optional[float]
+        self.outstanding_backfills = 0
+        self.last_backfill = None  # type: Optional[float]
+        self.requests = Queue()  # type: Queue[Optional[Tuple[int, datetime.datetime, datetime.datetime]]]
+        # Metrics
+        self.backfills = 0
+        self.positions_recovered = 0
+        self.rate_limited_backfills = 0
+        self.failed_backfills = 0
+        threading.Thread(target=self.backfill_thread, daemon=True).start()
+
+    def remember(self, position_data: Dict) -> bool:
+        """
+        Add the position to the rolling window of the device. Must be called while holding the lock.
+
+        :return: False if the position has already been seen
+        """
+        device_id = position_data["deviceId"]
+        device_time = position_data["device_time"]
+        window = self.windows.setdefault(device_id, deque())
+        seen = self.seen.setdefault(device_id, set())
+        if device_time in seen:
+            return False
+        window.append(device_time)
+        seen.add(device_time)
+        if len(window) > WINDOW_SIZE:
+            seen.discard(window.popleft())
+        if device_id not in self.latest_times or device_time > self.latest_times[device_id]:
+            self.latest_times[device_id] = device_time
+        return True
+
+    def seed(self, positions: List[Dict]):
+        """
+        Remember positions that have already been delivered by other means, e.g. the history fetched at start up.
+        """
+        with self.lock:
+            for position_data in positions:
+                self.remember(position_data)
+
+    def add(self, position_data: Optional[Dict]):
+        """
+        Pass a position from the stream, or None when the stream has ended.
+        """
+        with self.lock:
+            if position_data is None:
+                self.hold_or_deliver(position_data)
+                return
+            device_id = position_data["deviceId"]
+            device_time = position_data["device_time"]
+            # A device that has not been heard from before continues from the latest position of any device
+            latest_time = self.latest_times.get(device_id) or max(self.latest_times.values(), default=self.start_time)
+            # Positions from the stream are always passed on so that they are acknowledged, even if already seen
+            self.remember(position_data)
+            if (device_time - latest_time).total_seconds() > CHECK_BUFFERED_DATA_TIME_LIMIT:
+                now = time.monotonic()
+                if self.last_backfill is None or now - self.last_backfill >= self.minimum_interval:
+                    self.last_backfill = now
+                    if self.outstanding_backfills == 0:
+                        self.hold_deadline = now + BACKFILL_TIMEOUT
+                    self.outstanding_backfills += 1
+                    self.requests.put(
+                        (
+                            device_id,
+                            latest_time + datetime.timedelta(seconds=1),
+                            device_time - datetime.timedelta(seconds=1),
+                        )
+                    )
+                else:
+                    self.rate_limited_backfills += 1
+                    BUFFERED_DATA_BACKFILLS.labels("rate_limited").inc()
+            self.hold_or_deliver(position_data)
+
+    def hold_or_deliver(self, position_data: Optional[Dict]):
+        """
+        Must be called while holding the lock
+        """
+        if self.outstanding_backfills > 0 and time.monotonic() < self.hold_deadline:
+            self.held.append(position_data)
+        else:
+            self.release_held([position_data])
+
+    def release_held(self, positions: List[Optional[Dict]]):
+        """
+        Deliver the held positions together with the given positions in time order, with None last. Must be called
+        while holding the lock.
+        """
+        merged = sorted(
+            (position_data for position_data in self.held + positions if position_data is not None),
+            key=lambda position_data: position_data["device_time"],
+        )
+        if None in self.held or None in positions:
+            merged.append(None)
+        self.held = []
+        if len(merged) > 0:
+            self.deliver(merged)
+
+    def close(self):
+        """
+        Stop the backfill thread
+        """
+        self.requests.put(None)
+
+    def fetch(
+        self, device_id: int, start_time: datetime.datetime, finish_time: datetime.datetime
+    ) -> Optional[List[Dict]]:
+        """
+        :return: The positions in the interval, or None if they could not be fetched
+        """
+        try:
+            return list(
+                self.traccar.iter_positions_for_device_id(device_id, start_time, finish_time, timeout=BACKFILL_TIMEOUT)
+            )
+        except Exception:
+            logger.exception(f"Failed fetching buffered positions for device {device_id}")
+            with self.lock:
+                self.failed_backfills += 1
+            BUFFERED_DATA_BACKFILLS.labels("failed").inc()
+            return None
+
+    def backfill_thread(self):
+        while (request := self.requests.get()) is not None:
+            device_id, start_time, finish_time = request
+            positions = self.fetch(device_id, start_time, finish_time)
+            with self.lock:
+                self.backfills += 1
+                recovered = [position_data for position_data in positions or [] if self.remember(position_data)]
+                self.positions_recovered += len(recovered)
+                if positions is not None:
+                    BUFFERED_DATA_BACKFILLS.labels("completed").inc()
+                BUFFERED_DATA_POSITIONS_RECOVERED.inc(len(recovered))
+                if len(recovered) > 0:
+                    logger.debug(
+                        f"Recovered {len(recovered)} buffered positions for device {device_id} in the interval "
+                        f"{start_time.strftime('%H:%M:%S')} - {finish_time.strftime('%H:%M:%S')}"
+                    )
+                self.outstanding_backfills -= 1
+                if self.outstanding_backfills == 0:
+                    self.release_held(recovered)
+                else:
+                    self.held.extend(recovered)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "backfills": self.backfills,
+            "positions_recovered": self.positions_recovered,
+            "rate_limited_backfills": self.rate_limited_backfills,
+            "failed_backfills": self.failed_backfills,
+        }
@@ -3,6 +3,7 @@ from abc import abstractmethod
 from multiprocessing import Queue
 from typing import List, Optional, Tuple
 
+from display.calculators.contestant_track_state import ContestantTrackState
 from display.calculators.positions_and_gates import Position, Gate
 from display.calculators.update_score_message import UpdateScoreMessage
 from display.models import Contestant, Scorecard, Route
@@ -23,12 +24,15 @@ class Calculator:
         gates: List["Gate"],
         route: "Route",
         score_processing_queue: Queue,
+        track_state: Optional["ContestantTrackState"] = None,
     ):
         self.contestant = contestant
         self.scorecard = scorecard
         self.gates = gates
         self.route = route
         self.score_processing_queue = score_processing_queue
+        # Shared with the gatekeeper, used to update the tracking state of the contestant
+        self.track_state = track_state
         logger.debug(f"{contestant}: Starting calculator {self}")
 
     def update_score(self, update_score_message: UpdateScoreMessage) -> None:
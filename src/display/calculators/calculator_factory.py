@@ -1,4 +1,5 @@
 from multiprocessing import Queue
+from typing import Optional
 
 from display.calculators.anr_corridor_calculator import AnrCorridorCalculator
 from display.calculators.backtracking_and_procedure_turns import BacktrackingAndProcedureTurnsCalculator
@@ -18,14 +19,18 @@ from display.utilities.navigation_task_type_definitions import (
     AIRSPORT_CHALLENGE,
     LANDING,
 )
+from websocket_channels import WebsocketFacade
 
 
-def calculator_factory(contestant: "Contestant", score_processing_queue: Queue) -> "Gatekeeper":
+def calculator_factory(
+    contestant: "Contestant", score_processing_queue: Queue, websocket_facade: Optional[WebsocketFacade] = None
+) -> "Gatekeeper":
     if contestant.navigation_task.scorecard.calculator == PRECISION:
         return GatekeeperRoute(
             contestant,
             score_processing_queue,
             [BacktrackingAndProcedureTurnsCalculator, ProhibitedZoneCalculator, PenaltyZoneCalculator],
+            websocket_facade,
         )
     if contestant.navigation_task.scorecard.calculator in (
         ANR_CORRIDOR,
@@ -41,9 +46,10 @@ def calculator_factory(contestant: "Contestant", score_processing_queue: Queue)
                 ProhibitedZoneCalculator,
                 PenaltyZoneCalculator,
             ],
+            websocket_facade,
         )
     if contestant.navigation_task.scorecard.calculator == LANDING:
-        return GatekeeperLanding(contestant, score_processing_queue, [])
+        return GatekeeperLanding(contestant, score_processing_queue, [], websocket_facade)
     if contestant.navigation_task.scorecard.calculator == POKER:
-        return GatekeeperPoker(contestant, score_processing_queue, [])
-    return GatekeeperRoute(contestant, score_processing_queue, [])
+        return GatekeeperPoker(contestant, score_processing_queue, [], websocket_facade)
+    return GatekeeperRoute(contestant, score_processing_queue, [], websocket_facade)
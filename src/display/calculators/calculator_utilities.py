@@ -1,5 +1,11 @@
+import functools
+
 import numpy as np
+import shapely
+import utm
+from pyproj import Transformer
 from shapely.geometry import Polygon, Point, LineString
+from shapely.strtree import STRtree
 
 import cartopy.crs as ccrs
 import datetime
@@ -61,22 +67,34 @@ def round_time_second(obj: datetime.datetime) -> datetime.datetime:
         obj += datetime.timedelta(seconds=1)
     return obj.replace(microsecond=0)
 
+@functools.lru_cache(maxsize=None)
+def get_utm_transformer(zone: int, southern_hemisphere: bool) -> Transformer:
+    """
+    Returns a transformer from longitude, latitude to the UTM zone. Creating the transformer is expensive, so it is
+    cached for each zone.
+    """
+    return Transformer.from_crs(
+        ccrs.PlateCarree(), ccrs.UTM(zone, southern_hemisphere=southern_hemisphere), always_xy=True
+    )
+
+
 class PolygonHelper:
     def __init__(self, latitude, longitude):
         self.pc = ccrs.PlateCarree()
         self.utm = utm_from_lat_lon(latitude, longitude)
+        _, _, zone, _ = utm.from_latlon(latitude, longitude)
+        self.transformer = get_utm_transformer(zone, latitude < 0)
 
     def build_polygon(self, path):
-        line = []
-        for element in path:
-            line.append(self.utm.transform_point(*list(reversed(element)), self.pc))
-        return Polygon(line)
+        path = np.array(path, dtype=float)
+        x, y = self.transformer.transform(path[:, 1], path[:, 0])
+        return Polygon(list(zip(x, y)))
 
     def check_inside_polygons(self, polygons: List[Tuple[str, Polygon]], latitude, longitude) -> List[str]:
         """
         Returns a list of names of the prohibited zone is the position is inside
         """
-        x, y = self.utm.transform_point(longitude, latitude, self.pc)
+        x, y = self.transformer.transform(longitude, latitude)
         p = Point(x, y)
         incursions = []
         for name, zone in polygons:
@@ -93,7 +111,7 @@ class PolygonHelper:
         :param longitude:
         :return:  distance in metres
         """
-        x, y = self.utm.transform_point(longitude, latitude, self.pc)
+        x, y = self.transformer.transform(longitude, latitude)
         p = Point(x, y)
         distances = {}
         for name, polygon in polygons:
@@ -116,36 +134,127 @@ class PolygonHelper:
         :param turning_rate: degrees per second
         :param lookahead_seconds: How far ahead to extrapolate the trajectory
         """
-        previous_longitude = longitude
-        previous_latitude = latitude
         speed_per_second = 1852 * speed / 3600  # m/s
         intersection_times = {}
         maximum_distance = speed_per_second * lookahead_seconds
         distances = self.distance_from_point_to_polygons(polygons, latitude, longitude)
-        for name, distance in distances.items():
-            if distance > maximum_distance:
-                intersection_times[name] = None
-        for second in range(lookahead_step, lookahead_seconds, lookahead_step):
-            if len(intersection_times) == len(polygons):
-                break
-            projected_latitude, projected_longitude = project_position_lat_lon((previous_latitude, previous_longitude),
-                                                                               (bearing + second * turning_rate) % 360,
-                                                                               speed_per_second * lookahead_step)
-            line_string = LineString(
-                self.utm.transform_points(self.pc, np.array([previous_longitude, projected_longitude]),
-                                          np.array([previous_latitude, projected_latitude])))
-            previous_latitude = projected_latitude
-            previous_longitude = projected_longitude
-            for name, polygon in polygons:
-                if name not in intersection_times:
-                    if (not from_inside and line_string.intersects(polygon)) or (
-                            from_inside and not line_string.intersects(polygon)):
-                        intersection_times[name] = second
-        for key in list(intersection_times.keys()):
-            if not intersection_times[key]:
-                del intersection_times[key]
+        candidates = [(name, polygon) for name, polygon in polygons if distances[name] <= maximum_distance]
+        seconds = np.arange(lookahead_step, lookahead_seconds, lookahead_step)
+        if len(candidates) == 0 or len(seconds) == 0:
+            return intersection_times
+        segments = self.projected_arc_segments(
+            latitude, longitude, bearing, speed_per_second, turning_rate, seconds, lookahead_step
+        )
+        arc = LineString(np.concatenate([segments[:, 0, :], segments[-1:, 1, :]]))
+        segment_lines = shapely.linestrings(segments)
+        for name, polygon in candidates:
+            # Test the entire arc first, most of the time it does not cross the polygon boundary at all
+            if from_inside:
+                if polygon.contains(arc):
+                    continue
+                crossings = np.flatnonzero(~shapely.intersects(segment_lines, polygon))
+            else:
+                if not arc.intersects(polygon):
+                    continue
+                crossings = np.flatnonzero(shapely.intersects(segment_lines, polygon))
+            if len(crossings) > 0:
+                second = int(seconds[crossings[0]])
+                if name not in intersection_times or second < intersection_times[name]:
+                    intersection_times[name] = second
         return intersection_times
 
+    def projected_arc_segments(
+        self,
+        latitude: float,
+        longitude: float,
+        bearing: float,
+        speed_per_second: float,
+        turning_rate: float,
+        seconds: np.ndarray,
+        lookahead_step: int,
+    ) -> np.ndarray:
+        """
+        Project the trajectory with constant speed and turning rate, taking one step of lookahead_step seconds for each
+        of the seconds. Returns an array with shape (len(seconds), 2, 2) with the start and finish of each step in UTM
+        coordinates. All the points are transformed in a single call.
+        """
+        latitudes = [latitude]
+        longitudes = [longitude]
+        for second in seconds:
+            projected_latitude, projected_longitude = project_position_lat_lon(
+                (latitudes[-1], longitudes[-1]),
+                (bearing + second * turning_rate) % 360,
+                speed_per_second * lookahead_step,
+            )
+            latitudes.append(projected_latitude)
+            longitudes.append(projected_longitude)
+        x, y = self.transformer.transform(np.array(longitudes), np.array(latitudes))
+        points = np.column_stack([x, y])
+        return np.stack([points[:-1], points[1:]], axis=1)
+
+
+class ZoneIndex:
+    """
+    Index of the zone polygons used by a calculator. The polygons are prepared and stored in an STRtree when the
+    calculator is created. The batch methods take arrays of latitudes and longitudes and return the result for all
+    positions and zones in a single operation, using the tree so that only the polygons whose bounding boxes contain
+    a position are tested.
+    """
+
+    def __init__(self, polygon_helper: PolygonHelper, zone_polygons: List[Tuple[str, Polygon]]):
+        self.polygon_helper = polygon_helper
+        self.zone_polygons = zone_polygons
+        self.names = [name for name, _ in zone_polygons]
+        self.polygons = np.array([polygon for _, polygon in zone_polygons], dtype=object)
+        self.exteriors = np.array([polygon.exterior for polygon in self.polygons], dtype=object)
+        shapely.prepare(self.polygons)
+        self.tree = STRtree(self.polygons)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _points(self, latitudes, longitudes) -> np.ndarray:
+        x, y = self.polygon_helper.transformer.transform(
+            np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+        )
+        return shapely.points(np.atleast_1d(x), np.atleast_1d(y))
+
+    def contains_many(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Returns a boolean array with shape (number of positions, number of zones) which is true where the zone
+        contains the position.
+        """
+        points = self._points(latitudes, longitudes)
+        inside = np.zeros((len(points), len(self.names)), dtype=bool)
+        if len(self.names) > 0:
+            point_indices, zone_indices = self.tree.query(points, predicate="within")
+            inside[point_indices, zone_indices] = True
+        return inside
+
+    def distances_many(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Returns an array with shape (number of positions, number of zones) with the distance in metres from each
+        position to the boundary of each zone.
+        """
+        points = self._points(latitudes, longitudes)
+        return shapely.distance(points[:, np.newaxis], self.exteriors[np.newaxis, :])
+
+    def check_inside(self, latitude: float, longitude: float) -> List[str]:
+        """
+        Returns the names of the zones that contain the position, in the same order as the zones were given.
+        """
+        if len(self.names) == 0:
+            return []
+        x, y = self.polygon_helper.transformer.transform(longitude, latitude)
+        # For a single position, testing all the prepared polygons in one call is faster than querying the tree
+        return [self.names[index] for index in np.flatnonzero(shapely.contains_xy(self.polygons, x, y))]
+
+    def distances(self, latitude: float, longitude: float) -> Dict[str, float]:
+        """
+        Returns the distance in metres from the position to the boundary of each zone.
+        """
+        return dict(zip(self.names, self.distances_many([latitude], [longitude])[0].tolist()))
+
 
 def project_position(latitude: float, longitude: float, course: float, turning_rate: float, speed: float,
                      seconds: float) -> Tuple[
@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+
+from display.calculators.contestant_processor import ContestantProcessor
+from display.models import Contestant
+from display.utilities.calculator_running_utilities import calculator_is_terminated
+from display.utilities.calculator_termination_utilities import is_termination_requested
+from display.utilities.calculator_worker_utilities import get_worker_queue
+from redis_queue import RedisEmpty
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 30
+
+
+class CalculatorWorker:
+    """
+    Hosts the calculators for many contestants in a single process. Each worker is responsible for the contestants
+    whose primary key maps to its worker index (see worker_for_contestant), and receives requests to start calculators
+    through its own redis queue. The calculators run in a thread pool, so the Django setup, the imported geographic
+    libraries, and the database and redis connections are shared instead of paid for by a separate process per
+    contestant.
+    """
+
+    def __init__(self, worker_index: int, max_calculators: int):
+        self.worker_index = worker_index
+        self.max_calculators = max_calculators
+        self.request_queue = get_worker_queue(worker_index)
+        self.executor = ThreadPoolExecutor(max_workers=max_calculators, thread_name_prefix="calculator")
+        self.calculators = {}  # type: Dict[int, Future]
+
+    def run(self):
+        logger.info(f"Started calculator worker {self.worker_index} with room for {self.max_calculators} calculators")
+        while True:
+            try:
+                contestant_pk = self.request_queue.pop(True, timeout=REQUEST_TIMEOUT)
+            except RedisEmpty:
+                self.remove_finished_calculators()
+                continue
+            if contestant_pk is not None:
+                self.start_calculator(contestant_pk)
+
+    def remove_finished_calculators(self):
+        for contestant_pk, future in list(self.calculators.items()):
+            if future.done():
+                self.calculators.pop(contestant_pk)
+
+    def start_calculator(self, contestant_pk: int) -> bool:
+        """
+        Schedule a calculator for the contestant unless one is already running or waiting for a free thread in this
+        worker. Returns True if a new calculator was scheduled.
+        """
+        self.remove_finished_calculators()
+        if contestant_pk in self.calculators:
+            logger.info(f"Calculator for contestant {contestant_pk} is already running in worker {self.worker_index}")
+            return False
+        if len(self.calculators) >= self.max_calculators:
+            logger.warning(
+                f"Calculator worker {self.worker_index} is full, contestant {contestant_pk} is waiting for a free thread"
+            )
+        self.calculators[contestant_pk] = self.executor.submit(self.run_calculator, contestant_pk)
+        return True
+
+    @staticmethod
+    def run_calculator(contestant_pk: int):
+        """
+        Run the calculator for the contestant to completion. Exceptions are logged so that a failing calculator does not
+        affect the other calculators in the worker.
+        """
+        try:
+            try:
+                contestant = Contestant.objects.get(pk=contestant_pk)
+            except ObjectDoesNotExist:
+                logger.warning(f"Attempting to start new calculator for non-existent contestant {contestant_pk}")
+                return
+            if contestant.contestanttrack.calculator_finished or is_termination_requested(contestant_pk):
+                logger.warning(f"Attempting to start new calculator for terminated contestant {contestant}")
+                return
+            ContestantProcessor(contestant, live_processing=True).run()
+        except Exception:
+            logger.exception(f"Calculator for contestant {contestant_pk} failed")
+            # Allow the position processor to request a new calculator when more positions arrive
+            calculator_is_terminated(contestant_pk)
+        finally:
+            # Each thread has its own database connection, make sure it is not left open when the thread is reused
+            connection.close()
@@ -1,19 +1,29 @@
 import datetime
 import logging
 import threading
+import time
 from abc import ABC
-from queue import Queue
+from queue import Queue, Empty
 from typing import List, Optional, Tuple, Dict
 
-from dateutil import parser
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 
+from display.calculators.buffered_data_prefetcher import BufferedDataPrefetcher
 from display.calculators.calculator_factory import calculator_factory
+from display.calculators.score_sink import ScoreSink
 from display.calculators.update_score_message import UpdateScoreMessage
 from display.utilities.calculator_running_utilities import calculator_is_alive, calculator_is_terminated
 from display.utilities.calculator_termination_utilities import is_termination_requested
-from redis_queue import RedisQueue, RedisEmpty
+from display.utilities.metrics import (
+    CALCULATOR_QUEUE_DEPTH,
+    GATEKEEPER_TIME_PER_POSITION,
+    SCORE_EVENT_LATENCY,
+    TIMED_QUEUE_LAG,
+)
+from redis_queue import RedisStreamQueue, RedisEmpty
 from slack_facade import post_slack_message
+from utilities.startup_timer import StartupTimer
 from utilities.timed_queue import TimedQueue, TimedOut
 from websocket_channels import WebsocketFacade
 
@@ -27,7 +37,6 @@ from display.utilities.coordinate_utilities import (
 from display.models import Contestant, TrackAnnotation, ScoreLogEntry, ContestantReceivedPosition
 
 DANGER_LEVEL_REPORT_INTERVAL = 5
-CHECK_BUFFERED_DATA_TIME_LIMIT = 6
 logger = logging.getLogger(__name__)
 
 
@@ -57,8 +66,81 @@ class ScoreAccumulator:
         return score + previous_score, capped
 
 
+def create_score_entry(
+    contestant: "Contestant", accumulated_scores: ScoreAccumulator, update_score_message: UpdateScoreMessage
+) -> Tuple[ScoreLogEntry, TrackAnnotation, float]:
+    """
+    Constructs the unsaved score log entry and track annotation for the score update, and returns them together with
+    the points. Optionally cap the score if it has a maximum value.
+    """
+    score, capped = accumulated_scores.set_and_update_score(
+        update_score_message.score, update_score_message.score_type, update_score_message.maximum_score, 0
+    )
+    if update_score_message.planned is not None and update_score_message.actual is not None:
+        offset = (update_score_message.actual - update_score_message.planned).total_seconds()
+        # Must use round, this is the same as used in the score calculation
+        offset_string = "{} s".format("+{}".format(round(offset)) if offset > 0 else round(offset))
+    else:
+        offset_string = ""
+    if capped:
+        update_score_message.message += " (capped)"
+    planned_time = (
+        update_score_message.planned.astimezone(contestant.navigation_task.contest.time_zone).strftime("%H:%M:%S")
+        if update_score_message.planned
+        else None
+    )
+    actual_time = (
+        update_score_message.actual.astimezone(contestant.navigation_task.contest.time_zone).strftime("%H:%M:%S")
+        if update_score_message.actual
+        else None
+    )
+    string = "{}: {} points {}".format(update_score_message.gate.name, score, update_score_message.message)
+    if offset_string:
+        string += " ({})".format(offset_string)
+    times_string = ""
+    if update_score_message.planned and update_score_message.actual:
+        times_string = "planned: {}\nactual: {}".format(planned_time, actual_time)
+    elif update_score_message.planned:
+        times_string = "planned: {}\nactual: --".format(planned_time)
+    if len(times_string) > 0:
+        string += f"\n{times_string}"
+    logger.info("UPDATE_SCORE {}: {}{}".format(contestant, "", string))
+    entry = ScoreLogEntry(
+        contestant=contestant,
+        time=update_score_message.time,
+        gate=update_score_message.gate.name,
+        type=update_score_message.annotation_type,
+        message=update_score_message.message,
+        points=score,
+        planned=update_score_message.planned,
+        actual=update_score_message.actual,
+        offset_string=offset_string,
+        string=string,
+        times_string=times_string,
+    )
+    annotation = TrackAnnotation(
+        contestant=contestant,
+        latitude=update_score_message.latitude,
+        longitude=update_score_message.longitude,
+        message=string,
+        type=update_score_message.annotation_type,
+        gate=update_score_message.gate.name,
+        gate_type=update_score_message.gate.type,
+        time=update_score_message.time,
+    )
+    return entry, annotation, score
+
+
 LOOP_TIME = 60
 CONTESTANT_REFRESH_INTERVAL = datetime.timedelta(seconds=15)
+ACKNOWLEDGEMENT_BATCH_SIZE = 50
+STREAM_READ_BATCH_SIZE = 100
+# Maximum number of due positions taken from the timed queue in each iteration of the run loop
+POSITION_BATCH_SIZE = 100
+# Seconds to collect score updates before writing them to the database
+SCORE_FLUSH_INTERVAL = 0.5
+# Seconds between each update of the queue depth metric
+QUEUE_DEPTH_INTERVAL = 5
 
 
 class ContestantProcessor:
@@ -74,14 +156,18 @@ class ContestantProcessor:
         contestant: "Contestant",
         live_processing: bool = True,
         queue_name_override: str = None,
+        startup_timer: Optional[StartupTimer] = None,
     ):
         calculator_is_alive(contestant.pk, 30)
         super().__init__()
         logger.info(f"{contestant}: Created contestant processor")
         self.contestant = contestant
         self.live_processing = live_processing
+        self.startup_timer = startup_timer or StartupTimer(f"Calculator {contestant}")
+        with self.startup_timer.phase("route unpickling"):
+            _ = self.contestant.navigation_task.route.waypoints
 
-        self.position_queue = RedisQueue(queue_name_override or str(contestant.pk))
+        self.position_queue = RedisStreamQueue(queue_name_override or str(contestant.pk))
         self.traccar = get_traccar_instance()
         self.previous_position = None
         self.track_terminated = False
@@ -94,11 +180,17 @@ class ContestantProcessor:
         self.contestant.reset_track_and_score()
         self.contestant.contestantreceivedposition_set.all().delete()
         self.contestant_track.set_calculator_started()
+        # The track has been reset, so replay all positions that are already in the stream
+        self.position_queue.rewind()
+        self.pending_acknowledgements = []
         self.scorecard = self.contestant.navigation_task.scorecard
         self.position_update_lock = threading.Lock()
         self.accumulated_scores = ScoreAccumulator()
         self.websocket_facade = WebsocketFacade()
         self.timed_queue = TimedQueue()
+        self.buffered_data_prefetcher = BufferedDataPrefetcher(
+            self.traccar, self.contestant.tracker_start_time, self.enqueue_positions
+        )
         self.finished_loading_initial_positions = (
             threading.Event()
         )  # Used to prevent the calculator from terminating while we are waiting for initial data if it starts after-the-fact.
@@ -108,21 +200,58 @@ class ContestantProcessor:
         )
         self.websocket_facade.transmit_delete_contestant(self.contestant)
         self.websocket_facade.transmit_contestant(self.contestant)
+        self.score_sink = ScoreSink(self.contestant, self.websocket_facade)
         threading.Thread(target=self.score_updater_thread, daemon=True).start()
-        self.gatekeeper = calculator_factory(self.contestant, self.score_processing_queue)
+        with self.startup_timer.phase("gatekeeper and polygon build"):
+            self.gatekeeper = calculator_factory(self.contestant, self.score_processing_queue)
+        self.gatekeeper_time_per_position = GATEKEEPER_TIME_PER_POSITION.labels(type(self.gatekeeper).__name__)
 
     def score_updater_thread(self):
         """
         Thread function used to provide asynchronous update of scores. Updating the score may take some time and this
         will lead to a noticeable glitch in the calculator performance/tracking in the tracking map. Running this in a
         separate thread avoids this.
+
+        Score updates arriving within SCORE_FLUSH_INTERVAL of the first are collected in the score sink and written
+        together. The thread terminates when it receives None, which is put on the queue when the calculator stops.
         """
-        while True:
-            score = self.score_processing_queue.get(True)
-            self.update_score_from_thread(score)
-            self.score_processing_queue.task_done()
+        stopped = False
+        while not stopped:
+            message = self.score_processing_queue.get(True)
+            if message is None:
+                self.score_processing_queue.task_done()
+                break
+            messages = [message]
+            deadline = time.monotonic() + SCORE_FLUSH_INTERVAL
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    message = self.score_processing_queue.get(True, timeout=remaining)
+                except Empty:
+                    break
+                if message is None:
+                    self.score_processing_queue.task_done()
+                    stopped = True
+                    break
+                messages.append(message)
+            try:
+                for message in messages:
+                    self.update_score_from_thread(message)
+                self.score = self.score_sink.flush()
+                if self.live_processing:
+                    now = datetime.datetime.now(datetime.timezone.utc)
+                    for message in messages:
+                        SCORE_EVENT_LATENCY.observe((now - message.time).total_seconds())
+            except Exception:
+                logger.exception(f"{self.contestant}: Failed updating score")
+            finally:
+                for _ in messages:
+                    self.score_processing_queue.task_done()
+        # The thread has its own database connection, which must not be left open when the calculator runs in a
+        # calculator worker
+        connection.close()
 
-    def interpolate_track(self, last_position: Optional[Position], position: Position) -> List[Position]:
+    @staticmethod
+    def interpolate_track(last_position: Optional[Position], position: Position) -> List[Position]:
         """
         If last_position is provided, perform a linear interpolation for each second with missing position data between
         the time of last_position and position. Return the resulting list of positions.
@@ -163,44 +292,12 @@ class ContestantProcessor:
         positions.append(position)
         return positions
 
-    def check_for_buffered_data_if_necessary(self, position_data: Dict) -> List[Dict]:
-        """
-        If there has been some time since the last position report before this is greater than
-        CHECK_BUFFERED_DATA_TIME_LIMIT, check the traccar service to see if any data is available for the missing time
-        interval and return this together with the last position.
-        """
-        if self.previous_position is None:
-            latest_position_time = self.contestant.tracker_start_time
-        else:
-            latest_position_time = self.previous_position.time
-        current_time = position_data["device_time"]
-        time_difference = (current_time - latest_position_time).total_seconds()
-        if time_difference > CHECK_BUFFERED_DATA_TIME_LIMIT:
-            # Get positions in between
-            positions = self.traccar.get_positions_for_device_id(
-                position_data["deviceId"],
-                latest_position_time + datetime.timedelta(seconds=1),
-                current_time - datetime.timedelta(seconds=1),
-            )
-            for item in positions:
-                item["device_time"] = parser.parse(item["deviceTime"])
-                item["server_time"] = parser.parse(item["serverTime"])
-                item["calculator_received_time"] = datetime.datetime.now(datetime.timezone.utc)
-
-            if len(positions) > 0:
-                logger.debug(
-                    f"{self.contestant}:  Retrieved {len(positions)} additional positions for the interval {positions[0]['device_time'].strftime('%H:%M:%S')} - {positions[-1]['device_time'].strftime('%H:%M:%S')}"
-                )
-            return positions + [position_data]
-        return [position_data]
-
     def refresh_scores(self):
         """
-        Push all score information to the front end. This needs to be done at regular intervals in case the front end
-        loses connectivity with the Web server.
+        Push the basic contestant information with the current score to the front end at regular intervals. Score log
+        entries and annotations are sent as deltas when they are created, and clients that have lost connectivity ask
+        for the entries they have missed (see TrackingConsumer), so these are not resent.
         """
-        self.websocket_facade.transmit_score_log_entry(self.contestant)
-        self.websocket_facade.transmit_annotations(self.contestant)
         self.websocket_facade.transmit_basic_information(self.contestant)
 
     def run(self):
@@ -208,6 +305,25 @@ class ContestantProcessor:
         The main run function of the gatekeeper. This method reads incoming positions that have been optionally delayed
         by the timed queue, interpolates any missing positions, calculates the score given the new position data, and
         pushes the updated positions to the front end. The function terminates when self.track_terminated == True.
+
+        The threads of the processor are stopped when the function returns, also if it fails, so that nothing is left
+        behind when the calculator runs in a long-lived calculator worker.
+        """
+        try:
+            self.process_positions()
+        finally:
+            self.track_terminated = True
+            self.buffered_data_prefetcher.close()
+            try:
+                CALCULATOR_QUEUE_DEPTH.remove(str(self.contestant.pk))
+            except KeyError:
+                pass
+            # Stop the score updater thread once it has processed the outstanding score updates
+            self.score_processing_queue.put(None)
+
+    def process_positions(self):
+        """
+        Process positions until the contestant has finished, see run()
         """
         calculator_is_alive(self.contestant.pk, 30)
         logger.info(
@@ -239,33 +355,39 @@ class ContestantProcessor:
                     break
                 self.last_contestant_refresh = now
             try:
-                position_data = self.timed_queue.get(timeout=15)
+                position_batch = self.timed_queue.get_many(POSITION_BATCH_SIZE, timeout=15)
             except TimedOut:
                 # We have not received anything for 60 seconds, check if we should terminate
+                self.acknowledge_processed_positions()
+                # Push any tracking state change that was held back by the debouncing
+                self.gatekeeper.track_state.flush()
                 self.check_termination_is_commanded(self.previous_position)
                 continue
-            if position_data is None:
-                # Signal the track processor that this is the end, and perform the track calculation
-                logger.debug(f"End of position list after {number_of_positions} positions")
-                self.notify_termination()
-                continue
-            if not receiving:
-                logger.info(f"{self.contestant}: Started processing data")
-                receiving = True
-            # logger.debug(f"Processing position ID {position_data['id']} for device ID {position_data['deviceId']}")
-            position_data["calculator_received_time"] = datetime.datetime.now(datetime.timezone.utc)
-            number_of_positions += 1
-            if self.live_processing:
-                positions_to_process = self.check_for_buffered_data_if_necessary(position_data)
-            else:
-                positions_to_process = [position_data]
             all_positions = []
             generated_positions = []
-            for position_to_process in positions_to_process:
+            for position_data in position_batch:
+                if position_data is None:
+                    # Signal the track processor that this is the end, and perform the track calculation
+                    logger.debug(f"End of position list after {number_of_positions} positions")
+                    self.notify_termination()
+                    break
+                if not receiving:
+                    logger.info(f"{self.contestant}: Started processing data")
+                    receiving = True
+                # logger.debug(f"Processing position ID {position_data['id']} for device ID {position_data['deviceId']}")
+                position_data["calculator_received_time"] = datetime.datetime.now(datetime.timezone.utc)
+                number_of_positions += 1
+                if self.live_processing and "stream_id" in position_data:
+                    # Historic positions fetched from traccar at start up are not included
+                    TIMED_QUEUE_LAG.observe(
+                        (position_data["calculator_received_time"] - position_data["device_time"]).total_seconds()
+                        - 60 * self.contestant.navigation_task.calculation_delay_minutes
+                    )
+                if "stream_id" in position_data:
+                    self.pending_acknowledgements.append(position_data["stream_id"])
                 data = self.contestant.generate_position_block_for_contestant(
-                    position_to_process, position_to_process["device_time"]
+                    position_data, position_data["device_time"]
                 )
-
                 p = Position(**data)
                 if self.previous_position and (
                     (p.latitude == self.previous_position.latitude and p.longitude == self.previous_position.longitude)
@@ -293,21 +415,34 @@ class ContestantProcessor:
                     )
                 self.previous_position = p
             ContestantReceivedPosition.objects.bulk_create(generated_positions)
-            for position in all_positions:
-                calculator_is_alive(self.contestant.pk, 30)
-                self.gatekeeper.calculate_score(position)
+            calculator_is_alive(self.contestant.pk, 30)
+            start = time.perf_counter()
+            self.gatekeeper.calculate_score_many(all_positions)
+            if len(all_positions) > 0:
+                self.gatekeeper_time_per_position.observe((time.perf_counter() - start) / len(all_positions))
+                self.startup_timer.complete("first position processed")
 
             self.websocket_facade.transmit_navigation_task_position_data(self.contestant, all_positions)
+            if len(self.pending_acknowledgements) >= ACKNOWLEDGEMENT_BATCH_SIZE:
+                self.acknowledge_processed_positions()
             self.should_i_terminate()
             self.check_termination_is_commanded(self.previous_position)
         self.gatekeeper.finished_processing()
+        self.gatekeeper.track_state.flush(force_push=True)
         self.contestant_track.set_calculator_finished()
-        while not self.position_queue.empty():
-            self.position_queue.pop()
+        logger.info(f"{self.contestant}: Buffered data backfill {self.buffered_data_prefetcher.metrics()}")
+        self.position_queue.clear()
         self.score_processing_queue.join()
         logger.info("Terminating calculator for {}".format(self.contestant))
         calculator_is_terminated(self.contestant.pk)
 
+    def acknowledge_processed_positions(self):
+        """
+        Acknowledge all positions that have been processed since the last acknowledgement.
+        """
+        self.position_queue.acknowledge(self.pending_acknowledgements)
+        self.pending_acknowledgements = []
+
     def should_i_terminate(self):
         """
         Check if the time has passed the finished by time and terminate the  processor if this is the case
@@ -356,6 +491,20 @@ class ContestantProcessor:
             return True
         return False
 
+    def enqueue_positions(self, positions: List[Optional[Dict]]):
+        """
+        Put the positions in the timed queue, delayed by the calculation delay of the navigation task. None (the end of
+        the stream) is released immediately.
+        """
+        for position_data in positions:
+            if position_data is not None:
+                release_time = position_data["device_time"] + datetime.timedelta(
+                    minutes=self.contestant.navigation_task.calculation_delay_minutes
+                )
+            else:
+                release_time = datetime.datetime.now(datetime.timezone.utc)
+            self.timed_queue.put(position_data, release_time)
+
     def enqueue_positions_thread(self):
         """
         Thread function which enqueues incoming positions in a timed queue. The time queue is used to delay the
@@ -368,16 +517,19 @@ class ContestantProcessor:
         current_time = datetime.datetime.now(datetime.timezone.utc)
         device_positions = {}
         if self.live_processing:
-            # Fetch any earlier positions for the contestant to ensure that we start from the beginning.
-            for device_id in device_ids:
-                positions = self.traccar.get_positions_for_device_id(
-                    device_id, self.contestant.tracker_start_time, current_time
+            # Fetch any earlier positions for the contestant to ensure that we start from the beginning. Positions that
+            # are already in the stream (e.g. if the calculator has been restarted) are replayed from redis, so we
+            # only need to fetch the positions from before the first position in the stream.
+            try:
+                first_queued = self.position_queue.peek()
+                if first_queued is not None:
+                    current_time = first_queued["device_time"] - datetime.timedelta(seconds=1)
+            except RedisEmpty:
+                pass
+            with self.startup_timer.phase("traccar history fetch"):
+                device_positions = self.traccar.get_positions_for_device_ids(
+                    device_ids, self.contestant.tracker_start_time, current_time
                 )
-                for item in positions:
-                    item["device_time"] = parser.parse(item["deviceTime"])
-                    item["server_time"] = parser.parse(item["serverTime"])
-                    item["calculator_received_time"] = datetime.datetime.now(datetime.timezone.utc)
-                device_positions[device_id] = positions
             try:
                 # Select the longest track
                 positions_to_use = sorted(device_positions.values(), key=lambda k: len(k), reverse=True)[0]
@@ -385,99 +537,44 @@ class ContestantProcessor:
                     f"{self.contestant}: Fetched {len(positions_to_use)} historic positions at start of calculator"
                 )
                 for position in positions_to_use:
-                    self.timed_queue.put(position, datetime.datetime.now(datetime.timezone.utc))
+                    now = datetime.datetime.now(datetime.timezone.utc)
+                    position["calculator_received_time"] = now
+                    self.timed_queue.put(position, now)
+                self.buffered_data_prefetcher.seed(positions_to_use)
             except IndexError:
                 pass
         receiving = False
+        queue_depth = CALCULATOR_QUEUE_DEPTH.labels(str(self.contestant.pk))
+        last_queue_depth_update = 0
         while not self.track_terminated:
+            if time.monotonic() - last_queue_depth_update > QUEUE_DEPTH_INTERVAL:
+                queue_depth.set(self.position_queue.depth)
+                last_queue_depth_update = time.monotonic()
             try:
-                position_data = self.position_queue.pop(True, timeout=30)
+                entries = self.position_queue.pop_many(STREAM_READ_BATCH_SIZE, True, timeout=30)
+            except RedisEmpty:
+                self.check_termination_is_commanded(self.previous_position)
+                continue
+            for entry_id, position_data in entries:
                 if position_data is not None:
-                    release_time = position_data["device_time"] + datetime.timedelta(
-                        minutes=self.contestant.navigation_task.calculation_delay_minutes
-                    )
+                    position_data["stream_id"] = entry_id
                     if not receiving:
                         logger.info(f"{self.contestant}: Started receiving data")
                 else:
                     logger.info(f"{self.contestant}: Delayed position queuer received None")
-                    release_time = datetime.datetime.now(datetime.timezone.utc)
-                self.timed_queue.put(position_data, release_time)
+                    self.position_queue.acknowledge([entry_id])
+                if self.live_processing:
+                    # Positions are held back by the prefetcher while it checks traccar for buffered positions
+                    self.buffered_data_prefetcher.add(position_data)
+                else:
+                    self.enqueue_positions([position_data])
                 if not receiving:
                     self.finished_loading_initial_positions.set()
                     receiving = True
-            except RedisEmpty:
-                self.check_termination_is_commanded(self.previous_position)
 
     def update_score_from_thread(self, update_score_message: UpdateScoreMessage):
         """
-        Constructs the score structures required to update the contestants score. Optionally cap the score if it has a
-        maximum value.
+        Constructs the score structures required to update the contestants score. The score log entry and track
+        annotation are added to the score sink, and are written when the sink is flushed.
         """
-        score, capped = self.accumulated_scores.set_and_update_score(
-            update_score_message.score, update_score_message.score_type, update_score_message.maximum_score, 0
-        )
-        if update_score_message.planned is not None and update_score_message.actual is not None:
-            offset = (update_score_message.actual - update_score_message.planned).total_seconds()
-            # Must use round, this is the same as used in the score calculation
-            offset_string = "{} s".format("+{}".format(round(offset)) if offset > 0 else round(offset))
-        else:
-            offset_string = ""
-        if capped:
-            update_score_message.message += " (capped)"
-        planned_time = (
-            update_score_message.planned.astimezone(self.contestant.navigation_task.contest.time_zone).strftime(
-                "%H:%M:%S"
-            )
-            if update_score_message.planned
-            else None
-        )
-        actual_time = (
-            update_score_message.actual.astimezone(self.contestant.navigation_task.contest.time_zone).strftime(
-                "%H:%M:%S"
-            )
-            if update_score_message.actual
-            else None
-        )
-        string = "{}: {} points {}".format(update_score_message.gate.name, score, update_score_message.message)
-        if offset_string:
-            string += " ({})".format(offset_string)
-        times_string = ""
-        if update_score_message.planned and update_score_message.actual:
-            times_string = "planned: {}\nactual: {}".format(planned_time, actual_time)
-        elif update_score_message.planned:
-            times_string = "planned: {}\nactual: --".format(planned_time)
-        if len(times_string) > 0:
-            string += f"\n{times_string}"
-        logger.info("UPDATE_SCORE {}: {}{}".format(self.contestant, "", string))
-        # Take into account that external events may have changed the score
-        self.contestant_track.refresh_from_db()
-        self.contestant.record_score_by_gate(update_score_message.gate.name, score)
-        self.score = self.contestant_track.score
-        logger.debug(f"Setting existing scores from contestant track: {self.score}")
-        self.score += score
-        entry = ScoreLogEntry.create_and_push(
-            contestant=self.contestant,
-            time=update_score_message.time,
-            gate=update_score_message.gate.name,
-            type=update_score_message.annotation_type,
-            message=update_score_message.message,
-            points=score,
-            planned=update_score_message.planned,
-            actual=update_score_message.actual,
-            offset_string=offset_string,
-            string=string,
-            times_string=times_string,
-        )
-        TrackAnnotation.create_and_push(
-            contestant=self.contestant,
-            latitude=update_score_message.latitude,
-            longitude=update_score_message.longitude,
-            message=string,
-            type=update_score_message.annotation_type,
-            gate=update_score_message.gate.name,
-            gate_type=update_score_message.gate.type,
-            time=update_score_message.time,
-            score_log_entry=entry,
-        )
-        if score != 0:
-            self.contestant_track.update_score(self.score)
+        self.score_sink.add(*create_score_entry(self.contestant, self.accumulated_scores, update_score_message))
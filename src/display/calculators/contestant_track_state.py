@@ -0,0 +1,76 @@
+import logging
+import time
+
+from display.models import ContestantTrack
+from websocket_channels import WebsocketFacade
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between pushing tracking state changes to the front end
+PUSH_INTERVAL = 1
+
+
+class ContestantTrackState:
+    """
+    Calculator side copy of the tracking state fields of a ContestantTrack (current state, current leg, last gate, and
+    whether the starting and finish gates have been passed). These fields are only changed by the calculator, so there
+    is no need to read them back from the database. Changes are kept in memory and written with a single conditional
+    update when flushed. Pushes to the front end are debounced to at most one every PUSH_INTERVAL seconds.
+    """
+
+    FIELDS = (
+        "current_state",
+        "current_leg",
+        "last_gate",
+        "last_gate_time_offset",
+        "passed_starting_gate",
+        "passed_finish_gate",
+    )
+
+    def __init__(self, contestant_track: ContestantTrack, websocket_facade: WebsocketFacade):
+        self.contestant_track = contestant_track
+        self.websocket_facade = websocket_facade
+        self.values = {field: getattr(contestant_track, field) for field in self.FIELDS}
+        self.dirty = set()
+        self.push_pending = False
+        self.last_push = 0
+
+    def _set(self, **values):
+        for field, value in values.items():
+            if self.values[field] != value:
+                self.values[field] = value
+                self.dirty.add(field)
+
+    def update_current_state(self, state: str):
+        self._set(current_state=state)
+
+    def update_current_leg(self, current_leg: str):
+        self._set(current_leg=current_leg)
+
+    def update_last_gate(self, gate_name: str, time_difference: float):
+        self._set(last_gate=gate_name, last_gate_time_offset=time_difference)
+
+    def set_passed_starting_gate(self):
+        self._set(passed_starting_gate=True)
+
+    def set_passed_finish_gate(self):
+        self._set(passed_finish_gate=True)
+
+    def flush(self, force_push: bool = False):
+        """
+        Write changed fields to the database, and push the contestant track to the front end if it has changed and
+        the previous push was more than PUSH_INTERVAL seconds ago (or force_push is set). A change that is held back
+        is pushed by a later flush.
+        """
+        if len(self.dirty) > 0:
+            values = {field: self.values[field] for field in self.dirty}
+            # Only touch the row if the stored values differ from ours
+            ContestantTrack.objects.filter(pk=self.contestant_track.pk).exclude(**values).update(**values)
+            for field, value in values.items():
+                setattr(self.contestant_track, field, value)
+            self.dirty.clear()
+            self.push_pending = True
+        if self.push_pending and (force_push or time.monotonic() - self.last_push >= PUSH_INTERVAL):
+            self.websocket_facade.transmit_basic_information(self.contestant_track.contestant)
+            self.last_push = time.monotonic()
+            self.push_pending = False
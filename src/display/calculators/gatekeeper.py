@@ -4,8 +4,9 @@ import threading
 import time
 from abc import abstractmethod, ABC
 from queue import Queue
-from typing import List, Optional, Callable
+from typing import List, Optional, Callable, Tuple
 
+from display.calculators.contestant_track_state import ContestantTrackState
 from display.calculators.update_score_message import UpdateScoreMessage
 from websocket_channels import WebsocketFacade
 
@@ -42,6 +43,7 @@ class Gatekeeper(ABC):
         contestant: "Contestant",
         score_processing_queue: Queue,
         calculators: List[Callable],
+        websocket_facade: Optional[WebsocketFacade] = None,
     ):
         super().__init__()
         logger.info(f"{contestant}: Created gatekeeper")
@@ -64,8 +66,10 @@ class Gatekeeper(ABC):
         self.last_gate = None  # type: Optional[Gate]
         self.previous_last_gate = None  # type: Optional[Gate]
         self.projector = Projector(self.gates[0].latitude, self.gates[0].longitude)
+        self.prepared_projector = None  # type: Optional[Projector]
         self.in_range_of_gate = None
-        self.websocket_facade = WebsocketFacade()
+        self.websocket_facade = websocket_facade or WebsocketFacade()
+        self.track_state = ContestantTrackState(self.contestant.contestanttrack, self.websocket_facade)
         logger.debug(f"{self.contestant}: Starting calculators")
 
         self.calculators = []
@@ -77,6 +81,7 @@ class Gatekeeper(ABC):
                     self.gates,
                     self.contestant.navigation_task.route,
                     self.score_processing_queue,
+                    self.track_state,
                 )
             )
 
@@ -177,7 +182,7 @@ class Gatekeeper(ABC):
 
     def passed_finishpoint(self):
         if not self.has_passed_finishpoint:
-            self.contestant.contestanttrack.set_passed_finish_gate()
+            self.track_state.set_passed_finish_gate()
             self.has_passed_finishpoint = True
             for calculator in self.calculators:
                 calculator.passed_finishpoint(self.track, self.last_gate)
@@ -209,10 +214,21 @@ class Gatekeeper(ABC):
             self.contestant, final_danger_level, final_accumulated_score
         )
 
+    def prepare_projector(self):
+        """
+        Register all the gate lines with the projector, so that each track segment is tested against all of them in a
+        single vectorised operation. This is done lazily, since the gatekeeper subclasses replace the projector in
+        their constructors.
+        """
+        if self.prepared_projector is not self.projector:
+            self.projector.prepare_lines(self.get_gate_lines())
+            self.prepared_projector = self.projector
+
     def calculate_score(self, position: Position):
         """
         Calculate the score. Is called once for every received (or interpolated) position.
         """
+        self.prepare_projector()
         self.track.append(position)
         self.check_gates()
         for calculator in self.calculators:
@@ -228,6 +244,37 @@ class Gatekeeper(ABC):
         if self.last_danger_level_report + DANGER_LEVEL_REPORT_INTERVAL < time.time():
             self.last_danger_level_report = time.time()
             self.report_calculator_danger_level()
+        self.track_state.flush()
+
+    @staticmethod
+    def _gate_lines(gate: Gate) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+        return [line for line in (gate.gate_line, gate.gate_line_infinite, gate.gate_line_extended) if line]
+
+    def get_gate_lines(self) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+        """
+        All gate lines (actual, infinite, and extended) that the track may be tested against.
+        """
+        gates = list(self.gates)
+        if self.takeoff_gate is not None:
+            gates.extend(self.takeoff_gate.gates)
+        if self.landing_gate is not None:
+            gates.extend(self.landing_gate.gates)
+        return [line for gate in gates for line in self._gate_lines(gate)]
+
+    def calculate_score_many(self, positions: List[Position]):
+        """
+        Calculate the score for a contiguous block of positions. This gives exactly the same result as calling
+        calculate_score for each position, but the track segments of the entire block are tested against all the gate
+        lines in a single vectorised operation before the positions are processed.
+        """
+        if len(positions) == 0:
+            return
+        self.prepare_projector()
+        # Gate intersections are tested for the segment from track[-3] to track[-1]
+        segment_track = [(position.latitude, position.longitude) for position in self.track[-2:] + positions]
+        self.projector.prepare_segments(segment_track[:-2], segment_track[2:])
+        for position in positions:
+            self.calculate_score(position)
 
     def finished_processing(self):
         """
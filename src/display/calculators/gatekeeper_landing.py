@@ -1,7 +1,7 @@
 import datetime
 import logging
 from multiprocessing import Queue
-from typing import List, Callable
+from typing import List, Callable, Optional
 
 from display.calculators.gatekeeper import Gatekeeper
 from display.calculators.positions_and_gates import Gate, MultiGate
@@ -9,6 +9,7 @@ from display.calculators.update_score_message import UpdateScoreMessage
 from display.utilities.route_building_utilities import calculate_extended_gate
 from display.utilities.coordinate_utilities import Projector
 from display.models import Contestant, ANOMALY
+from websocket_channels import WebsocketFacade
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +27,9 @@ class GatekeeperLanding(Gatekeeper):
         contestant: "Contestant",
         score_processing_queue: Queue,
         calculators: List[Callable],
+        websocket_facade: Optional[WebsocketFacade] = None,
     ):
-        super().__init__(contestant, score_processing_queue, calculators)
+        super().__init__(contestant, score_processing_queue, calculators, websocket_facade)
         self.last_intersection = None
         self.landing_gate = MultiGate(
             [
@@ -48,6 +50,7 @@ class GatekeeperLanding(Gatekeeper):
                     self.gates,
                     self.contestant.navigation_task.route,
                     self.update_score,
+                    self.track_state,
                 )
             )
 
@@ -55,7 +58,7 @@ class GatekeeperLanding(Gatekeeper):
         if self.landing_gate is not None:
             intersection_time = self.landing_gate.get_gate_intersection_time(self.projector, self.track)
             if intersection_time:
-                self.contestant.contestanttrack.updates_current_state("Tracking")
+                self.track_state.update_current_state("Tracking")
                 if self.last_intersection is None or intersection_time > self.last_intersection + datetime.timedelta(
                     seconds=30
                 ):
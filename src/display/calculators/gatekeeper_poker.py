@@ -1,11 +1,12 @@
 import datetime
 import logging
 from multiprocessing.queues import Queue
-from typing import List, Callable
+from typing import List, Callable, Optional
 
 from display.calculators.calculator_utilities import PolygonHelper
 from display.calculators.gatekeeper import Gatekeeper
 from display.models import Contestant, PlayingCard
+from websocket_channels import WebsocketFacade
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +23,9 @@ class GatekeeperPoker(Gatekeeper):
         contestant: "Contestant",
         score_processing_queue: Queue,
         calculators: List[Callable],
+        websocket_facade: Optional[WebsocketFacade] = None,
     ):
-        super().__init__(contestant, score_processing_queue, calculators)
+        super().__init__(contestant, score_processing_queue, calculators, websocket_facade)
         logger.info(f"Starting the GatekeeperPoker for contestant {self.contestant}")
         self.gate_polygons = []
         waypoint = self.contestant.navigation_task.route.waypoints[0]
@@ -44,7 +46,7 @@ class GatekeeperPoker(Gatekeeper):
 
     def finished_processing(self):
         super().finished_processing()
-        self.contestant.contestanttrack.updates_current_state("Finished")
+        self.track_state.update_current_state("Finished")
 
     def check_gates(self):
         if len(self.sorted_polygons) > 0:
@@ -59,5 +61,5 @@ class GatekeeperPoker(Gatekeeper):
                 )
                 self.sorted_polygons.pop(0)
                 if self.first_gate:
-                    self.contestant.contestanttrack.updates_current_state("Tracking")
+                    self.track_state.update_current_state("Tracking")
                     self.first_gate = False
@@ -16,6 +16,7 @@ from display.utilities.coordinate_utilities import (
     nv_intersect,
 )
 from display.models import Contestant, INFORMATION, ANOMALY
+from websocket_channels import WebsocketFacade
 
 logger = logging.getLogger(__name__)
 
@@ -37,8 +38,9 @@ class GatekeeperRoute(Gatekeeper):
         contestant: "Contestant",
         score_processing_queue: Queue,
         calculators: List[Callable],
+        websocket_facade: Optional[WebsocketFacade] = None,
     ):
-        super().__init__(contestant, score_processing_queue, calculators)
+        super().__init__(contestant, score_processing_queue, calculators, websocket_facade)
         self.scorecard = self.contestant.navigation_task.scorecard
         self.last_backwards = None
         self.last_crossing_time_transmission = 0
@@ -55,6 +57,9 @@ class GatekeeperRoute(Gatekeeper):
             self.takeoff_gate = None
         self.in_range_of_gate = None
 
+    def get_gate_lines(self) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+        return super().get_gate_lines() + self._gate_lines(self.starting_line)
+
     def recalculate_gates_times_from_start_time(self, start_time: datetime.datetime):
         """
         Calculate expected crossing times for all outstanding gates given the start time.
@@ -548,7 +553,7 @@ class GatekeeperRoute(Gatekeeper):
             elif gate.passing_time is not None:
                 index += 1
                 time_difference = (gate.passing_time - gate.expected_time).total_seconds()
-                self.contestant.contestanttrack.update_last_gate(gate.name, time_difference)
+                self.track_state.update_last_gate(gate.name, time_difference)
                 if gate.time_check:
                     gate_score = self.scorecard.get_gate_timing_score_for_gate_type(
                         gate.type, gate.expected_time, gate.passing_time
@@ -0,0 +1,197 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction, connections
+
+from display.calculators.calculator_factory import calculator_factory
+from display.calculators.contestant_processor import (
+    ContestantProcessor,
+    ScoreAccumulator,
+    create_score_entry,
+    POSITION_BATCH_SIZE,
+)
+from display.calculators.positions_and_gates import Position
+from display.calculators.score_sink import ScoreSink
+from display.models import Contestant, ContestantReceivedPosition, ContestantUploadedTrack
+from display.utilities.calculator_running_utilities import is_calculator_running
+from websocket_channels import WebsocketFacade
+
+logger = logging.getLogger(__name__)
+
+
+class SilentWebsocketFacade:
+    """
+    Used in place of the WebsocketFacade by the calculators when rescoring offline. Nothing is sent to the front end
+    while processing, the clients are notified once the contestant has been rescored.
+    """
+
+    def transmit_basic_information(self, contestant: "Contestant"):
+        pass
+
+    def transmit_danger_estimate_and_accumulated_penalty(
+        self, contestant: "Contestant", danger_level: float, accumulated_score: float
+    ):
+        pass
+
+    def transmit_seconds_to_crossing_time_and_crossing_estimate(
+        self,
+        contestant: "Contestant",
+        waypoint_name: str,
+        seconds_to_planned_crossing: float,
+        crossing_offset_estimate: float,
+        score: float,
+        final: bool,
+        missed: bool,
+    ):
+        pass
+
+    def transmit_score_delta(self, contestant: "Contestant", since: int) -> int:
+        return since
+
+
+def build_positions(
+    contestant: "Contestant", track: List[Dict]
+) -> Tuple[List[Position], List[ContestantReceivedPosition]]:
+    """
+    Convert the traccar position reports to positions for the gatekeeper, dropping old and duplicate positions, and
+    to the (interpolated) received positions stored for the track, in the same way as the ContestantProcessor.
+    """
+    positions = []
+    received_positions = []
+    previous_position = None
+    for position_data in track:
+        position = Position(
+            **contestant.generate_position_block_for_contestant(position_data, position_data["device_time"])
+        )
+        if previous_position and (
+            (position.latitude == previous_position.latitude and position.longitude == previous_position.longitude)
+            or previous_position.time >= position.time
+        ):
+            continue
+        positions.append(position)
+        for interpolated_position in ContestantProcessor.interpolate_track(previous_position, position):
+            received_positions.append(
+                ContestantReceivedPosition(
+                    contestant=contestant,
+                    time=interpolated_position.time,
+                    latitude=interpolated_position.latitude,
+                    longitude=interpolated_position.longitude,
+                    course=interpolated_position.course,
+                    speed=interpolated_position.speed,
+                    altitude=interpolated_position.altitude,
+                    interpolated=interpolated_position.interpolated,
+                )
+            )
+        previous_position = position
+    return positions, received_positions
+
+
+def rescore_contestant(contestant: "Contestant", track: Optional[List[Dict]] = None) -> float:
+    """
+    Score the complete track of the contestant in process, without going through the position queue and the live
+    contestant processor. Everything is written in a single transaction. Returns the score.
+
+    :param track: Traccar position reports. If None, the track is fetched from traccar.
+    """
+    if track is None:
+        track = contestant.get_traccar_track()
+    positions, received_positions = build_positions(contestant, track)
+    websocket_facade = SilentWebsocketFacade()
+    score_processing_queue = Queue()
+    with transaction.atomic():
+        contestant.reset_track_and_score()
+        contestant.contestantreceivedposition_set.all().delete()
+        contestant.contestanttrack.set_calculator_started()
+        ContestantReceivedPosition.objects.bulk_create(received_positions, batch_size=1000)
+        gatekeeper = calculator_factory(contestant, score_processing_queue, websocket_facade)
+        for index in range(0, len(positions), POSITION_BATCH_SIZE):
+            gatekeeper.calculate_score_many(positions[index : index + POSITION_BATCH_SIZE])
+        gatekeeper.finished_processing()
+        gatekeeper.track_state.flush(force_push=True)
+        score_sink = ScoreSink(contestant, websocket_facade)
+        accumulated_scores = ScoreAccumulator()
+        while True:
+            try:
+                update_score_message = score_processing_queue.get_nowait()
+            except Empty:
+                break
+            score_sink.add(*create_score_entry(contestant, accumulated_scores, update_score_message))
+        score = score_sink.flush()
+        contestant.contestanttrack.set_calculator_finished()
+    logger.info(f"{contestant}: Rescored {len(positions)} positions with score {score}")
+    return score
+
+
+def _rescore_contestant_pk(contestant_pk: int, track: Optional[List[Dict]]) -> Optional[float]:
+    """
+    Process pool and celery task entry point
+    """
+    try:
+        return rescore_contestant(Contestant.objects.get(pk=contestant_pk), track)
+    except Exception:
+        logger.exception(f"Failed rescoring contestant {contestant_pk}")
+        return None
+    finally:
+        connections.close_all()
+
+
+def rescore_contestants(contestants: List["Contestant"], processes: Optional[int] = None) -> Dict[int, float]:
+    """
+    Rescore the contestants in parallel across a pool of processes. The uploaded tracks are loaded in bulk, any other
+    tracks are fetched from traccar by the process rescoring the contestant. Contestants with a running calculator are
+    skipped.
+
+    :param processes: Number of processes, defaults to the number of CPUs. If 1, the contestants are rescored in this
+    process. This is also the case when called from a daemonic process (e.g. a celery worker), which is not allowed to
+    have children.
+    :return: The new score for each contestant primary key, contestants that failed are left out
+    """
+    contestants = contestants_to_rescore(contestants)
+    uploaded_tracks = {
+        uploaded_track.contestant_id: uploaded_track.track
+        for uploaded_track in ContestantUploadedTrack.objects.filter(contestant__in=contestants)
+    }
+    if multiprocessing.current_process().daemon and processes != 1:
+        logger.warning("Cannot start a process pool from a daemonic process, rescoring contestants in this process")
+        processes = 1
+    if processes == 1 or len(contestants) <= 1:
+        scores = {
+            contestant.pk: _rescore_contestant_pk(contestant.pk, uploaded_tracks.get(contestant.pk))
+            for contestant in contestants
+        }
+    else:
+        # The forked processes must not share the database connections of this process
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork")) as executor:
+            futures = {
+                contestant.pk: executor.submit(
+                    _rescore_contestant_pk, contestant.pk, uploaded_tracks.get(contestant.pk)
+                )
+                for contestant in contestants
+            }
+            scores = {contestant_pk: future.result() for contestant_pk, future in futures.items()}
+    transmit_rescored_contestants([contestant for contestant in contestants if scores[contestant.pk] is not None])
+    return {contestant_pk: score for contestant_pk, score in scores.items() if score is not None}
+
+
+def contestants_to_rescore(contestants: List["Contestant"]) -> List["Contestant"]:
+    """
+    :return: The contestants that do not have a running calculator
+    """
+    running = [contestant for contestant in contestants if is_calculator_running(contestant.pk)]
+    for contestant in running:
+        logger.warning(f"{contestant}: Calculator is running, will not rescore")
+    return [contestant for contestant in contestants if contestant not in running]
+
+
+def transmit_rescored_contestants(contestants: List["Contestant"]):
+    """
+    Replace the rescored contestants in the clients
+    """
+    websocket_facade = WebsocketFacade()
+    for contestant in contestants:
+        websocket_facade.transmit_delete_contestant(contestant)
+        websocket_facade.transmit_contestant(contestant)
@@ -3,7 +3,8 @@ from multiprocessing import Queue
 from typing import List, Optional
 
 from display.calculators.calculator import Calculator
-from display.calculators.calculator_utilities import PolygonHelper, get_shortest_intersection_time
+from display.calculators.contestant_track_state import ContestantTrackState
+from display.calculators.calculator_utilities import PolygonHelper, get_shortest_intersection_time, ZoneIndex
 from display.calculators.positions_and_gates import Position, Gate
 from display.calculators.update_score_message import UpdateScoreMessage
 from display.models import Contestant, Scorecard, Route, INFORMATION, ANOMALY
@@ -25,8 +26,9 @@ class PenaltyZoneCalculator(Calculator):
         gates: List["Gate"],
         route: "Route",
         score_processing_queue: Queue,
+        track_state: Optional["ContestantTrackState"] = None,
     ):
-        super().__init__(contestant, scorecard, gates, route, score_processing_queue)
+        super().__init__(contestant, scorecard, gates, route, score_processing_queue, track_state)
         self.inside_zones = set()
         self.running_penalty = {}
         self.gates = gates
@@ -40,6 +42,7 @@ class PenaltyZoneCalculator(Calculator):
         zones = route.prohibited_set.filter(type="penalty")
         for zone in zones:
             self.zone_polygons.append((zone.name, self.polygon_helper.build_polygon(zone.path)))
+        self.zone_index = ZoneIndex(self.polygon_helper, self.zone_polygons)
 
     def passed_finishpoint(self, track: List["Position"], last_gate: "Gate"):
         pass
@@ -72,9 +75,7 @@ class PenaltyZoneCalculator(Calculator):
     def check_inside_prohibited_zone(self, track: List["Position"], last_gate: Optional["Gate"]):
         position = track[-1]
         already_inside = list(self.entered_polygon_times.keys())
-        currently_inside = self.polygon_helper.check_inside_polygons(
-            self.zone_polygons, position.latitude, position.longitude
-        )
+        currently_inside = self.zone_index.check_inside(position.latitude, position.longitude)
         for inside in currently_inside:
             if inside not in self.entered_polygon_times:
                 self.entered_polygon_times[inside] = position.time
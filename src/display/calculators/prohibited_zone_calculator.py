@@ -4,7 +4,8 @@ from multiprocessing import Queue
 from typing import List, Optional
 
 from display.calculators.calculator import Calculator
-from display.calculators.calculator_utilities import PolygonHelper, get_shortest_intersection_time
+from display.calculators.contestant_track_state import ContestantTrackState
+from display.calculators.calculator_utilities import PolygonHelper, get_shortest_intersection_time, ZoneIndex
 from display.calculators.positions_and_gates import Position, Gate
 from display.calculators.update_score_message import UpdateScoreMessage
 from display.models import Contestant, Scorecard, Route
@@ -26,8 +27,9 @@ class ProhibitedZoneCalculator(Calculator):
         gates: List["Gate"],
         route: "Route",
         score_processing_queue: Queue,
+        track_state: Optional["ContestantTrackState"] = None,
     ):
-        super().__init__(contestant, scorecard, gates, route, score_processing_queue)
+        super().__init__(contestant, scorecard, gates, route, score_processing_queue, track_state)
         self.inside_zones = {}
         self.zones_scored = set()
         self.gates = gates
@@ -42,6 +44,7 @@ class ProhibitedZoneCalculator(Calculator):
         zones = route.prohibited_set.filter(type="prohibited")
         for zone in zones:
             self.zone_polygons.append((zone.name, self.polygon_helper.build_polygon(zone.path)))
+        self.zone_index = ZoneIndex(self.polygon_helper, self.zone_polygons)
 
     def passed_finishpoint(self, track: List["Position"], last_gate: "Gate"):
         pass
@@ -74,9 +77,7 @@ class ProhibitedZoneCalculator(Calculator):
     def check_inside_prohibited_zone(self, track: List["Position"], last_gate: Optional["Gate"]):
         position = track[-1]
         inside_this_time = set()
-        for inside in self.polygon_helper.check_inside_polygons(
-            self.zone_polygons, position.latitude, position.longitude
-        ):
+        for inside in self.zone_index.check_inside(position.latitude, position.longitude):
             inside_this_time.add(inside)
             if inside not in self.inside_zones:
                 self.inside_zones[inside] = position.time
@@ -0,0 +1,83 @@
+import logging
+from collections import defaultdict
+from typing import List, Tuple, Dict
+
+from django.db import transaction, connection
+from django.db.models import F
+
+from display.models import Contestant, ScoreLogEntry, TrackAnnotation, GateCumulativeScore
+from websocket_channels import WebsocketFacade, get_score_sequence
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreSink:
+    """
+    Collects the score log entries, track annotations, and gate scores produced by the score updates of a calculator,
+    and writes them to the database in one transaction when flushed. The contestant score is changed with a single
+    relative update, and the front end receives one combined message per flush with only the new entries instead of
+    one set of messages per score update. This keeps the score thread up to date with the track when the calculators
+    produce bursts of score updates, e.g. when an ANR contestant is outside the corridor.
+    """
+
+    def __init__(self, contestant: Contestant, websocket_facade: WebsocketFacade):
+        self.contestant = contestant
+        self.websocket_facade = websocket_facade
+        self.entries = []  # type: List[Tuple[ScoreLogEntry, TrackAnnotation]]
+        self.gate_scores = defaultdict(float)  # type: Dict[str, float]
+        self.score_change = 0
+        # Sequence number of the latest score log entry transmitted to the front end
+        self.sequence = get_score_sequence(contestant)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: ScoreLogEntry, annotation: TrackAnnotation, points: float):
+        """
+        Buffer an unsaved score log entry together with its unsaved track annotation. The points are added to the
+        cumulative score of the entry's gate and to the contestant score.
+        """
+        self.entries.append((entry, annotation))
+        self.gate_scores[entry.gate] += points
+        self.score_change += points
+
+    def flush(self) -> float:
+        """
+        Write everything that has been added since the last flush and push the changes to the front end. Returns the
+        contestant score.
+        """
+        contestant_track = self.contestant.contestanttrack
+        if len(self.entries) == 0:
+            return contestant_track.score
+        entries, gate_scores, score_change = self.entries, self.gate_scores, self.score_change
+        self.entries, self.gate_scores, self.score_change = [], defaultdict(float), 0
+        with transaction.atomic():
+            self._create_entries(entries)
+            GateCumulativeScore.objects.bulk_create(
+                [GateCumulativeScore(contestant=self.contestant, gate=gate) for gate in gate_scores],
+                ignore_conflicts=True,
+            )
+            for gate, points in gate_scores.items():
+                if points != 0:
+                    GateCumulativeScore.objects.filter(contestant=self.contestant, gate=gate).update(
+                        points=F("points") + points
+                    )
+            if score_change != 0:
+                contestant_track.increment_score(score_change)
+        self.sequence = self.websocket_facade.transmit_score_delta(self.contestant, self.sequence)
+        logger.debug(f"{self.contestant}: Flushed {len(entries)} score updates, score is {contestant_track.score}")
+        return contestant_track.score
+
+    @staticmethod
+    def _create_entries(entries: List[Tuple[ScoreLogEntry, TrackAnnotation]]):
+        log_entries = [entry for entry, _ in entries]
+        if connection.features.can_return_rows_from_bulk_insert:
+            ScoreLogEntry.objects.bulk_create(log_entries)
+        else:
+            # The annotations reference the score log entries, so the primary keys are needed. MySQL does not return
+            # them from bulk inserts.
+            for entry in log_entries:
+                entry.save()
+        for entry, annotation in entries:
+            annotation.score_log_entry = entry
+        TrackAnnotation.objects.bulk_create([annotation for _, annotation in entries])
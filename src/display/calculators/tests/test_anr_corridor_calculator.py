@@ -28,24 +28,22 @@ from display.models import (
     EditableRoute,
 )
 from utilities.mock_utilities import TraccarMock
-from redis_queue import RedisQueue
+from redis_queue import RedisStreamQueue
 
 logger = logging.getLogger(__name__)
 
 
 def calculator_runner(contestant, track):
-    q = RedisQueue(contestant.pk)
+    q = RedisStreamQueue(contestant.pk)
     contestant_processor = ContestantProcessor(contestant, live_processing=False)
     for i in track:
         i["id"] = 0
         i["deviceId"] = ""
         i["attributes"] = {}
         i["device_time"] = dateutil.parser.parse(i["time"])
-        q.append(i)
-    q.append(None)
+    q.extend(track + [None])
     contestant_processor.run()
-    while not q.empty():
-        q.pop()
+    q.clear()
 
 
 @patch("display.calculators.contestant_processor.get_traccar_instance", return_value=TraccarMock)
@@ -194,14 +192,14 @@ class TestANRPerLeg(TransactionTestCase):
             wind_direction=160,
             wind_speed=0,
         )
-        q = RedisQueue(self.contestant.pk)
+        q = RedisStreamQueue(self.contestant.pk)
         contestant_processor = ContestantProcessor(self.contestant, live_processing=True)
         for i in track:
             i["id"] = 0
             i["deviceId"] = ""
             i["attributes"] = {}
             i["device_time"] = dateutil.parser.parse(i["time"])
-            q.append(i)
+        q.extend(track)
         threading.Timer(1, lambda: self.contestant.request_calculator_termination()).start()
         contestant_processor.run()
         contestant_track = ContestantTrack.objects.get(contestant=self.contestant)
@@ -0,0 +1,107 @@
+import datetime
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from display.calculators.buffered_data_prefetcher import BufferedDataPrefetcher
+
+START_TIME = datetime.datetime(2021, 9, 17, 10, tzinfo=datetime.timezone.utc)
+
+
+def position(seconds: int, device_id: int = 1) -> dict:
+    return {"deviceId": device_id, "device_time": START_TIME + datetime.timedelta(seconds=seconds)}
+
+
+class TestBufferedDataPrefetcher(TestCase):
+    def setUp(self):
+        self.traccar = Mock()
+        self.release_backfill = threading.Event()
+        self.backfill = []
+
+        def iter_positions(device_id, start_time, finish_time, timeout=None):
+            self.release_backfill.wait(5)
+            return iter(self.backfill)
+
+        self.traccar.iter_positions_for_device_id.side_effect = iter_positions
+        self.delivered = []
+        self.delivered_condition = threading.Condition()
+        self.prefetcher = BufferedDataPrefetcher(self.traccar, START_TIME, self.deliver, minimum_interval=60)
+        self.addCleanup(self.prefetcher.close)
+
+    def deliver(self, positions):
+        with self.delivered_condition:
+            self.delivered.extend(positions)
+            self.delivered_condition.notify_all()
+
+    def wait_for_delivered(self, count: int):
+        with self.delivered_condition:
+            self.assertTrue(self.delivered_condition.wait_for(lambda: len(self.delivered) >= count, timeout=5))
+
+    def delivered_seconds(self):
+        return [
+            (item["device_time"] - START_TIME).total_seconds() if item is not None else None for item in self.delivered
+        ]
+
+    def test_positions_without_gap_are_delivered_immediately(self):
+        for seconds in range(1, 5):
+            self.prefetcher.add(position(seconds))
+        self.assertEqual([1, 2, 3, 4], self.delivered_seconds())
+        self.traccar.iter_positions_for_device_id.assert_not_called()
+
+    def test_gap_is_backfilled_in_time_order(self):
+        self.prefetcher.seed([position(1)])
+        self.backfill = [position(3), position(4), position(5)]
+        self.prefetcher.add(position(20))
+        self.prefetcher.add(position(21))
+        self.prefetcher.add(None)
+        # Held back while the backfill is outstanding
+        self.assertEqual([], self.delivered)
+        self.release_backfill.set()
+        self.wait_for_delivered(6)
+        self.assertEqual([3, 4, 5, 20, 21, None], self.delivered_seconds())
+        _, start_time, finish_time = self.traccar.iter_positions_for_device_id.call_args.args
+        self.assertEqual(START_TIME + datetime.timedelta(seconds=2), start_time)
+        self.assertEqual(START_TIME + datetime.timedelta(seconds=19), finish_time)
+        self.assertEqual(3, self.prefetcher.metrics()["positions_recovered"])
+
+    def test_backfilled_duplicates_are_removed(self):
+        self.prefetcher.seed([position(1), position(3)])
+        self.backfill = [position(3), position(4)]
+        self.release_backfill.set()
+        self.prefetcher.add(position(20))
+        self.wait_for_delivered(2)
+        self.assertEqual([4, 20], self.delivered_seconds())
+
+    def test_failed_backfill_releases_held_positions(self):
+        self.traccar.iter_positions_for_device_id.side_effect = Exception("Traccar is down")
+        self.prefetcher.seed([position(1)])
+        self.prefetcher.add(position(20))
+        self.wait_for_delivered(1)
+        self.assertEqual([20], self.delivered_seconds())
+        self.assertEqual(1, self.prefetcher.metrics()["failed_backfills"])
+
+    def test_rate_limited_gap_does_not_hold_positions(self):
+        self.release_backfill.set()
+        self.prefetcher.seed([position(1)])
+        self.prefetcher.add(position(20))
+        self.wait_for_delivered(1)
+        self.prefetcher.add(position(40))
+        self.prefetcher.add(position(41))
+        # Delivered immediately while the gap is waiting for the rate limit
+        self.assertEqual([20, 40, 41], self.delivered_seconds())
+        self.assertEqual(1, self.traccar.iter_positions_for_device_id.call_count)
+        self.assertEqual(1, self.prefetcher.metrics()["rate_limited_backfills"])
+
+    @patch("display.calculators.buffered_data_prefetcher.BACKFILL_TIMEOUT", 0.1)
+    def test_slow_backfill_releases_held_positions(self):
+        self.prefetcher.seed([position(1)])
+        self.backfill = [position(3)]
+        self.prefetcher.add(position(20))
+        self.assertEqual([], self.delivered)
+        time.sleep(0.2)
+        self.prefetcher.add(position(21))
+        self.assertEqual([20, 21], self.delivered_seconds())
+        self.release_backfill.set()
+        self.wait_for_delivered(3)
+        self.assertEqual([20, 21, 3], self.delivered_seconds())
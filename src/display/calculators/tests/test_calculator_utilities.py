@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from display.calculators.calculator_utilities import project_position, PolygonHelper
+from display.calculators.calculator_utilities import project_position, PolygonHelper, ZoneIndex
 
 
 class TestProjectPosition(TestCase):
@@ -39,3 +39,49 @@ class TestPolygonHelper(TestCase):
         intersection_times = helper.time_to_intersection([("test", polygon)], 59.999, 11.5, 0, 6, 0, 600)
         print(intersection_times)
         self.assertEqual({'test': 72}, intersection_times)
+
+    def test_time_to_intersection_from_inside(self):
+        helper = PolygonHelper(60, 11)
+        polygon = helper.build_polygon([(60, 11), (60, 12), (61, 12), (61, 11)])
+        intersection_times = helper.time_to_intersection(
+            [("test", polygon)], 60.01, 11.5, 180, 60, 0, 600, from_inside=True
+        )
+        self.assertEqual({"test": 36}, intersection_times)
+
+    def test_time_to_intersection_out_of_range(self):
+        helper = PolygonHelper(60, 11)
+        polygon = helper.build_polygon([(60, 11), (60, 12), (61, 12), (61, 11)])
+        self.assertEqual({}, helper.time_to_intersection([("test", polygon)], 59.9, 11.5, 0, 6, 0, 60))
+
+
+class TestZoneIndex(TestCase):
+    def setUp(self):
+        self.helper = PolygonHelper(60, 11)
+        self.zones = [
+            ("first", self.helper.build_polygon([(60, 11), (60, 12), (61, 12), (61, 11)])),
+            ("second", self.helper.build_polygon([(60.5, 11.5), (60.5, 13), (62, 13), (62, 11.5)])),
+        ]
+        self.index = ZoneIndex(self.helper, self.zones)
+
+    def test_check_inside_matches_polygon_helper(self):
+        for latitude, longitude in [(59.9, 11.5), (60.2, 11.2), (60.7, 11.7), (61.5, 12.5)]:
+            self.assertListEqual(
+                self.helper.check_inside_polygons(self.zones, latitude, longitude),
+                self.index.check_inside(latitude, longitude),
+            )
+
+    def test_contains_many(self):
+        inside = self.index.contains_many([59.9, 60.2, 60.7, 61.5], [11.5, 11.2, 11.7, 12.5])
+        self.assertListEqual([[False, False], [True, False], [True, True], [False, True]], inside.tolist())
+
+    def test_distances_match_polygon_helper(self):
+        self.assertDictEqual(
+            self.helper.distance_from_point_to_polygons(self.zones, 59.9, 11.5), self.index.distances(59.9, 11.5)
+        )
+        distances = self.index.distances_many([59.9, 60.2], [11.5, 11.2])
+        self.assertEqual((2, 2), distances.shape)
+
+    def test_empty(self):
+        index = ZoneIndex(self.helper, [])
+        self.assertListEqual([], index.check_inside(60.2, 11.2))
+        self.assertEqual((1, 0), index.contains_many([60.2], [11.2]).shape)
@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import Future
+from queue import Queue
+from unittest import TestCase
+from unittest.mock import patch, Mock
+
+from display.calculators.calculator_worker import CalculatorWorker
+from display.calculators.contestant_processor import ContestantProcessor
+from display.utilities.calculator_worker_utilities import worker_for_contestant
+
+
+class TestCalculatorWorker(TestCase):
+    @patch("display.calculators.calculator_worker.get_worker_queue")
+    def setUp(self, *args):
+        self.worker = CalculatorWorker(1, 2)
+        self.worker.executor = Mock()
+        self.worker.executor.submit.side_effect = lambda *args: Future()
+
+    def test_worker_for_contestant(self):
+        self.assertListEqual([0, 1, 2, 0, 1], [worker_for_contestant(pk, 3) for pk in range(3, 8)])
+
+    def test_duplicate_request_is_ignored(self):
+        self.assertTrue(self.worker.start_calculator(3))
+        self.assertFalse(self.worker.start_calculator(3))
+        self.assertEqual(1, self.worker.executor.submit.call_count)
+
+    def test_restart_finished_calculator(self):
+        self.assertTrue(self.worker.start_calculator(3))
+        self.worker.calculators[3].set_result(None)
+        self.assertTrue(self.worker.start_calculator(3))
+        self.assertEqual(2, self.worker.executor.submit.call_count)
+
+
+class TestContestantProcessorThreads(TestCase):
+    """
+    Calculators in a calculator worker must not leave threads behind when they finish
+    """
+
+    def setUp(self):
+        self.processor = ContestantProcessor.__new__(ContestantProcessor)
+        self.processor.contestant = Mock(pk=3)
+        self.processor.live_processing = False
+        self.processor.score_processing_queue = Queue()
+        self.processor.score_sink = Mock()
+        self.processor.update_score_from_thread = Mock()
+        self.processor.buffered_data_prefetcher = Mock()
+
+    @patch("display.calculators.contestant_processor.connection")
+    def test_score_updater_thread_stops(self, connection):
+        thread = threading.Thread(target=self.processor.score_updater_thread, daemon=True)
+        thread.start()
+        message = Mock()
+        self.processor.score_processing_queue.put(message)
+        self.processor.score_processing_queue.put(None)
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.processor.update_score_from_thread.assert_called_once_with(message)
+        connection.close.assert_called_once()
+
+    def test_failing_calculator_stops_threads(self):
+        self.processor.process_positions = Mock(side_effect=RuntimeError)
+        with self.assertRaises(RuntimeError):
+            self.processor.run()
+        self.assertTrue(self.processor.track_terminated)
+        self.processor.buffered_data_prefetcher.close.assert_called_once()
+        self.assertIsNone(self.processor.score_processing_queue.get_nowait())
@@ -0,0 +1,68 @@
+import datetime
+from unittest.mock import patch, Mock
+
+from django.test import TransactionTestCase
+
+from display.calculators.contestant_track_state import ContestantTrackState
+from display.default_scorecards.default_scorecard_fai_precision_2020 import get_default_scorecard
+from display.models import NavigationTask, Contest, Route, Contestant, Aeroplane, Crew, Team, Person, ContestantTrack
+from utilities.mock_utilities import TraccarMock
+
+
+@patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+@patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+class TestContestantTrackState(TransactionTestCase):
+    @patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+    @patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+    def setUp(self, *args):
+        start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        contest = Contest.objects.create(
+            name="TestContest", start_time=start, finish_time=start + datetime.timedelta(hours=6)
+        )
+        navigation_task = NavigationTask.create(
+            name="NavigationTask",
+            original_scorecard=get_default_scorecard(),
+            start_time=start,
+            finish_time=start + datetime.timedelta(hours=6),
+            route=Route.objects.create(name="Route"),
+            contest=contest,
+        )
+        crew = Crew.objects.create(member1=Person.objects.create(first_name="Mister", last_name="Pilot"))
+        team = Team.objects.create(crew=crew, aeroplane=Aeroplane.objects.create(registration="registration"))
+        self.contestant = Contestant.objects.create(
+            team=team,
+            navigation_task=navigation_task,
+            takeoff_time=start,
+            contestant_number=1,
+            tracker_device_id="tracker",
+            tracker_start_time=start,
+            finished_by_time=start + datetime.timedelta(hours=1),
+        )
+        self.websocket_facade = Mock()
+        self.track_state = ContestantTrackState(self.contestant.contestanttrack, self.websocket_facade)
+
+    def test_changes_are_written_on_flush(self, *args):
+        self.track_state.update_current_state("Tracking")
+        self.track_state.update_last_gate("TP1", 3)
+        self.assertEqual("Waiting...", ContestantTrack.objects.get(contestant=self.contestant).current_state)
+        self.track_state.flush()
+        contestant_track = ContestantTrack.objects.get(contestant=self.contestant)
+        self.assertEqual("Tracking", contestant_track.current_state)
+        self.assertEqual("TP1", contestant_track.last_gate)
+        self.assertEqual(3, contestant_track.last_gate_time_offset)
+        self.assertEqual(1, self.websocket_facade.transmit_basic_information.call_count)
+
+    def test_unchanged_state_is_not_written(self, *args):
+        self.track_state.update_current_state("Waiting...")
+        self.track_state.flush()
+        self.websocket_facade.transmit_basic_information.assert_not_called()
+
+    def test_pushes_are_debounced(self, *args):
+        self.track_state.update_current_leg("SP")
+        self.track_state.flush()
+        self.track_state.update_current_leg("TP1")
+        self.track_state.flush()
+        self.assertEqual("TP1", ContestantTrack.objects.get(contestant=self.contestant).current_leg)
+        self.assertEqual(1, self.websocket_facade.transmit_basic_information.call_count)
+        self.track_state.flush(force_push=True)
+        self.assertEqual(2, self.websocket_facade.transmit_basic_information.call_count)
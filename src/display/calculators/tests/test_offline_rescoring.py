@@ -0,0 +1,163 @@
+import datetime
+from unittest.mock import patch, Mock
+
+import dateutil
+
+from django.test import TransactionTestCase
+
+from display.calculators.offline_rescoring import rescore_contestant, build_positions, rescore_contestants
+from display.calculators.tests.test_precision_calculator import load_track_points
+from display.tasks import rescore_navigation_task, rescore_contestant_task, transmit_rescored_contestants_task
+from display.models import (
+    Aeroplane,
+    NavigationTask,
+    Team,
+    Contestant,
+    ContestantTrack,
+    ContestantUploadedTrack,
+    Crew,
+    Contest,
+    Person,
+    EditableRoute,
+)
+from utilities.mock_utilities import TraccarMock
+
+
+def traccar_track(positions):
+    for i in positions:
+        i["id"] = 0
+        i["deviceId"] = ""
+        i["attributes"] = {}
+        i["device_time"] = dateutil.parser.parse(i["time"])
+    return positions
+
+
+@patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+@patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+class TestOfflineRescoring(TransactionTestCase):
+    @patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+    @patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+    def setUp(self, *args):
+        from display.default_scorecards import default_scorecard_fai_precision_2020
+
+        scorecard = default_scorecard_fai_precision_2020.get_default_scorecard()
+        with open("display/calculators/tests/NM.csv", "r") as file:
+            with patch(
+                "display.models.EditableRoute._create_route_and_thumbnail",
+                lambda name, r: EditableRoute.objects.create(name=name, route=r),
+            ):
+                editable_route, _ = EditableRoute.create_from_csv("Test", file.readlines()[1:])
+                route = editable_route.create_precision_route(True, scorecard)
+        self.navigation_task = navigation_task = NavigationTask.create(
+            name="NM navigation_task",
+            route=route,
+            original_scorecard=scorecard,
+            contest=Contest.objects.create(
+                name="contest",
+                start_time=datetime.datetime.now(datetime.timezone.utc),
+                finish_time=datetime.datetime.now(datetime.timezone.utc),
+                time_zone="Europe/Oslo",
+            ),
+            start_time=datetime.datetime(2020, 8, 1, 6, 0, 0).astimezone(),
+            finish_time=datetime.datetime(2020, 8, 1, 16, 0, 0).astimezone(),
+        )
+        # Required to make the time zone save correctly
+        navigation_task.refresh_from_db()
+        self.contestant = self.create_contestant(1, "LN-YDB")
+
+    def create_contestant(self, contestant_number: int, registration: str) -> Contestant:
+        crew = Crew.objects.create(
+            member1=Person.objects.create(first_name="Mister", last_name=f"Pilot {contestant_number}")
+        )
+        team = Team.objects.create(crew=crew, aeroplane=Aeroplane.objects.create(registration=registration))
+        start_time = datetime.datetime(2020, 8, 1, 9, 15, tzinfo=datetime.timezone.utc)
+        return Contestant.objects.create(
+            navigation_task=self.navigation_task,
+            team=team,
+            takeoff_time=start_time,
+            tracker_start_time=start_time - datetime.timedelta(minutes=30),
+            finished_by_time=start_time + datetime.timedelta(hours=2),
+            tracker_device_id=f"Test contestant {contestant_number}",
+            contestant_number=contestant_number,
+            minutes_to_starting_point=6,
+            air_speed=70,
+            wind_direction=165,
+            wind_speed=8,
+        )
+
+    def test_build_positions_drops_duplicates(self, *args):
+        track = traccar_track(load_track_points("display/calculators/tests/test_contestant_correct_track.gpx"))
+        positions, received_positions = build_positions(self.contestant, track)
+        repeated_positions, repeated_received_positions = build_positions(self.contestant, track + track[-1:])
+        self.assertEqual(len(positions), len(repeated_positions))
+        self.assertEqual(len(received_positions), len(repeated_received_positions))
+        self.assertGreaterEqual(len(received_positions), len(positions))
+
+    def test_rescore_correct_track(self, *args):
+        track = traccar_track(load_track_points("display/calculators/tests/test_contestant_correct_track.gpx"))
+        score = rescore_contestant(self.contestant, track)
+        contestant_track = ContestantTrack.objects.get(contestant=self.contestant)
+        # Same score as when running the contestant processor, see test_precision_calculator
+        self.assertEqual(222, contestant_track.score)
+        self.assertEqual(222, score)
+        self.assertTrue(contestant_track.calculator_finished)
+
+    def test_rescore_twice_gives_same_score(self, *args):
+        track = traccar_track(load_track_points("display/calculators/tests/test_contestant_correct_track.gpx"))
+        rescore_contestant(self.contestant, track)
+        rescore_contestant(self.contestant, track)
+        self.assertEqual(222, ContestantTrack.objects.get(contestant=self.contestant).score)
+
+    def upload_tracks(self):
+        second_contestant = self.create_contestant(2, "LN-YDC")
+        for contestant in (self.contestant, second_contestant):
+            ContestantUploadedTrack.objects.create(
+                contestant=contestant,
+                track=traccar_track(
+                    load_track_points("display/calculators/tests/test_contestant_correct_track.gpx")
+                ),
+            )
+        return [self.contestant, second_contestant]
+
+    def test_rescore_contestants_in_process(self, *args):
+        contestants = self.upload_tracks()
+        scores = rescore_contestants(contestants, processes=1)
+        self.assertDictEqual({contestant.pk: 222 for contestant in contestants}, scores)
+        for contestant in contestants:
+            self.assertEqual(222, ContestantTrack.objects.get(contestant=contestant).score)
+
+    @patch(
+        "display.calculators.offline_rescoring.multiprocessing.current_process", return_value=Mock(daemon=True)
+    )
+    def test_rescore_contestants_from_daemonic_process(self, *args):
+        """
+        Celery worker processes are daemonic and cannot start a process pool, the contestants must be rescored in
+        process
+        """
+        contestants = self.upload_tracks()
+        with patch("display.calculators.offline_rescoring.ProcessPoolExecutor") as process_pool:
+            scores = rescore_contestants(contestants, processes=4)
+        process_pool.assert_not_called()
+        self.assertDictEqual({contestant.pk: 222 for contestant in contestants}, scores)
+
+    def test_rescore_navigation_task_fans_out_per_contestant(self, *args):
+        contestants = self.upload_tracks()
+        with patch("display.tasks.chord") as chord:
+            rescore_navigation_task(self.navigation_task.pk)
+        header = list(chord.call_args.args[0])
+        self.assertCountEqual([(contestant.pk,) for contestant in contestants], [task.args for task in header])
+        self.assertSetEqual({rescore_contestant_task.name}, {task.task for task in header})
+        callback = chord.return_value.call_args.args[0]
+        self.assertEqual(transmit_rescored_contestants_task.name, callback.task)
+        # The scores are passed to the callback in the order of the header
+        self.assertEqual(([task.args[0] for task in header],), callback.args)
+
+    def test_rescore_contestant_task_uses_uploaded_track(self, *args):
+        self.upload_tracks()
+        self.assertEqual(222, rescore_contestant_task(self.contestant.pk))
+
+    def test_transmit_rescored_contestants_skips_failed(self, *args):
+        second_contestant = self.create_contestant(2, "LN-YDC")
+        with patch("display.tasks.transmit_rescored_contestants") as transmit:
+            transmit_rescored_contestants_task([222, None], [self.contestant.pk, second_contestant.pk])
+        transmit.assert_called_once_with([self.contestant])
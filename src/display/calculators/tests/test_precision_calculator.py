@@ -27,22 +27,20 @@ from display.models import (
     EditableRoute,
 )
 from utilities.mock_utilities import TraccarMock
-from redis_queue import RedisQueue
+from redis_queue import RedisStreamQueue
 
 
 def calculator_runner(contestant, track):
-    q = RedisQueue(contestant.pk)
+    q = RedisStreamQueue(contestant.pk)
     contestant_processor = ContestantProcessor(contestant, live_processing=False)
     for i in track:
         i["id"] = 0
         i["deviceId"] = ""
         i["attributes"] = {}
         i["device_time"] = dateutil.parser.parse(i["time"])
-        q.append(i)
-    q.append(None)
+    q.extend(track + [None])
     contestant_processor.run()
-    while not q.empty():
-        q.pop()
+    q.clear()
 
 
 def load_track_points(filename):
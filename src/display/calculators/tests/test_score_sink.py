@@ -0,0 +1,108 @@
+import datetime
+from unittest.mock import patch, Mock
+
+from django.test import TransactionTestCase
+
+from display.calculators.score_sink import ScoreSink
+from display.default_scorecards.default_scorecard_fai_precision_2020 import get_default_scorecard
+from display.models import (
+    NavigationTask,
+    Contest,
+    Route,
+    Contestant,
+    Aeroplane,
+    Crew,
+    Team,
+    Person,
+    ScoreLogEntry,
+    TrackAnnotation,
+    GateCumulativeScore,
+)
+from utilities.mock_utilities import TraccarMock
+from websocket_channels import generate_score_delta_block, get_score_sequence
+
+
+@patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+@patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+class TestScoreSink(TransactionTestCase):
+    @patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+    @patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+    def setUp(self, *args):
+        self.start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        contest = Contest.objects.create(
+            name="TestContest", start_time=self.start, finish_time=self.start + datetime.timedelta(hours=6)
+        )
+        navigation_task = NavigationTask.create(
+            name="NavigationTask",
+            original_scorecard=get_default_scorecard(),
+            start_time=self.start,
+            finish_time=self.start + datetime.timedelta(hours=6),
+            route=Route.objects.create(name="Route"),
+            contest=contest,
+        )
+        crew = Crew.objects.create(member1=Person.objects.create(first_name="Mister", last_name="Pilot"))
+        team = Team.objects.create(crew=crew, aeroplane=Aeroplane.objects.create(registration="registration"))
+        self.contestant = Contestant.objects.create(
+            team=team,
+            navigation_task=navigation_task,
+            takeoff_time=self.start,
+            contestant_number=1,
+            tracker_device_id="tracker",
+            tracker_start_time=self.start,
+            finished_by_time=self.start + datetime.timedelta(hours=1),
+        )
+        self.websocket_facade = Mock()
+        self.sink = ScoreSink(self.contestant, self.websocket_facade)
+
+    def add_entry(self, gate: str, points: float, seconds: int):
+        time = self.start + datetime.timedelta(seconds=seconds)
+        self.sink.add(
+            ScoreLogEntry(contestant=self.contestant, time=time, gate=gate, points=points, string=f"{gate} {points}"),
+            TrackAnnotation(contestant=self.contestant, time=time, gate=gate, latitude=60, longitude=11, message=""),
+            points,
+        )
+
+    def test_flush(self, *args):
+        self.add_entry("SP", 3, 0)
+        self.add_entry("TP1", 0, 10)
+        self.add_entry("TP1", 5, 20)
+        self.assertEqual(8, self.sink.flush())
+        self.assertListEqual(
+            ["SP 3", "TP1 0", "TP1 5"], [entry.string for entry in self.contestant.scorelogentry_set.all()]
+        )
+        self.assertListEqual(
+            ["SP 3", "TP1 0", "TP1 5"],
+            [annotation.score_log_entry.string for annotation in self.contestant.trackannotation_set.all()],
+        )
+        self.assertDictEqual(
+            {"SP": 3, "TP1": 5},
+            {score.gate: score.points for score in GateCumulativeScore.objects.filter(contestant=self.contestant)},
+        )
+        self.assertEqual(1, self.websocket_facade.transmit_score_delta.call_count)
+        self.assertEqual(0, len(self.sink))
+
+    def test_flush_keeps_external_score_changes(self, *args):
+        self.add_entry("SP", 3, 0)
+        self.sink.flush()
+        self.contestant.contestanttrack.update_score(10)
+        self.add_entry("SP", 2, 10)
+        self.assertEqual(12, self.sink.flush())
+        self.assertEqual(5, GateCumulativeScore.objects.get(contestant=self.contestant, gate="SP").points)
+
+    def test_flush_empty(self, *args):
+        self.assertEqual(0, self.sink.flush())
+        self.websocket_facade.transmit_score_delta.assert_not_called()
+
+    def test_score_delta(self, *args):
+        self.add_entry("SP", 3, 0)
+        self.sink.flush()
+        sequence = get_score_sequence(self.contestant)
+        self.add_entry("TP1", 5, 10)
+        self.sink.flush()
+        channel_data, new_sequence = generate_score_delta_block(self.contestant, sequence)
+        self.assertEqual(get_score_sequence(self.contestant), new_sequence)
+        self.assertEqual(sequence, channel_data["previous_sequence"])
+        self.assertListEqual(["TP1"], [annotation["gate"] for annotation in channel_data["annotations"]])
+        channel_data, unchanged_sequence = generate_score_delta_block(self.contestant, new_sequence)
+        self.assertEqual(new_sequence, unchanged_sequence)
+        self.assertListEqual([], channel_data["annotations"])
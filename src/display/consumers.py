@@ -1,10 +1,12 @@
 import datetime
 import json
 import logging
-import threading
+import functools
+from typing import Dict, List, Set
 
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import WebsocketConsumer
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 from django.core.exceptions import ObjectDoesNotExist
 from redis import StrictRedis
 
@@ -13,12 +15,21 @@ from display.utilities.coordinate_utilities import (
     equirectangular_distance,
 )
 from display.models import NavigationTask, Contest
+from display.utilities.current_time_ticker import CurrentTimeTicker
+from display.utilities.global_positions_store import GlobalPositionsStore
+from display.utilities.global_traffic_tiles import groups_for_bounding_box, GLOBAL_TRAFFIC_GROUP
+from display.utilities.metrics import WEBSOCKET_FRAMES_SENT
 from live_tracking_map.settings import (
     REDIS_HOST,
     REDIS_PORT,
     REDIS_PASSWORD,
 )
-from websocket_channels import WebsocketFacade
+from websocket_channels import (
+    WebsocketFacade,
+    generate_score_delta_block,
+    generate_score_snapshot_block,
+    encode_tracking_frame,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,66 +47,102 @@ class DateTimeEncoder(json.JSONEncoder):
         return encoded_object
 
 
-class TrackingConsumer(WebsocketConsumer):
-    def connect(self):
+def generate_current_time_frame(calculation_delay_minutes: float, time_zone) -> str:
+    current_date_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        seconds=2, minutes=calculation_delay_minutes
+    )
+    return json.dumps(
+        {
+            "type": "current_time",
+            "data": {
+                "current_time": current_date_time.astimezone(time_zone).strftime("%H:%M:%S"),
+                "current_date_time": current_date_time.isoformat(),
+            },
+        }
+    )
+
+
+# Shared by all tracking consumers in the process, so that there is only one task sending the current time regardless
+# of the number of connected clients.
+current_time_ticker = CurrentTimeTicker()
+
+
+class TrackingConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
         self.navigation_task_pk = self.scope["url_route"]["kwargs"]["navigation_task"]
         self.navigation_task_group_name = "tracking_{}".format(self.navigation_task_pk)
         logger.debug(f"Current user {self.scope.get('user')}")
-        async_to_sync(self.channel_layer.group_add)(self.navigation_task_group_name, self.channel_name)
+        await self.channel_layer.group_add(self.navigation_task_group_name, self.channel_name)
         self.groups.append(self.navigation_task_group_name)
         try:
-            self.navigation_task = NavigationTask.objects.get(pk=self.navigation_task_pk)
+            self.navigation_task = await database_sync_to_async(
+                NavigationTask.objects.select_related("contest").get
+            )(pk=self.navigation_task_pk)
         except ObjectDoesNotExist:
             return
-        self.accept()
-        # ws = WebsocketFacade()
-        # for contestant in self.navigation_task.contestant_set.all():
-            # ws.transmit_contestant(contestant)
-            # ws.transmit_initial_load(contestant)
-        self.transmit_current_time()
-
-    def transmit_current_time(self):
-        self.send(
-            json.dumps(
-                {
-                    "type": "current_time",
-                    "data": {
-                        "current_time": (
-                            datetime.datetime.now(datetime.timezone.utc)
-                            - datetime.timedelta(
-                                seconds=2,
-                                minutes=self.navigation_task.calculation_delay_minutes,
-                            )
-                        )
-                        .astimezone(self.navigation_task.contest.time_zone)
-                        .strftime("%H:%M:%S"),
-                        "current_date_time": (
-                            datetime.datetime.now(datetime.timezone.utc)
-                            - datetime.timedelta(
-                                seconds=2,
-                                minutes=self.navigation_task.calculation_delay_minutes,
-                            )
-                        ).isoformat(),
-                    },
-                }
-            )
+        await self.accept()
+        generate_frame = functools.partial(
+            generate_current_time_frame,
+            self.navigation_task.calculation_delay_minutes,
+            self.navigation_task.contest.time_zone,
         )
-        timer = threading.Timer(1, self.transmit_current_time)
-        timer.daemon = True
-        timer.start()
+        await self.send(text_data=generate_frame())
+        current_time_ticker.add(self.navigation_task_pk, self, generate_frame)
 
-    def receive(self, text_data, **kwargs):
-        pass
-        # message = json.loads(text_data)
+    async def disconnect(self, code):
+        current_time_ticker.discard(self.navigation_task_pk, self)
 
-    def tracking_data(self, event):
-        self.send(text_data=json.dumps(event["data"], cls=DateTimeEncoder))
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Clients that have missed score updates, e.g. after reconnecting, send
+        {"type": "score_since", "contestants": {<contestant id>: <sequence number or null>}}. They receive the
+        annotations and score log entries created after the sequence number, or a full snapshot if it is null.
+        """
+        try:
+            message = json.loads(text_data)
+        except (TypeError, ValueError):
+            return
+        if message.get("type") == "score_since" and isinstance(message.get("contestants"), dict):
+            for frame in await database_sync_to_async(self.generate_scores_since)(message["contestants"]):
+                await self.send(text_data=frame)
+
+    def generate_scores_since(self, sequences: Dict) -> List[str]:
+        frames = []
+        contestants = self.navigation_task.contestant_set.filter(
+            pk__in=[int(contestant_id) for contestant_id in sequences.keys() if str(contestant_id).isdigit()]
+        )
+        for contestant in contestants:
+            since = sequences.get(str(contestant.pk))
+            if type(since) == int:
+                channel_data, _ = generate_score_delta_block(contestant, since)
+                message_type = "score_delta"
+            else:
+                channel_data = generate_score_snapshot_block(contestant)
+                message_type = "score_snapshot"
+            frames.append(encode_tracking_frame(message_type, channel_data))
+        return frames
+
+    async def tracking_frame(self, event):
+        """
+        The frame has already been encoded by WebsocketFacade.send_tracking_frame and is sent unchanged.
+        """
+        WEBSOCKET_FRAMES_SENT.labels("tracking").inc()
+        await self.send(text_data=event["frame"])
 
 
 GLOBAL_TRAFFIC_MAXIMUM_AGE = datetime.timedelta(seconds=20)
 
+_global_positions_store = None
 
-class GlobalConsumer(WebsocketConsumer):
+
+def get_global_positions_store() -> GlobalPositionsStore:
+    global _global_positions_store
+    if _global_positions_store is None:
+        _global_positions_store = GlobalPositionsStore(StrictRedis(REDIS_HOST, REDIS_PORT))
+    return _global_positions_store
+
+
+class GlobalConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.location = None
@@ -106,11 +153,12 @@ class GlobalConsumer(WebsocketConsumer):
         #     self.redis = StrictRedis(unix_socket_path="/tmp/docker/redis.sock")
         # else:
         # self.redis = StrictRedis(REDIS_HOST, REDIS_PORT)#, password=REDIS_PASSWORD)
-        self.groups.append("tracking_global")
 
-    def connect(self):
-        self.accept()
+    async def connect(self):
+        await self.accept()
         logger.info(f"Current user {self.scope.get('user')}")
+        # Receive all traffic until the client sends its location
+        await self.subscribe(groups_for_bounding_box(None))
         # Location has not been set at this point
         # if self.location and self.range:
         #     position = (data["latitude"], data["longitude"])
@@ -118,12 +166,11 @@ class GlobalConsumer(WebsocketConsumer):
         #         continue
         # self.send(text_data=json.dumps(data, cls=DateTimeEncoder))
 
-    def disconnect(self, code):
-        super().disconnect(code)
+    async def disconnect(self, code):
         if self.safe_sky_timer:
             self.safe_sky_timer.cancel()
 
-    def receive(self, text_data, **kwargs):
+    async def receive(self, text_data=None, bytes_data=None):
         message = json.loads(text_data)
         message_type = message.get("type")
         if message_type == "location":
@@ -139,21 +186,69 @@ class GlobalConsumer(WebsocketConsumer):
             else:
                 self.location = None
                 self.range = None
+                self.bounding_box = None
+            groups = groups_for_bounding_box(self.bounding_box)
+            await self.subscribe(groups)
+            # Clients covering too many tiles receive all traffic, searching for their snapshot would be too expensive
+            if self.bounding_box is not None and GLOBAL_TRAFFIC_GROUP not in groups:
+                await self.transmit_current_traffic()
+
+    async def transmit_current_traffic(self):
+        """
+        Send the latest known positions within the bounding box as a single list so that the map is populated
+        immediately instead of waiting for the next position from every aircraft.
+        """
+        positions = await sync_to_async(get_global_positions_store().search, thread_sensitive=False)(
+            self.bounding_box
+        )
+        if len(positions) > 0:
+            await self.send(text_data="[" + ",".join(positions) + "]")
+
+    async def subscribe(self, groups: Set[str]):
+        """
+        Replace the current channel group subscriptions. Positions are published to the group of the map tile that
+        contains them, so the client only receives traffic from the tiles covering its bounding box. self.groups is
+        kept up to date so that the groups are discarded when the socket disconnects.
+        """
+        current_groups = set(self.groups)
+        for group in current_groups - groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in groups - current_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups = sorted(groups)
 
-    def tracking_data(self, event):
+    async def tracking_data(self, event):
+        # The tiles cover more than the range, so positions are still filtered on distance
         if self.location and self.range:
             position = (event["latitude"], event["longitude"])
             if equirectangular_distance(position, self.location) > self.range:
                 return
-        self.send(text_data=event["data"])
+        WEBSOCKET_FRAMES_SENT.labels("global").inc()
+        await self.send(text_data=event["data"])
+
+    async def tracking_batch(self, event):
+        """
+        Batch of positions published by ExternalTrafficPublisher, sent to the client as a single list
+        """
+        if self.location and self.range:
+            positions = [
+                data
+                for data, position in zip(event["data"], event["positions"])
+                if equirectangular_distance(position, self.location) <= self.range
+            ]
+        else:
+            positions = event["data"]
+        if len(positions) > 0:
+            WEBSOCKET_FRAMES_SENT.labels("global").inc()
+            await self.send(text_data="[" + ",".join(positions) + "]")
 
 
-class AirsportsPositionsConsumer(WebsocketConsumer):
+class AirsportsPositionsConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.groups.append("tracking_airsports")
 
-    def tracking_data(self, event):
+    async def tracking_data(self, event):
         """
         Example:
         {
@@ -173,22 +268,27 @@ class AirsportsPositionsConsumer(WebsocketConsumer):
         :return:
         """
         data = event["data"]
-        self.send(text_data=data)
+        WEBSOCKET_FRAMES_SENT.labels("airsports").inc()
+        await self.send(text_data=data)
 
 
-class ContestResultsConsumer(WebsocketConsumer):
-    def connect(self):
+class ContestResultsConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
         self.user = self.scope.get("user")
         self.contest_pk = self.scope["url_route"]["kwargs"]["contest_pk"]
         self.contest_results_group_name = "contestresults_{}".format(self.contest_pk)
         self.groups.append(self.contest_results_group_name)
-        async_to_sync(self.channel_layer.group_add)(self.contest_results_group_name, self.channel_name)
+        await self.channel_layer.group_add(self.contest_results_group_name, self.channel_name)
         try:
-            contest = Contest.objects.get(pk=self.contest_pk)
+            contest = await database_sync_to_async(Contest.objects.get)(pk=self.contest_pk)
         except ObjectDoesNotExist:
             logger.warning(f"Contest with key {self.contest_pk} does not exist")
             return
-        self.accept()
+        await self.accept()
+        await database_sync_to_async(self.transmit_initial_data)(contest)
+
+    @staticmethod
+    def transmit_initial_data(contest: Contest):
         ws = WebsocketFacade()
         ws.transmit_teams(contest)
         ws.transmit_tasks(contest)
@@ -196,9 +296,10 @@ class ContestResultsConsumer(WebsocketConsumer):
         # Initial contest results must be retrieved through rest to get the correct user credentials
         # ws.transmit_contest_results(self.user, contest)
 
-    def receive(self, text_data, **kwargs):
+    async def receive(self, text_data=None, bytes_data=None):
         message = json.loads(text_data)
         logger.debug(message)
 
-    def contestresults(self, event):
-        self.send(text_data=json.dumps(event["content"], cls=DateTimeEncoder))
+    async def contestresults(self, event):
+        WEBSOCKET_FRAMES_SENT.labels("contest_results").inc()
+        await self.send(text_data=json.dumps(event["content"], cls=DateTimeEncoder))
@@ -3,10 +3,12 @@ import logging
 from typing import List, Tuple
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import transaction
 
 from display.utilities.calculate_gate_times import calculate_and_get_relative_gate_times
 from display.contestant_scheduling.contestant_scheduler import TeamDefinition, Solver
 from display.models import NavigationTask, ContestTeam, Contestant
+from display.utilities.contestant_device_index import publish_index_change
 from display.utilities.navigation_task_type_definitions import LANDING
 
 logger = logging.getLogger(__name__)
@@ -215,4 +217,7 @@ def schedule_and_create_contestants_navigation_tasks(
     for index, contestant in enumerate(contestants):
         contestant.contestant_number = maximum_contestant + index + 1
     Contestant.objects.bulk_create(contestants)
+    # bulk_create does not send any signals, and the primary keys of the new contestants are not known for MySQL
+    navigation_task_pk = navigation_task.pk
+    transaction.on_commit(lambda: publish_index_change("navigation_task", navigation_task_pk))
     return True, optimisation_messages
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand, CommandError
+
+from display.calculators.offline_rescoring import rescore_contestants
+from display.models import NavigationTask
+from live_tracking_map.settings import RESCORING_PROCESSES
+
+
+class Command(BaseCommand):
+    help = "Rescore all contestants in a navigation task from their stored or traccar tracks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("navigation_task", type=int, help="Navigation task primary key")
+        parser.add_argument("--contestant", type=int, nargs="*", help="Only rescore these contestants")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=RESCORING_PROCESSES,
+            help=f"Number of processes, defaults to RESCORING_PROCESSES ({RESCORING_PROCESSES})",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            navigation_task = NavigationTask.objects.get(pk=options["navigation_task"])
+        except NavigationTask.DoesNotExist:
+            raise CommandError(f"Navigation task {options['navigation_task']} does not exist")
+        contestants = navigation_task.contestant_set.all()
+        if options["contestant"]:
+            contestants = contestants.filter(pk__in=options["contestant"])
+        contestants = list(contestants)
+        scores = rescore_contestants(contestants, options["processes"])
+        for contestant in contestants:
+            score = scores.get(contestant.pk)
+            self.stdout.write(f"{contestant}: {score if score is not None else 'failed'}")
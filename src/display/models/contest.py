@@ -4,7 +4,7 @@ from typing import Optional
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 from django_countries.fields import CountryField
 from guardian.shortcuts import assign_perm, get_objects_for_user, get_users_with_perms
 from location_field.models.plain import PlainLocationField
@@ -224,11 +224,17 @@ class Contest(models.Model):
         and team test scores.
         """
         from display.models import Contestant, ContestSummary, TaskSummary, TeamTestScore
+        from display.utilities.contestant_device_index import publish_index_change
 
         ContestTeam.objects.filter(contest=self, team=old_team).delete()
         ContestTeam.objects.filter(contest=self, team=new_team).delete()
         ct = ContestTeam.objects.create(contest=self, team=new_team, **tracking_data)
-        Contestant.objects.filter(navigation_task__contest=self, team=old_team).update(team=new_team)
+        contestants = Contestant.objects.filter(navigation_task__contest=self, team=old_team)
+        contestant_pks = list(contestants.values_list("pk", flat=True))
+        contestants.update(team=new_team)
+        # update() does not send any signals, so the contestant device indices must be notified explicitly
+        for contestant_pk in contestant_pks:
+            transaction.on_commit(lambda pk=contestant_pk: publish_index_change("contestant", pk))
         ContestSummary.objects.filter(contest=self, team=old_team).update(team=new_team)
         TaskSummary.objects.filter(task__contest=self, team=old_team).update(team=new_team)
         TeamTestScore.objects.filter(task_test__task__contest=self, team=old_team).update(team=new_team)
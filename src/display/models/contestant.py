@@ -4,9 +4,7 @@ import time
 from io import BytesIO
 from typing import Optional
 
-import dateutil
 import numpy as np
-import matplotlib.pyplot as plt
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
@@ -31,6 +29,7 @@ from display.utilities.navigation_task_type_definitions import (
     LANDING,
 )
 from display.utilities.traccar_factory import get_traccar_instance
+from display.utilities.track_columns import TrackColumns, load_track_columns
 from display.utilities.track_merger import merge_tracks
 from display.utilities.tracking_definitions import (
     TRACCAR,
@@ -700,6 +699,82 @@ Flying off track by more than {"{:.0f}".format(scorecard.backtracking_bearing_di
             return contestant, is_simulator
         return None, is_simulator
 
+    @classmethod
+    def get_contestants_for_devices_at_time(
+        cls, device_times: dict[str, datetime.datetime]
+    ) -> dict[str, tuple[Optional["Contestant"], bool]]:
+        """
+        Batch version of get_contestant_for_device_at_time. Resolves all the devices (with their individual time
+        stamps) using a single database query. The same precedence as get_contestant_for_device_at_time is used, i.e.
+        tracking device before pilot before copilot. Returns a dictionary from device to (contestant, is_simulator)
+        for every device in device_times.
+        """
+        if len(device_times) == 0:
+            return {}
+        devices = list(device_times.keys())
+        candidates = list(
+            cls.objects.filter(
+                Q(tracker_device_id__in=devices, tracking_device=TRACKING_DEVICE)
+                | (
+                    (
+                        Q(team__crew__member1__app_tracking_id__in=devices)
+                        | Q(team__crew__member1__simulator_tracking_id__in=devices)
+                    )
+                    & Q(tracking_device__in=(TRACKING_PILOT, TRACKING_PILOT_AND_COPILOT))
+                )
+                | (
+                    (
+                        Q(team__crew__member2__app_tracking_id__in=devices)
+                        | Q(team__crew__member2__simulator_tracking_id__in=devices)
+                    )
+                    & Q(tracking_device__in=(TRACKING_COPILOT, TRACKING_PILOT_AND_COPILOT))
+                ),
+                tracker_start_time__lte=max(device_times.values()),
+                finished_by_time__gte=min(device_times.values()),
+                contestanttrack__calculator_finished=False,
+            )
+            .select_related("navigation_task", "team__crew__member1", "team__crew__member2")
+            .distinct()
+        )
+        result = {}
+        for device, stamp in device_times.items():
+            active = [c for c in candidates if c.tracker_start_time <= stamp <= c.finished_by_time]
+            contestant, is_simulator, member = cls._match_device_in_candidates(active, device)
+            if member is not None:
+                member.last_seen = stamp
+                member.save(update_fields=["last_seen"])
+            result[device] = (contestant, is_simulator)
+        return result
+
+    @staticmethod
+    def _match_device_in_candidates(
+        candidates: list["Contestant"], device: str
+    ) -> tuple[Optional["Contestant"], bool, Optional["Person"]]:
+        """
+        Find the contestant in candidates that owns the device, using the precedence tracker, pilot, copilot. Also
+        returns the crew member (if any) that owns the device.
+        """
+        for contestant in candidates:
+            if contestant.tracking_device == TRACKING_DEVICE and contestant.tracker_device_id == device:
+                return contestant, False, None
+        for contestant in candidates:
+            member1 = contestant.team.crew.member1
+            if (
+                contestant.tracking_device in (TRACKING_PILOT, TRACKING_PILOT_AND_COPILOT)
+                and member1 is not None
+                and device in (member1.app_tracking_id, member1.simulator_tracking_id)
+            ):
+                return contestant, member1.simulator_tracking_id == device, member1
+        for contestant in candidates:
+            member2 = contestant.team.crew.member2
+            if (
+                contestant.tracking_device in (TRACKING_COPILOT, TRACKING_PILOT_AND_COPILOT)
+                and member2 is not None
+                and device in (member2.app_tracking_id, member2.simulator_tracking_id)
+            ):
+                return contestant, member2.simulator_tracking_id == device, member2
+        return None, False, None
+
     @classmethod
     def _try_to_get_tracker_tracking(cls, device: str, stamp: datetime.datetime) -> tuple[Optional["Contestant"], bool]:
         """
@@ -789,12 +864,9 @@ Flying off track by more than {"{:.0f}".format(scorecard.backtracking_bearing_di
         traccar = get_traccar_instance()
         device_ids = traccar.get_device_ids_for_contestant(self)
 
-        tracks = []
-        for device_id in device_ids:
-            track = traccar.get_positions_for_device_id(device_id, self.tracker_start_time, self.finished_by_time)
-            for item in track:
-                item["device_time"] = dateutil.parser.parse(item["deviceTime"])
-            tracks.append(track)
+        tracks = list(
+            traccar.get_positions_for_device_ids(device_ids, self.tracker_start_time, self.finished_by_time).values()
+        )
         logger.debug(f"Returned {len(tracks)} with lengths {', '.join([str(len(item)) for item in tracks])}")
         return merge_tracks(tracks)
 
@@ -809,11 +881,20 @@ Flying off track by more than {"{:.0f}".format(scorecard.backtracking_bearing_di
 
         return ContestantReceivedPosition.convert_to_traccar(self.contestantreceivedposition_set.all())
 
+    def get_track_columns(self) -> TrackColumns:
+        """
+        Get the same track as get_track() as arrays, which is much cheaper for long tracks that are only going to be
+        transmitted to the front end.
+        """
+        return load_track_columns(self.contestantreceivedposition_set.all())
+
     def get_latest_position(self) -> Optional[Position]:
-        try:
-            return self.get_track()[-1]
-        except IndexError:
+        from display.models import ContestantReceivedPosition
+
+        latest = self.contestantreceivedposition_set.order_by("-time").first()
+        if latest is None:
             return None
+        return ContestantReceivedPosition.convert_to_traccar([latest])[0]
 
     def record_actual_gate_time(self, gate_name: str, passing_time: datetime.datetime):
         """
@@ -854,6 +935,7 @@ Flying off track by more than {"{:.0f}".format(scorecard.backtracking_bearing_di
         Generate a matplotlib chart showing the processing statistics for the contestants. Returns the binary (png)
         image.
         """
+        import matplotlib.pyplot as plt
         from display.models import ContestantReceivedPosition
 
         stored_positions = ContestantReceivedPosition.objects.filter(contestant=self)
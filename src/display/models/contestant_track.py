@@ -52,8 +52,23 @@ class ContestantTrack(models.Model):
         self.__push_change()
 
     def update_score(self, score):
-        from display.models import TeamTestScore
         ContestantTrack.objects.filter(pk=self.pk).update(score=score)
+        self.__update_team_test_score(score)
+        self.__push_change()
+
+    def increment_score(self, points: float) -> float:
+        """
+        Atomically add points to the score in the database without overwriting changes made by others, e.g. manual
+        score adjustments, and return the resulting score. The change is not pushed to the front end, this is left to
+        the caller.
+        """
+        ContestantTrack.objects.filter(pk=self.pk).update(score=models.F("score") + points)
+        self.score = ContestantTrack.objects.values_list("score", flat=True).get(pk=self.pk)
+        self.__update_team_test_score(self.score)
+        return self.score
+
+    def __update_team_test_score(self, score: float):
+        from display.models import TeamTestScore
         # Update task test score if it exists
         if hasattr(self.contestant.navigation_task, "tasktest"):
             entry, _ = TeamTestScore.objects.update_or_create(
@@ -61,7 +76,6 @@ class ContestantTrack(models.Model):
                 task_test=self.contestant.navigation_task.tasktest,
                 defaults={"points": score},
             )
-        self.__push_change()
 
     def updates_current_state(self, state: str):
         self.refresh_from_db()
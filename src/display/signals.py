@@ -5,6 +5,7 @@ from string import ascii_uppercase, ascii_lowercase, digits
 
 from django.contrib.auth.models import User, Group
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import transaction
 from django.db.models import Q
 from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
 from django.dispatch import receiver
@@ -31,7 +32,9 @@ from display.models import (
     MyUser,
     EditableRoute,
     Contest,
+    Team,
 )
+from display.utilities.contestant_device_index import publish_index_change
 from display.utilities.country_code_utilities import get_country_code_from_location
 from display.utilities.traccar_factory import get_traccar_instance
 
@@ -253,6 +256,44 @@ def stop_any_calculators(sender, instance: Contestant, **kwargs):
     ScoreLogEntry.objects.filter(contestant=instance).delete()
 
 
+@receiver(post_save, sender=Contestant)
+@receiver(post_delete, sender=Contestant)
+def notify_contestant_device_index(sender, instance: Contestant, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: publish_index_change("contestant", pk))
+
+
+@receiver(post_save, sender=ContestantTrack)
+def notify_contestant_device_index_calculator_finished(sender, instance: ContestantTrack, update_fields=None, **kwargs):
+    if update_fields is None or "calculator_finished" in update_fields:
+        contestant_pk = instance.contestant_id
+        transaction.on_commit(lambda: publish_index_change("contestant", contestant_pk))
+
+
+@receiver(post_save, sender=Crew)
+@receiver(post_delete, sender=Crew)
+def notify_contestant_device_index_crew(sender, instance: Crew, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: publish_index_change("crew", pk))
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def notify_contestant_device_index_team(sender, instance: Team, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: publish_index_change("team", pk))
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def notify_contestant_device_index_person(sender, instance: Person, update_fields=None, **kwargs):
+    # last_seen is updated for every received position, and does not affect the index
+    if update_fields is not None and set(update_fields) == {"last_seen"}:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: publish_index_change("person", pk))
+
+
 @receiver(pre_save, sender=ContestTeam)
 def validate_contest_team(sender, instance: ContestTeam, **kwargs):
     instance.clean()
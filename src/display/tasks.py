@@ -1,15 +1,22 @@
 import datetime
 import logging
+from typing import List, Optional
 
 import redis_lock
 from django.core.cache import cache
 from django.db import connections
+from celery import chord
 from celery.schedules import crontab
 from django.core.exceptions import ObjectDoesNotExist
 from redis.client import Redis
 
+from display.calculators.offline_rescoring import (
+    _rescore_contestant_pk,
+    contestants_to_rescore,
+    transmit_rescored_contestants,
+)
 from display.flight_order_and_maps.generate_flight_orders import generate_flight_orders_latex
-from display.models import Contestant, EmailMapLink
+from display.models import Contestant, ContestantUploadedTrack, EmailMapLink, NavigationTask
 from live_tracking_map.celery import app
 from live_tracking_map.settings import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
 from playback_tools.playback import recalculate_traccar, insert_gpx_file
@@ -60,6 +67,44 @@ def import_gpx_track(contestant_pk: int, gpx_file: str):
         logger.exception("Exception in import_gpx_track")
 
 
+@app.task
+def rescore_navigation_task(navigation_task_pk: int):
+    try:
+        navigation_task = NavigationTask.objects.get(pk=navigation_task_pk)
+    except ObjectDoesNotExist:
+        logger.exception("Could not find navigation task for navigation task key {}".format(navigation_task_pk))
+        return
+    logger.debug(f"{navigation_task}: About to rescore all contestants")
+    contestants = contestants_to_rescore(list(navigation_task.contestant_set.all()))
+    contestant_pks = [contestant.pk for contestant in contestants]
+    if len(contestant_pks) == 0:
+        return
+    # One task per contestant so that the contestants are rescored in parallel by the workers. The celery worker
+    # processes are daemonic and cannot start a process pool of their own.
+    chord(rescore_contestant_task.s(contestant_pk) for contestant_pk in contestant_pks)(
+        transmit_rescored_contestants_task.s(contestant_pks)
+    )
+
+
+@app.task(ignore_result=False)
+def rescore_contestant_task(contestant_pk: int) -> Optional[float]:
+    """
+    :return: The new score of the contestant, or None if rescoring failed
+    """
+    uploaded_track = ContestantUploadedTrack.objects.filter(contestant=contestant_pk).first()
+    return _rescore_contestant_pk(contestant_pk, uploaded_track.track if uploaded_track else None)
+
+
+@app.task
+def transmit_rescored_contestants_task(scores: List[Optional[float]], contestant_pks: List[int]):
+    """
+    Chord callback of rescore_navigation_task, receiving the scores of the contestants in the same order as the primary
+    keys.
+    """
+    rescored = [contestant_pk for contestant_pk, score in zip(contestant_pks, scores) if score is not None]
+    transmit_rescored_contestants(list(Contestant.objects.filter(pk__in=rescored)))
+
+
 def append_cache_dict(cache_key, dict_key, value):
     conn = Redis(REDIS_HOST, REDIS_PORT, 2)#, REDIS_PASSWORD)
     base = cache_key
@@ -0,0 +1,113 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TransactionTestCase
+
+from display.default_scorecards.default_scorecard_fai_precision_2020 import get_default_scorecard
+from display.models import NavigationTask, Contest, Route, Contestant, Aeroplane, Crew, Team, Person, TRACKING_DEVICE, \
+    TRACKING_COPILOT, TRACKING_PILOT
+from display.utilities.contestant_device_index import ContestantDeviceIndex
+from utilities.mock_utilities import TraccarMock
+
+TRACKER_NAME = "tracker"
+
+
+@patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+@patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+class TestContestantDeviceIndex(TransactionTestCase):
+    @patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+    @patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+    def setUp(self, *args):
+        self.start = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self.contest = Contest.objects.create(name="TestContest", start_time=self.start,
+                                              finish_time=self.start + datetime.timedelta(hours=6))
+        route = Route.objects.create(name="Route")
+        self.navigation_task = NavigationTask.create(name="NavigationTask",
+                                                     original_scorecard=get_default_scorecard(),
+                                                     start_time=self.start,
+                                                     finish_time=self.start + datetime.timedelta(hours=6),
+                                                     route=route, contest=self.contest)
+        aeroplane = Aeroplane.objects.create(registration="registration")
+        crew = Crew.objects.create(member1=Person.objects.create(first_name="Mister", last_name="Pilot"))
+        double_crew = Crew.objects.create(member1=Person.objects.get(first_name="Mister", last_name="Pilot"),
+                                          member2=Person.objects.create(first_name="Mister1", last_name="Pilot2",
+                                                                        email="test@test.com"))
+        self.team = Team.objects.create(crew=crew, aeroplane=aeroplane)
+        self.double_team = Team.objects.create(crew=double_crew, aeroplane=aeroplane)
+        self.contestant_tracking_device = self._create_contestant(self.team, TRACKING_DEVICE, 1, 0)
+        self.contestant_pilot_device = self._create_contestant(self.team, TRACKING_PILOT, 2, 2)
+        self.contestant_copilot_device = self._create_contestant(self.double_team, TRACKING_COPILOT, 3, 4)
+        self.index = ContestantDeviceIndex()
+        self.index.build()
+
+    def _create_contestant(self, team, tracking_device, number, hours):
+        start = self.start + datetime.timedelta(hours=hours)
+        return Contestant.objects.create(team=team, tracking_device=tracking_device,
+                                         navigation_task=self.navigation_task, takeoff_time=start,
+                                         contestant_number=number,
+                                         tracker_device_id=TRACKER_NAME if tracking_device == TRACKING_DEVICE else "",
+                                         tracker_start_time=start,
+                                         finished_by_time=start + datetime.timedelta(hours=1))
+
+    def test_lookup_tracking_device(self, *args):
+        contestant, simulator = self.index.lookup(TRACKER_NAME, self.start + datetime.timedelta(minutes=3))
+        self.assertEqual(self.contestant_tracking_device, contestant)
+        self.assertFalse(simulator)
+
+    def test_lookup_pilot(self, *args):
+        contestant, simulator = self.index.lookup(self.team.crew.member1.app_tracking_id,
+                                                  self.start + datetime.timedelta(hours=2, minutes=3))
+        self.assertEqual(self.contestant_pilot_device, contestant)
+        self.assertFalse(simulator)
+
+    def test_lookup_copilot_simulator(self, *args):
+        contestant, simulator = self.index.lookup(self.double_team.crew.member2.simulator_tracking_id,
+                                                  self.start + datetime.timedelta(hours=4, minutes=3))
+        self.assertEqual(self.contestant_copilot_device, contestant)
+        self.assertTrue(simulator)
+
+    def test_lookup_outside_interval(self, *args):
+        contestant, _ = self.index.lookup(self.team.crew.member1.app_tracking_id,
+                                          self.start + datetime.timedelta(minutes=3))
+        self.assertIsNone(contestant)
+        contestant, _ = self.index.lookup(TRACKER_NAME, self.start + datetime.timedelta(hours=2, minutes=3))
+        self.assertIsNone(contestant)
+
+    def test_lookup_unknown_device(self, *args):
+        contestant, simulator = self.index.lookup("unknown", self.start)
+        self.assertIsNone(contestant)
+        self.assertFalse(simulator)
+
+    def test_refresh_deleted_contestant(self, *args):
+        pk = self.contestant_tracking_device.pk
+        self.contestant_tracking_device.delete()
+        self.index.refresh_contestants([pk])
+        contestant, _ = self.index.lookup(TRACKER_NAME, self.start + datetime.timedelta(minutes=3))
+        self.assertIsNone(contestant)
+
+    def test_refresh_finished_calculator(self, *args):
+        self.contestant_pilot_device.contestanttrack.set_calculator_finished()
+        self.index.refresh_contestants([self.contestant_pilot_device.pk])
+        contestant, _ = self.index.lookup(self.team.crew.member1.app_tracking_id,
+                                          self.start + datetime.timedelta(hours=2, minutes=3))
+        self.assertIsNone(contestant)
+
+    def test_refresh_team(self, *args):
+        Contestant.objects.filter(pk=self.contestant_tracking_device.pk).update(team=self.double_team)
+        self.index.refresh_teams([self.double_team.pk])
+        contestant, _ = self.index.lookup(TRACKER_NAME, self.start + datetime.timedelta(minutes=3))
+        self.assertEqual(self.double_team, contestant.team)
+
+    @patch("display.utilities.contestant_device_index.publish_index_change")
+    def test_replace_team_publishes_contestants(self, publish_index_change, *args):
+        self.contest.replace_team(self.team, self.double_team, {})
+        publish_index_change.assert_any_call("contestant", self.contestant_tracking_device.pk)
+        publish_index_change.assert_any_call("contestant", self.contestant_pilot_device.pk)
+
+    def test_refresh_navigation_task(self, *args):
+        Contestant.objects.filter(pk=self.contestant_tracking_device.pk).update(tracker_device_id="other")
+        self.index.refresh_navigation_task(self.navigation_task.pk)
+        contestant, _ = self.index.lookup("other", self.start + datetime.timedelta(minutes=3))
+        self.assertEqual(self.contestant_tracking_device, contestant)
+        contestant, _ = self.index.lookup(TRACKER_NAME, self.start + datetime.timedelta(minutes=3))
+        self.assertIsNone(contestant)
@@ -273,6 +273,30 @@ class TestGetContestantForDevice(TransactionTestCase):
                                                                                     tzinfo=datetime.timezone.utc))
         self.assertEqual(None, contestant)
 
+    def test_get_contestants_for_devices_at_time(self):
+        contestants = Contestant.get_contestants_for_devices_at_time(
+            {
+                TRACKER_NAME: datetime.datetime(2020, 1, 1, 10, 3, tzinfo=datetime.timezone.utc),
+                self.team.crew.member1.app_tracking_id: datetime.datetime(2020, 1, 1, 12, 3,
+                                                                          tzinfo=datetime.timezone.utc),
+                self.double_team.crew.member2.app_tracking_id: datetime.datetime(2020, 1, 1, 10, 3,
+                                                                                 tzinfo=datetime.timezone.utc),
+            }
+        )
+        self.assertEqual((self.contestant_tracking_device, False), contestants[TRACKER_NAME])
+        self.assertEqual((self.contestant_pilot_device, False), contestants[self.team.crew.member1.app_tracking_id])
+        self.assertEqual((None, False), contestants[self.double_team.crew.member2.app_tracking_id])
+
+    def test_get_contestants_for_devices_at_time_simulator(self):
+        contestants = Contestant.get_contestants_for_devices_at_time(
+            {
+                self.double_team.crew.member2.simulator_tracking_id: datetime.datetime(2020, 1, 1, 14, 5,
+                                                                                       tzinfo=datetime.timezone.utc),
+            }
+        )
+        self.assertEqual((self.contestant_copilot_device, True),
+                         contestants[self.double_team.crew.member2.simulator_tracking_id])
+
     def test_create_device_contest_team_without_tracking_id(self):
         with self.assertRaises(ValidationError):
             ContestTeam.objects.create(team=self.team, tracking_device=TRACKING_DEVICE, tracker_device_id="",
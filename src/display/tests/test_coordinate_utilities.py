@@ -108,6 +108,29 @@ class TestCoordinateUtilities(TestCase):
     def test_distance(self,b,e,expected):
         self.assertEqual(expected, calculate_distance_lat_lon(b,e))
 
+    def test_projector_prepared_lines_matches_intersect(self):
+        track = [(60 + index * 0.001, 11 + (index % 3) * 0.001) for index in range(20)]
+        lines = [((60.005, 10.99), (60.005, 11.01)), ((60.1, 10.99), (60.1, 11.01)), ((60.01, 11), (60.01, 11))]
+        projector = Projector(60, 11)
+        expected = [
+            projector.intersect(start, finish, *line) for start, finish in zip(track[:-2], track[2:]) for line in lines
+        ]
+        self.assertEqual(2, len([item for item in expected if item is not None]))
+        projector.prepare_lines(lines)
+        self.assertListEqual(
+            expected,
+            [projector.intersect(start, finish, *line) for start, finish in zip(track[:-2], track[2:]) for line in lines],
+        )
+        projector = Projector(60, 11)
+        projector.prepare_lines(lines)
+        projector.prepare_segments(track[:-2], track[2:])
+        self.assertEqual(len(track) - 2, len(projector.segment_intersections))
+        self.assertListEqual(
+            expected,
+            [projector.intersect(start, finish, *line) for start, finish in zip(track[:-2], track[2:]) for line in lines],
+        )
+
+
 class TestProcedureTurnPoints(TestCase):
     def test_simple(self):
         points = get_procedure_turn_track(60, 11, 270, 30, 0.05)
@@ -0,0 +1,63 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from display.utilities.current_time_ticker import CurrentTimeTicker
+
+
+class RecordingConsumer:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        self.frames.append(text_data)
+
+
+class FailingConsumer:
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        raise ConnectionError("closed")
+
+
+class TestCurrentTimeTicker(IsolatedAsyncioTestCase):
+    async def test_frame_generated_once_per_group(self):
+        ticker = CurrentTimeTicker()
+        calls = []
+
+        def generate_frame():
+            calls.append(1)
+            return "frame"
+
+        consumers = [RecordingConsumer() for _ in range(3)]
+        for consumer in consumers:
+            ticker.add(1, consumer, generate_frame)
+        await ticker.tick()
+        self.assertEqual(1, len(calls))
+        self.assertListEqual([["frame"]] * 3, [consumer.frames for consumer in consumers])
+        for consumer in consumers:
+            ticker.discard(1, consumer)
+
+    async def test_task_cancelled_when_last_consumer_discarded(self):
+        ticker = CurrentTimeTicker(interval=0.01)
+        first, second = RecordingConsumer(), RecordingConsumer()
+        ticker.add(1, first, lambda: "one")
+        ticker.add(2, second, lambda: "two")
+        task = ticker.task
+        await asyncio.sleep(0.05)
+        self.assertIn("one", first.frames)
+        self.assertIn("two", second.frames)
+        ticker.discard(1, first)
+        self.assertFalse(task.done())
+        ticker.discard(2, second)
+        self.assertIsNone(ticker.task)
+        await asyncio.sleep(0)
+        self.assertTrue(task.cancelled())
+        self.assertDictEqual({}, ticker.groups)
+
+    async def test_failing_consumer_does_not_stop_group(self):
+        ticker = CurrentTimeTicker()
+        failing, consumer = FailingConsumer(), RecordingConsumer()
+        ticker.add(1, failing, lambda: "frame")
+        ticker.add(1, consumer, lambda: "frame")
+        await ticker.tick()
+        self.assertListEqual(["frame"], consumer.frames)
+        ticker.discard(1, failing)
+        ticker.discard(1, consumer)
@@ -0,0 +1,31 @@
+import datetime
+import json
+from unittest import IsolatedAsyncioTestCase
+
+from redis import StrictRedis
+
+from display.utilities.external_traffic_publisher import ExternalTrafficPublisher, ExternalTrafficRecord
+from display.utilities.global_positions_store import GlobalPositionsStore
+from live_tracking_map.settings import REDIS_HOST, REDIS_PORT
+
+
+class TestExternalTrafficPublisher(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.store = GlobalPositionsStore(StrictRedis(REDIS_HOST, REDIS_PORT))
+        self.store.clear()
+        self.store.redis.delete(self.store.record_prefix + "abc123")
+        self.time = datetime.datetime(2022, 6, 1, 12, tzinfo=datetime.timezone.utc)
+
+    def record(self, seconds: int) -> ExternalTrafficRecord:
+        return ExternalTrafficRecord(
+            "abc123", "LN-ABC", self.time + datetime.timedelta(seconds=seconds), 60, 11, 500, 500, 90, 180, "ogn"
+        )
+
+    async def test_publish_latest_position_per_device(self):
+        publisher = ExternalTrafficPublisher()
+        self.assertEqual(1, await publisher.publish([self.record(1), self.record(2), self.record(0)]))
+        positions = self.store.search((59.5, 10, 60.5, 12))
+        self.assertEqual(1, len(positions))
+        self.assertEqual("2022-06-01T12:00:02+00:00", json.loads(positions[0])["time"])
+        self.assertEqual(0, await publisher.publish([self.record(1)]))
+        await publisher.redis.close()
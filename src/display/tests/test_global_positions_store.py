@@ -0,0 +1,50 @@
+import datetime
+from unittest import TestCase
+
+from redis import StrictRedis
+
+from display.utilities.global_positions_store import GlobalPositionsStore
+from live_tracking_map.settings import REDIS_HOST, REDIS_PORT
+
+
+class TestGlobalPositionsStore(TestCase):
+    def setUp(self) -> None:
+        self.redis = StrictRedis(REDIS_HOST, REDIS_PORT)
+        self.store = GlobalPositionsStore(self.redis, time_to_live=10)
+        self.store.clear()
+        self.redis.delete(self.store.record_prefix + "oslo", self.store.record_prefix + "bergen")
+        self.time = datetime.datetime(2022, 6, 1, 12, tzinfo=datetime.timezone.utc)
+
+    def test_search_within_bounding_box(self):
+        self.assertTrue(self.store.store("oslo", self.time, 60.0, 11.0, '{"name": "oslo"}'))
+        self.assertTrue(self.store.store("bergen", self.time, 60.4, 5.3, '{"name": "bergen"}'))
+        self.assertListEqual(['{"name": "oslo"}'], self.store.search((59.5, 10, 60.5, 12)))
+        self.assertSetEqual(
+            {'{"name": "oslo"}', '{"name": "bergen"}'}, set(self.store.search((59, 4, 61, 12)))
+        )
+
+    def test_search_returns_closest_positions_first(self):
+        self.store.store("oslo", self.time, 60.0, 11.0, '{"name": "oslo"}')
+        self.store.store("bergen", self.time, 60.4, 5.3, '{"name": "bergen"}')
+        self.assertListEqual(['{"name": "oslo"}'], self.store.search((59, 4, 61, 14), count=1))
+
+    def test_older_position_is_ignored(self):
+        self.assertTrue(self.store.store("oslo", self.time, 60.0, 11.0, '{"name": "new"}'))
+        self.assertFalse(
+            self.store.store("oslo", self.time - datetime.timedelta(seconds=1), 60.0, 11.0, '{"name": "old"}')
+        )
+        self.assertListEqual(['{"name": "new"}'], self.store.search((59.5, 10, 60.5, 12)))
+
+    def test_expired_position_is_removed_from_index(self):
+        self.store.store("oslo", self.time, 60.0, 11.0, '{"name": "oslo"}')
+        self.redis.delete(self.store.record_prefix + "oslo")
+        self.assertListEqual([], self.store.search((59.5, 10, 60.5, 12)))
+        self.assertEqual(0, self.redis.zcard(self.store.geo_key))
+
+    def test_expired_position_is_removed_when_storing(self):
+        self.store.store("oslo", self.time, 60.0, 11.0, '{"name": "oslo"}')
+        # Last updated before the time to live, without ever being searched for
+        self.redis.zadd(self.store.updated_key, {"oslo": 0})
+        self.store.store("bergen", self.time, 60.4, 5.3, '{"name": "bergen"}')
+        self.assertListEqual([b"bergen"], self.redis.zrange(self.store.geo_key, 0, -1))
+        self.assertListEqual([b"bergen"], self.redis.zrange(self.store.updated_key, 0, -1))
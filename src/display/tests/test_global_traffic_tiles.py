@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from display.utilities.coordinate_utilities import calculate_bounding_box
+from display.utilities.global_traffic_tiles import (
+    tile_for_position,
+    tiles_for_bounding_box,
+    groups_for_bounding_box,
+    global_traffic_groups,
+    tile_group_name,
+    GLOBAL_TRAFFIC_GROUP,
+)
+
+
+class TestGlobalTrafficTiles(TestCase):
+    def test_tile_for_position(self):
+        self.assertEqual((33, 18), tile_for_position(60, 11))
+        self.assertEqual((0, 63), tile_for_position(-89, -180))
+        self.assertEqual((0, 0), tile_for_position(89, 180))
+
+    def test_position_is_in_its_subscribed_tile(self):
+        bounding_box = calculate_bounding_box((60, 11), 50000)
+        tile_group, global_group = global_traffic_groups(60.2, 11.3)
+        self.assertEqual(GLOBAL_TRAFFIC_GROUP, global_group)
+        self.assertIn(tile_group, groups_for_bounding_box(bounding_box))
+
+    def test_bounding_box_across_tiles(self):
+        self.assertSetEqual({(32, 18), (33, 18)}, tiles_for_bounding_box((60, 5, 60.1, 6)))
+
+    def test_bounding_box_across_antimeridian(self):
+        tiles = tiles_for_bounding_box((0, 179, 1, 181))
+        self.assertSetEqual({0, 63}, {x for x, _ in tiles})
+
+    def test_large_or_missing_bounding_box_uses_global_group(self):
+        self.assertSetEqual({GLOBAL_TRAFFIC_GROUP}, groups_for_bounding_box(None))
+        self.assertSetEqual({GLOBAL_TRAFFIC_GROUP}, groups_for_bounding_box((-80, -180, 80, 180)))
+        self.assertSetEqual({tile_group_name(33, 18)}, groups_for_bounding_box((60, 11, 60.1, 11.1)))
@@ -0,0 +1,77 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TransactionTestCase
+
+from display.default_scorecards.default_scorecard_fai_precision_2020 import get_default_scorecard
+from display.models import (
+    NavigationTask,
+    Contest,
+    Route,
+    Contestant,
+    Aeroplane,
+    Crew,
+    Team,
+    Person,
+    ContestantReceivedPosition,
+)
+from display.serialisers import PositionSerialiser
+from utilities.mock_utilities import TraccarMock
+
+
+@patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+@patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+class TestTrackColumns(TransactionTestCase):
+    @patch("display.models.contestant.get_traccar_instance", return_value=TraccarMock)
+    @patch("display.signals.get_traccar_instance", return_value=TraccarMock)
+    def setUp(self, *args):
+        self.start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        contest = Contest.objects.create(
+            name="TestContest", start_time=self.start, finish_time=self.start + datetime.timedelta(hours=6)
+        )
+        navigation_task = NavigationTask.create(
+            name="NavigationTask",
+            original_scorecard=get_default_scorecard(),
+            start_time=self.start,
+            finish_time=self.start + datetime.timedelta(hours=6),
+            route=Route.objects.create(name="Route"),
+            contest=contest,
+        )
+        crew = Crew.objects.create(member1=Person.objects.create(first_name="Mister", last_name="Pilot"))
+        team = Team.objects.create(crew=crew, aeroplane=Aeroplane.objects.create(registration="registration"))
+        self.contestant = Contestant.objects.create(
+            team=team,
+            navigation_task=navigation_task,
+            takeoff_time=self.start,
+            contestant_number=1,
+            tracker_device_id="tracker",
+            tracker_start_time=self.start,
+            finished_by_time=self.start + datetime.timedelta(hours=1),
+        )
+        ContestantReceivedPosition.objects.bulk_create(
+            [
+                ContestantReceivedPosition(
+                    contestant=self.contestant,
+                    time=self.start + datetime.timedelta(seconds=index, milliseconds=250 * (index % 2)),
+                    latitude=60 + index / 1000,
+                    longitude=11 + index / 1000,
+                    course=90,
+                    interpolated=index % 3 == 0,
+                )
+                for index in range(50)
+            ]
+        )
+
+    def test_position_data_matches_serialiser(self, *args):
+        track = self.contestant.get_track_columns()
+        self.assertEqual(50, len(track))
+        self.assertEqual(self.start + datetime.timedelta(seconds=49, milliseconds=250), track.latest_time)
+        self.assertListEqual(
+            [dict(position) for position in PositionSerialiser(self.contestant.get_track(), many=True).data],
+            track.to_position_data(self.contestant.tracker_device_id),
+        )
+
+    def test_latest_position(self, *args):
+        position = self.contestant.get_latest_position()
+        self.assertEqual(self.start + datetime.timedelta(seconds=49, milliseconds=250), position.time)
+        self.assertAlmostEqual(60.049, position.latitude)
@@ -56,6 +56,7 @@ from display.views import (
     get_contest_creators_emails,
     navigation_task_view_detailed_score,
     navigation_task_restore_original_scorecard_view,
+    navigation_task_rescore_view,
     navigation_task_scorecard_override_view,
     navigation_task_gatescore_override_view,
     update_flight_order_configurations,
@@ -153,6 +154,7 @@ urlpatterns = [
         navigation_task_restore_original_scorecard_view,
         name="navigationtask_restorescorecard",
     ),
+    path("navigationtask/<int:pk>/rescore/", navigation_task_rescore_view, name="navigationtask_rescore"),
     path(
         "navigationtask/<int:pk>/scoredetails/", navigation_task_view_detailed_score, name="navigationtask_scoredetails"
     ),
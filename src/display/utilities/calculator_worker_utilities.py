@@ -0,0 +1,25 @@
+from redis_queue import RedisQueue
+
+NAMESPACE = "calculator_worker"
+
+
+def worker_for_contestant(contestant_pk: int, worker_count: int) -> int:
+    """
+    Return the index of the calculator worker responsible for the contestant. Contestants are sharded over the workers
+    by primary key.
+    """
+    return contestant_pk % worker_count
+
+
+def get_worker_queue(worker_index: int) -> RedisQueue:
+    """
+    Return the queue used to request calculators from the calculator worker with the given index.
+    """
+    return RedisQueue(str(worker_index), namespace=NAMESPACE)
+
+
+def request_calculator(contestant_pk: int, worker_count: int):
+    """
+    Ask the calculator worker responsible for the contestant to start a calculator for it.
+    """
+    get_worker_queue(worker_for_contestant(contestant_pk, worker_count)).append(contestant_pk)
@@ -0,0 +1,263 @@
+import bisect
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Optional, Tuple, Dict, List
+
+from django.db import close_old_connections
+from redis import StrictRedis
+
+from display.utilities.tracking_definitions import (
+    TRACKING_DEVICE,
+    TRACKING_PILOT,
+    TRACKING_COPILOT,
+    TRACKING_PILOT_AND_COPILOT,
+)
+from live_tracking_map.settings import REDIS_HOST, REDIS_PORT
+
+logger = logging.getLogger(__name__)
+
+CONTESTANT_DEVICE_INDEX_CHANNEL = "contestant_device_index"
+# Contestants that start tracking within this horizon are included when the index is built
+INDEX_HORIZON = datetime.timedelta(hours=12)
+# Positions older than this are discarded by the position processor, so there is no need to index older contestants
+INDEX_LOOKBACK = datetime.timedelta(hours=14)
+
+TRACKER_PRIORITY = 0
+PILOT_PRIORITY = 1
+COPILOT_PRIORITY = 2
+
+_publisher = None
+
+
+def _get_publisher() -> StrictRedis:
+    global _publisher
+    if _publisher is None:
+        _publisher = StrictRedis(REDIS_HOST, REDIS_PORT)
+    return _publisher
+
+
+def publish_index_change(model: str, pk: int):
+    """
+    Notify all contestant device indices that the object with the primary key of the given model type ("contestant",
+    "person", "crew", "team", or "navigation_task") has changed and should be reloaded.
+    """
+    try:
+        _get_publisher().publish(CONTESTANT_DEVICE_INDEX_CHANNEL, json.dumps({"model": model, "pk": pk}))
+    except Exception:
+        logger.exception(f"Failed publishing contestant device index change for {model} {pk}")
+
+
+class ContestantDeviceIndex:
+    """
+    Process local index mapping tracking device IDs to the contestants that use them. For every device the index keeps
+    a list of (tracker_start_time, finished_by_time, priority, contestant_pk, is_simulator) sorted on
+    tracker_start_time, so that finding the contestant for a device at a time stamp is a bisect without any database
+    access. The index is built in bulk for all contestants that are active within INDEX_HORIZON, and is kept up to
+    date through change notifications published on CONTESTANT_DEVICE_INDEX_CHANNEL by the model signals, and is
+    rebuilt by the subscriber thread when it becomes stale.
+
+    The priority implements the same precedence as Contestant.get_contestant_for_device_at_time, i.e. tracking device
+    before pilot before copilot.
+    """
+
+    def __init__(self, horizon: datetime.timedelta = INDEX_HORIZON):
+        self.horizon = horizon
+        self._lock = threading.RLock()
+        self._intervals = {}  # type: Dict[str, List[Tuple[datetime.datetime, datetime.datetime, int, int, bool]]]
+        self._devices_for_contestant = {}  # type: Dict[int, List[str]]
+        self._contestants = {}  # type: Dict[int, "Contestant"]
+        self.built_time = None  # type: Optional[datetime.datetime]
+        self.pubsub = None
+        self.event_thread = None
+
+    @property
+    def is_ready(self) -> bool:
+        """
+        The index can only be trusted if it has been built and is receiving change notifications.
+        """
+        return self.built_time is not None and self.event_thread is not None and self.event_thread.is_alive()
+
+    def is_stale(self, now: datetime.datetime) -> bool:
+        return self.built_time is None or now > self.built_time + self.horizon / 2
+
+    @staticmethod
+    def _contestant_queryset():
+        from display.models import Contestant
+
+        return Contestant.objects.filter(contestanttrack__calculator_finished=False).select_related(
+            "navigation_task", "team__crew__member1", "team__crew__member2"
+        )
+
+    def build(self):
+        """
+        Load all contestants that are tracked between INDEX_LOOKBACK ago and the horizon from now.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        contestants = list(
+            self._contestant_queryset().filter(
+                tracker_start_time__lte=now + self.horizon, finished_by_time__gte=now - INDEX_LOOKBACK
+            )
+        )
+        with self._lock:
+            self._intervals = {}
+            self._devices_for_contestant = {}
+            self._contestants = {}
+            for contestant in contestants:
+                self._insert(contestant)
+            self.built_time = now
+        logger.info(
+            f"Built contestant device index with {len(self._contestants)} contestants and {len(self._intervals)} devices"
+        )
+
+    def start_listening(self):
+        """
+        Subscribe to change notifications in a background thread, which also rebuilds the index when it is stale.
+        """
+        self.pubsub = _get_publisher().pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{CONTESTANT_DEVICE_INDEX_CHANNEL: self._handle_change_message})
+        self.event_thread = threading.Thread(
+            target=self._subscriber_thread, daemon=True, name="contestant_device_index_subscriber"
+        )
+        self.event_thread.start()
+
+    def _subscriber_thread(self):
+        while True:
+            try:
+                # The message handler is called by get_message
+                self.pubsub.get_message(timeout=1)
+                if self.is_stale(datetime.datetime.now(datetime.timezone.utc)):
+                    close_old_connections()
+                    self.build()
+            except Exception:
+                logger.exception("Contestant device index subscriber failed")
+                time.sleep(1)
+
+    @staticmethod
+    def _device_entries(contestant: "Contestant") -> List[Tuple[str, int, bool]]:
+        """
+        Returns (device, priority, is_simulator) for all devices that track the contestant.
+        """
+        entries = []
+        if contestant.tracking_device == TRACKING_DEVICE and contestant.tracker_device_id:
+            entries.append((contestant.tracker_device_id, TRACKER_PRIORITY, False))
+        member1 = contestant.team.crew.member1
+        if contestant.tracking_device in (TRACKING_PILOT, TRACKING_PILOT_AND_COPILOT) and member1 is not None:
+            entries.append((member1.app_tracking_id, PILOT_PRIORITY, False))
+            entries.append((member1.simulator_tracking_id, PILOT_PRIORITY, True))
+        member2 = contestant.team.crew.member2
+        if contestant.tracking_device in (TRACKING_COPILOT, TRACKING_PILOT_AND_COPILOT) and member2 is not None:
+            entries.append((member2.app_tracking_id, COPILOT_PRIORITY, False))
+            entries.append((member2.simulator_tracking_id, COPILOT_PRIORITY, True))
+        return entries
+
+    def _insert(self, contestant: "Contestant"):
+        devices = []
+        for device, priority, is_simulator in self._device_entries(contestant):
+            bisect.insort(
+                self._intervals.setdefault(device, []),
+                (contestant.tracker_start_time, contestant.finished_by_time, priority, contestant.pk, is_simulator),
+            )
+            devices.append(device)
+        self._devices_for_contestant[contestant.pk] = devices
+        self._contestants[contestant.pk] = contestant
+
+    def _remove(self, contestant_pk: int):
+        for device in self._devices_for_contestant.pop(contestant_pk, []):
+            intervals = [item for item in self._intervals.get(device, []) if item[3] != contestant_pk]
+            if len(intervals) > 0:
+                self._intervals[device] = intervals
+            else:
+                self._intervals.pop(device, None)
+        self._contestants.pop(contestant_pk, None)
+
+    def refresh_contestants(self, contestant_pks: List[int]):
+        """
+        Reload the contestants from the database, removing them from the index if they no longer exist or are no
+        longer active.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        contestants = list(
+            self._contestant_queryset().filter(pk__in=contestant_pks, finished_by_time__gte=now - INDEX_LOOKBACK)
+        )
+        with self._lock:
+            for pk in contestant_pks:
+                self._remove(pk)
+            for contestant in contestants:
+                self._insert(contestant)
+
+    def refresh_crews(self, crew_pks: List[int]):
+        from display.models import Contestant
+
+        with self._lock:
+            indexed = [pk for pk, contestant in self._contestants.items() if contestant.team.crew_id in crew_pks]
+        self.refresh_contestants(
+            indexed + list(Contestant.objects.filter(team__crew__in=crew_pks).values_list("pk", flat=True))
+        )
+
+    def refresh_teams(self, team_pks: List[int]):
+        from display.models import Contestant
+
+        with self._lock:
+            indexed = [pk for pk, contestant in self._contestants.items() if contestant.team_id in team_pks]
+        self.refresh_contestants(
+            indexed + list(Contestant.objects.filter(team__in=team_pks).values_list("pk", flat=True))
+        )
+
+    def refresh_navigation_task(self, navigation_task_pk: int):
+        from display.models import Contestant
+
+        with self._lock:
+            indexed = [
+                pk for pk, contestant in self._contestants.items() if contestant.navigation_task_id == navigation_task_pk
+            ]
+        self.refresh_contestants(
+            indexed
+            + list(Contestant.objects.filter(navigation_task=navigation_task_pk).values_list("pk", flat=True))
+        )
+
+    def refresh_person(self, person_pk: int):
+        from display.models import Crew
+        from django.db.models import Q
+
+        self.refresh_crews(
+            list(Crew.objects.filter(Q(member1=person_pk) | Q(member2=person_pk)).values_list("pk", flat=True))
+        )
+
+    def _handle_change_message(self, message: Dict):
+        try:
+            close_old_connections()
+            change = json.loads(message["data"])
+            if change["model"] == "contestant":
+                self.refresh_contestants([change["pk"]])
+            elif change["model"] == "crew":
+                self.refresh_crews([change["pk"]])
+            elif change["model"] == "team":
+                self.refresh_teams([change["pk"]])
+            elif change["model"] == "navigation_task":
+                self.refresh_navigation_task(change["pk"])
+            elif change["model"] == "person":
+                self.refresh_person(change["pk"])
+        except Exception:
+            logger.exception(f"Failed handling contestant device index change {message}")
+
+    def lookup(self, device: str, stamp: datetime.datetime) -> Tuple[Optional["Contestant"], bool]:
+        """
+        Return the contestant that is tracked by the device at the time stamp, and whether the device is the
+        simulator tracking ID.
+        """
+        with self._lock:
+            intervals = self._intervals.get(device)
+            if not intervals:
+                return None, False
+            index = bisect.bisect_right(intervals, stamp, key=lambda item: item[0])
+            best = None
+            for position in range(index - 1, -1, -1):
+                start, finish, priority, contestant_pk, is_simulator = intervals[position]
+                if stamp <= finish and (best is None or priority < best[0]):
+                    best = (priority, contestant_pk, is_simulator)
+            if best is None:
+                return None, False
+            return self._contestants[best[1]], best[2]
@@ -3,7 +3,7 @@ import datetime
 import cartopy.crs as ccrs
 import logging
 import math
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Dict
 
 import utm
 from geopy.distance import geodesic, great_circle
@@ -264,7 +264,22 @@ from shapely.ops import transform
 from functools import partial
 
 
+# Maximum number of track segments for which the intersections with the prepared lines are kept
+SEGMENT_CACHE_SIZE = 10000
+
+
 class Projector:
+    """
+    Projects positions to an azimuthal equidistant projection centered on the given position, and calculates
+    intersections between lines in this projection.
+
+    Lines that are tested repeatedly (e.g. gate lines) can be registered with prepare_lines(). These are projected
+    once, and a track segment is then tested against all of them in a single vectorised operation the first time
+    intersect() is called for the segment. The result for each line is cached, so that the remaining calls for the
+    same segment are dictionary lookups. The vectorised test performs exactly the same floating point operations as
+    line_intersect, so the result is identical to testing each line separately.
+    """
+
     def __init__(self, latitude, longitude):
         WGS84 = CRS.from_string("epsg:4326")
         proj4str = "+proj=aeqd +lat_0=%s +lon_0=%s +x_0=0 +y_0=0" % (
@@ -274,8 +289,67 @@ class Projector:
         AEQD = CRS.from_proj4(proj4str)
         self.to_projection = Transformer.from_crs(WGS84, AEQD, always_xy=True)
         self.from_projection = Transformer.from_crs(AEQD, WGS84, always_xy=True)
+        self.line_columns = {}  # type: Dict[Tuple[Tuple[float, float], Tuple[float, float]], int]
+        self.line_coordinates = np.empty((4, 0))
+        self.segment_intersections = {}  # type: Dict[Tuple[Tuple[float, float], Tuple[float, float]], Dict]
+
+    def prepare_lines(self, lines: List[Tuple[Tuple[float, float], Tuple[float, float]]]):
+        """
+        Project the lines ((latitude, longitude), (latitude, longitude)) once, so that they can be tested against track
+        segments in a single vectorised operation.
+        """
+        for line_start, line_finish in lines:
+            self.line_columns.setdefault(
+                ((line_start[0], line_start[1]), (line_finish[0], line_finish[1])), len(self.line_columns)
+            )
+        points = np.array(list(self.line_columns.keys()), dtype=float).reshape(-1, 4)
+        x3, y3 = self.to_projection.transform(points[:, 1], points[:, 0])
+        x4, y4 = self.to_projection.transform(points[:, 3], points[:, 2])
+        self.line_coordinates = np.array([x3, y3, x4, y4]).reshape(4, -1)
+        self.segment_intersections = {}
+
+    def prepare_segments(self, segment_starts: List[Tuple[float, float]], segment_finishes: List[Tuple[float, float]]):
+        """
+        Test all the track segments against all the prepared lines in one vectorised operation, and cache the
+        intersections for subsequent calls to intersect().
+        """
+        if len(segment_starts) == 0 or len(self.line_columns) == 0:
+            return
+        if len(self.segment_intersections) + len(segment_starts) > SEGMENT_CACHE_SIZE:
+            self.segment_intersections = {}
+        starts = np.array(segment_starts, dtype=float).reshape(-1, 2)
+        finishes = np.array(segment_finishes, dtype=float).reshape(-1, 2)
+        x1, y1 = self.to_projection.transform(starts[:, 1], starts[:, 0])
+        x2, y2 = self.to_projection.transform(finishes[:, 1], finishes[:, 0])
+        x1, y1, x2, y2 = (np.reshape(item, (-1, 1)) for item in (x1, y1, x2, y2))
+        x3, y3, x4, y4 = self.line_coordinates
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Zero length segments and lines give a zero denominator, the same as parallel lines
+            denominator = (y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1)
+            ua = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / denominator
+            ub = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / denominator
+            hits = (denominator != 0) & (ua >= 0) & (ua <= 1) & (ub >= 0) & (ub <= 1)
+        segment_rows, line_columns = np.nonzero(hits)
+        hit_ua = ua[segment_rows, line_columns]
+        x = x1[segment_rows, 0] + hit_ua * (x2[segment_rows, 0] - x1[segment_rows, 0])
+        y = y1[segment_rows, 0] + hit_ua * (y2[segment_rows, 0] - y1[segment_rows, 0])
+        longitudes, latitudes = self.from_projection.transform(x, y)
+        for start, finish in zip(segment_starts, segment_finishes):
+            self.segment_intersections[((start[0], start[1]), (finish[0], finish[1]))] = {}
+        for row, column, latitude, longitude in zip(segment_rows, line_columns, latitudes, longitudes):
+            start, finish = segment_starts[row], segment_finishes[row]
+            self.segment_intersections[((start[0], start[1]), (finish[0], finish[1]))][int(column)] = (
+                float(latitude),
+                float(longitude),
+            )
 
     def intersect(self, start1, stop1, start2, stop2):
+        column = self.line_columns.get(((start2[0], start2[1]), (stop2[0], stop2[1])))
+        if column is not None:
+            segment = ((start1[0], start1[1]), (stop1[0], stop1[1]))
+            if segment not in self.segment_intersections:
+                self.prepare_segments([segment[0]], [segment[1]])
+            return self.segment_intersections[segment].get(column)
         start1 = self.to_projection.transform(*reversed(start1))
         stop1 = self.to_projection.transform(*reversed(stop1))
         start2 = self.to_projection.transform(*reversed(start2))
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Dict, Set, Callable, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CurrentTimeTicker:
+    """
+    Sends the current time to all the tracking map websockets in the process once every interval, using a single
+    asyncio task. The websockets are grouped by navigation task, and the time frame is generated once per navigation
+    task for every tick. The task is started when the first websocket is added and cancelled when the last one is
+    discarded.
+    """
+
+    def __init__(self, interval: float = 1):
+        self.interval = interval
+        self.groups = {}  # type: Dict[Any, Set]
+        self.frame_generators = {}  # type: Dict[Any, Callable[[], str]]
+        self.task = None  # type: Optional[asyncio.Task]
+
+    def add(self, group: Any, consumer, generate_frame: Callable[[], str]):
+        """
+        Add a consumer to the group. The consumer must have an async send(text_data=...) method. generate_frame is
+        called on every tick to create the frame that is sent to all consumers in the group.
+        """
+        self.groups.setdefault(group, set()).add(consumer)
+        self.frame_generators[group] = generate_frame
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def discard(self, group: Any, consumer):
+        consumers = self.groups.get(group)
+        if consumers is not None:
+            consumers.discard(consumer)
+            if len(consumers) == 0:
+                del self.groups[group]
+                del self.frame_generators[group]
+        if len(self.groups) == 0 and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def tick(self):
+        for group, consumers in list(self.groups.items()):
+            frame = self.frame_generators[group]()
+            results = await asyncio.gather(
+                *[consumer.send(text_data=frame) for consumer in list(consumers)], return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed sending current time to a websocket in group {group}: {result}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Failed sending current time")
@@ -0,0 +1,121 @@
+import datetime
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple
+
+import orjson
+from channels.layers import get_channel_layer
+from redis.asyncio import StrictRedis
+
+from display.utilities.global_positions_store import STORE_POSITION_SCRIPT, store_position_arguments
+from display.utilities.global_traffic_tiles import global_traffic_groups
+from display.utilities.metrics import WEBSOCKET_BROADCAST_TIME
+from live_tracking_map.settings import REDIS_HOST, REDIS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of positions in a single channel layer message
+MAXIMUM_MESSAGE_POSITIONS = 500
+
+
+@dataclass
+class ExternalTrafficRecord:
+    """
+    Position of an aircraft received from an external traffic source (OGN, OpenSky)
+    """
+
+    device_id: str
+    name: str
+    time_stamp: datetime.datetime
+    latitude: float
+    longitude: float
+    altitude: float  # metres (GPS)
+    baro_altitude: Optional[float]
+    speed: float  # knots
+    course: float
+    traffic_source: str
+    raw_data: Optional[Dict] = None
+    aircraft_type: int = 9
+
+    def encode(self) -> str:
+        """
+        :return: The position as sent to the global map clients
+        """
+        return orjson.dumps(
+            {
+                "name": self.name,
+                "time": self.time_stamp,
+                "person": None,
+                "deviceId": self.device_id,
+                "latitude": self.latitude,
+                "longitude": self.longitude,
+                "altitude": self.altitude,
+                "baro_altitude": self.baro_altitude,
+                "battery_level": -1,
+                "speed": self.speed,
+                "course": self.course,
+                "navigation_task_id": None,
+                "traffic_source": self.traffic_source,
+                "raw_data": self.raw_data,
+                "aircraft_type": self.aircraft_type,
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        ).decode()
+
+
+class ExternalTrafficPublisher:
+    """
+    Publishes batches of external traffic to the global map. All positions in a batch are written to the global
+    positions store in a single pipeline, and positions that are not newer than the stored position are dropped. The
+    remaining positions are sent with one channel layer message per map tile group (and for the global group) instead
+    of one message per position. Uses redis.asyncio so that the event loop is never blocked.
+
+    The publisher must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self.redis = StrictRedis(REDIS_HOST, REDIS_PORT)
+        self.channel_layer = get_channel_layer()
+        self.store_script = self.redis.register_script(STORE_POSITION_SCRIPT)
+
+    async def publish(self, records: List[ExternalTrafficRecord]) -> int:
+        """
+        :return: The number of positions that were published
+        """
+        # Only the latest position of each device in the batch is relevant
+        latest = {}  # type: Dict[str, ExternalTrafficRecord]
+        for record in records:
+            existing = latest.get(record.device_id)
+            if existing is None or record.time_stamp > existing.time_stamp:
+                latest[record.device_id] = record
+        if len(latest) == 0:
+            return 0
+        encoded = [(record, record.encode()) for record in latest.values()]
+        pipeline = self.redis.pipeline(transaction=False)
+        for record, encoded_position in encoded:
+            keys, args = store_position_arguments(
+                record.device_id, record.time_stamp, record.latitude, record.longitude, encoded_position
+            )
+            await self.store_script(keys=keys, args=args, client=pipeline)
+        stored = await pipeline.execute()
+        groups = defaultdict(list)  # type: Dict[str, List[Tuple[str, float, float]]]
+        for (record, encoded_position), is_newer in zip(encoded, stored):
+            if is_newer:
+                for group in global_traffic_groups(record.latitude, record.longitude):
+                    groups[group].append((encoded_position, record.latitude, record.longitude))
+        with WEBSOCKET_BROADCAST_TIME.labels("external_traffic").time():
+            for group, positions in groups.items():
+                for index in range(0, len(positions), MAXIMUM_MESSAGE_POSITIONS):
+                    chunk = positions[index : index + MAXIMUM_MESSAGE_POSITIONS]
+                    await self.channel_layer.group_send(
+                        group,
+                        {
+                            "type": "tracking.batch",
+                            "data": [position[0] for position in chunk],
+                            "positions": [position[1:] for position in chunk],
+                        },
+                    )
+        published = sum(stored)
+        logger.debug(f"Published {published} of {len(records)} external positions to {len(groups)} groups")
+        return published
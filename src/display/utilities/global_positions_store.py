@@ -0,0 +1,139 @@
+import datetime
+import logging
+import math
+from typing import Tuple, List
+
+from redis import StrictRedis
+
+from live_tracking_map.settings import REDIS_GLOBAL_POSITIONS_KEY, PURGE_GLOBAL_MAP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Latitudes supported by the Redis geo index
+MAXIMUM_GEO_LATITUDE = 85.05112878
+# Maximum number of positions returned by a search, closest to the centre of the bounding box first, so that a large
+# bounding box does not block Redis while every position record is read
+MAXIMUM_SEARCH_POSITIONS = 500
+
+# KEYS[1]: position record of the device, KEYS[2]: geo index, KEYS[3]: update time index
+# ARGV: time stamp (seconds), longitude, latitude, device ID, encoded position, time to live (seconds)
+STORE_POSITION_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 't')
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+local now = tonumber(redis.call('TIME')[1])
+-- Remove a bounded batch of devices whose position has expired from both indices
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - tonumber(ARGV[6]), 'LIMIT', 0, 100)
+if #expired > 0 then
+    redis.call('ZREM', KEYS[3], unpack(expired))
+    redis.call('ZREM', KEYS[2], unpack(expired))
+end
+redis.call('HSET', KEYS[1], 't', ARGV[1], 'd', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('GEOADD', KEYS[2], ARGV[2], ARGV[3], ARGV[4])
+redis.call('ZADD', KEYS[3], now, ARGV[4])
+return 1
+"""
+
+# KEYS[1]: geo index, KEYS[2]: update time index
+# ARGV: record key prefix, centre longitude, centre latitude, box width (km), box height (km), maximum positions
+SEARCH_POSITIONS_SCRIPT = """
+local devices = redis.call(
+    'GEOSEARCH', KEYS[1], 'FROMLONLAT', ARGV[2], ARGV[3], 'BYBOX', ARGV[4], ARGV[5], 'km', 'ASC', 'COUNT', ARGV[6]
+)
+local positions = {}
+for _, device in ipairs(devices) do
+    local position = redis.call('HGET', ARGV[1] .. device, 'd')
+    if position then
+        table.insert(positions, position)
+    else
+        redis.call('ZREM', KEYS[1], device)
+        redis.call('ZREM', KEYS[2], device)
+    end
+end
+return positions
+"""
+
+
+GEO_KEY = f"{REDIS_GLOBAL_POSITIONS_KEY}:geo"
+UPDATED_KEY = f"{REDIS_GLOBAL_POSITIONS_KEY}:updated"
+RECORD_PREFIX = f"{REDIS_GLOBAL_POSITIONS_KEY}:device:"
+
+
+def store_position_arguments(
+    device_id: str,
+    time_stamp: datetime.datetime,
+    latitude: float,
+    longitude: float,
+    encoded_position: str,
+    time_to_live: int = PURGE_GLOBAL_MAP_INTERVAL,
+) -> Tuple[List, List]:
+    """
+    :return: The keys and arguments for STORE_POSITION_SCRIPT
+    """
+    latitude = max(-MAXIMUM_GEO_LATITUDE, min(MAXIMUM_GEO_LATITUDE, latitude))
+    return (
+        [RECORD_PREFIX + device_id, GEO_KEY, UPDATED_KEY],
+        [time_stamp.timestamp(), longitude, latitude, device_id, encoded_position, time_to_live],
+    )
+
+
+class GlobalPositionsStore:
+    """
+    Latest position of every aircraft on the global map. Each device has a small hash holding the time stamp and the
+    encoded position that was sent to the global map clients, expiring after PURGE_GLOBAL_MAP_INTERVAL seconds. The
+    devices are indexed in a Redis geo set, so that the current traffic inside a bounding box can be found without
+    reading every position. Writes are a compare-and-set on the time stamp in a single round trip, so an older
+    position never replaces a newer one. A sorted set holds the update time of every indexed device, and each write
+    removes devices that have not been updated within the time to live from both indices, so devices outside the
+    searched areas do not accumulate in the geo index.
+    """
+
+    def __init__(self, redis: StrictRedis, time_to_live: int = PURGE_GLOBAL_MAP_INTERVAL):
+        self.redis = redis
+        self.time_to_live = time_to_live
+        self.geo_key = GEO_KEY
+        self.updated_key = UPDATED_KEY
+        self.record_prefix = RECORD_PREFIX
+        self.store_script = redis.register_script(STORE_POSITION_SCRIPT)
+        self.search_script = redis.register_script(SEARCH_POSITIONS_SCRIPT)
+
+    def store(
+        self, device_id: str, time_stamp: datetime.datetime, latitude: float, longitude: float, encoded_position: str
+    ) -> bool:
+        """
+        :param encoded_position: The position as sent to the global map clients
+        :return: True if the position was stored, False if the stored position is newer
+        """
+        keys, args = store_position_arguments(
+            device_id, time_stamp, latitude, longitude, encoded_position, self.time_to_live
+        )
+        return bool(self.store_script(keys=keys, args=args))
+
+    def search(
+        self, bounding_box: Tuple[float, float, float, float], count: int = MAXIMUM_SEARCH_POSITIONS
+    ) -> List[str]:
+        """
+        :param bounding_box: most_south, most_west, most_north, most_east (degrees)
+        :param count: The maximum number of positions to return
+        :return: The encoded positions of the devices within the bounding box, closest to the centre first
+        """
+        south, west, north, east = bounding_box
+        south, north = max(-MAXIMUM_GEO_LATITUDE, south), min(MAXIMUM_GEO_LATITUDE, north)
+        centre_latitude = (south + north) / 2
+        centre_longitude = ((west + east) / 2 + 180) % 360 - 180
+        # One degree of latitude is 111.32 km, longitude degrees are measured at the centre of the box
+        height = (north - south) * 111.32
+        width = min(360, east - west) * 111.32 * max(0.01, math.cos(math.radians(centre_latitude)))
+        positions = self.search_script(
+            keys=[self.geo_key, self.updated_key],
+            args=[self.record_prefix, centre_longitude, centre_latitude, width, height, count],
+        )
+        return [position.decode() for position in positions]
+
+    def clear(self):
+        """
+        Remove the geo and update time indices. The position records expire by themselves.
+        """
+        self.redis.delete(self.geo_key, self.updated_key)
@@ -0,0 +1,68 @@
+import math
+from typing import Tuple, Set, Optional
+
+# Positions are published to one channel group per slippy map tile at this zoom level, about 600 km across at the
+# equator and 300 km at 60 degrees north.
+TILE_ZOOM = 6
+# Group receiving every global position, used by clients that have not sent a location or that cover too many tiles
+GLOBAL_TRAFFIC_GROUP = "tracking_global"
+# Clients whose bounding box covers more tiles than this subscribe to GLOBAL_TRAFFIC_GROUP instead
+MAXIMUM_TILE_SUBSCRIPTIONS = 64
+MAXIMUM_LATITUDE = 85.0511
+
+
+def tile_for_position(latitude: float, longitude: float, zoom: int = TILE_ZOOM) -> Tuple[int, int]:
+    """
+    :return: The x and y index of the slippy map tile that contains the position
+    """
+    tiles = 2**zoom
+    latitude = max(-MAXIMUM_LATITUDE, min(MAXIMUM_LATITUDE, latitude))
+    x = math.floor((longitude + 180) / 360 * tiles) % tiles
+    y = math.floor((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * tiles)
+    return x, min(tiles - 1, max(0, y))
+
+
+def tile_group_name(x: int, y: int, zoom: int = TILE_ZOOM) -> str:
+    return f"{GLOBAL_TRAFFIC_GROUP}_{zoom}_{x}_{y}"
+
+
+def global_traffic_groups(latitude: float, longitude: float) -> Tuple[str, str]:
+    """
+    :return: The channel groups a position must be published to, the tile containing the position and the global group
+    """
+    return tile_group_name(*tile_for_position(latitude, longitude)), GLOBAL_TRAFFIC_GROUP
+
+
+def tiles_for_bounding_box(
+    bounding_box: Tuple[float, float, float, float], zoom: int = TILE_ZOOM
+) -> Set[Tuple[int, int]]:
+    """
+    Find all tiles that intersect the bounding box. Longitudes outside -180 to 180 wrap around the antimeridian.
+
+    :param bounding_box: most_south, most_west, most_north, most_east (degrees)
+    :return: Set of x and y tile indices
+    """
+    south, west, north, east = bounding_box
+    tiles = 2**zoom
+    # The northern edge has the smallest y index
+    _, minimum_y = tile_for_position(north, 0, zoom)
+    _, maximum_y = tile_for_position(south, 0, zoom)
+    minimum_x = math.floor((west + 180) / 360 * tiles)
+    maximum_x = math.floor((east + 180) / 360 * tiles)
+    if maximum_x - minimum_x + 1 >= tiles:
+        x_indices = range(tiles)
+    else:
+        x_indices = [x % tiles for x in range(minimum_x, maximum_x + 1)]
+    return {(x, y) for x in x_indices for y in range(minimum_y, maximum_y + 1)}
+
+
+def groups_for_bounding_box(bounding_box: Optional[Tuple[float, float, float, float]]) -> Set[str]:
+    """
+    :return: The channel groups a client covering the bounding box must subscribe to
+    """
+    if bounding_box is None:
+        return {GLOBAL_TRAFFIC_GROUP}
+    tiles = tiles_for_bounding_box(bounding_box)
+    if len(tiles) > MAXIMUM_TILE_SUBSCRIPTIONS:
+        return {GLOBAL_TRAFFIC_GROUP}
+    return {tile_group_name(x, y) for x, y in tiles}
@@ -0,0 +1,117 @@
+"""
+Prometheus metrics for the tracking pipeline, from the traccar websocket in the position processor, through the
+calculators, to the websocket consumers.
+
+The metrics of the web server are served on /metrics when METRICS_ENDPOINT is enabled. The position processor, the
+calculator worker, and the calculator jobs serve their metrics on METRICS_PORT (see start_metrics_server). The position
+processor spreads the work over several processes, so PROMETHEUS_MULTIPROC_DIR must be set to a writable directory for
+the metrics of all its processes to be collected (see the prometheus_client documentation on multiprocess mode). The
+directory must be emptied before the processes start, the helm charts wipe an emptyDir volume at start up.
+"""
+import logging
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from live_tracking_map.settings import METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+PROCESSING_TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Position processor
+WEBSOCKET_MESSAGES_RECEIVED = Counter(
+    "airsports_traccar_websocket_messages_received", "Messages received on the traccar websocket"
+)
+POSITIONS_RECEIVED = Counter(
+    "airsports_positions_received",
+    "Positions received from traccar by outcome: mapped (to a contestant), unmapped (global map only), duplicate, "
+    "or dropped (unknown device)",
+    ["outcome"],
+)
+
+# Calculators
+CALCULATOR_QUEUE_DEPTH = Gauge(
+    "airsports_calculator_queue_depth",
+    "Positions in the redis stream of the contestant that the calculator has not yet processed",
+    ["contestant"],
+    multiprocess_mode="livemax",
+)
+TIMED_QUEUE_LAG = Histogram(
+    "airsports_timed_queue_lag_seconds",
+    "Time from the position was due (device time plus calculation delay) until it was processed by the calculator",
+    buckets=LATENCY_BUCKETS,
+)
+GATEKEEPER_TIME_PER_POSITION = Histogram(
+    "airsports_gatekeeper_seconds_per_position",
+    "Scoring time per position, averaged over each batch of positions",
+    ["calculator"],
+    buckets=PROCESSING_TIME_BUCKETS,
+)
+SCORE_EVENT_LATENCY = Histogram(
+    "airsports_score_event_latency_seconds",
+    "Time from the position that caused a score event until the score was stored and pushed to the clients",
+    buckets=LATENCY_BUCKETS,
+)
+BUFFERED_DATA_BACKFILLS = Counter(
+    "airsports_buffered_data_backfills", "Requests to traccar for positions buffered by the tracker", ["outcome"]
+)
+BUFFERED_DATA_POSITIONS_RECOVERED = Counter(
+    "airsports_buffered_data_positions_recovered", "Positions recovered from traccar that were missing in the stream"
+)
+
+# Websockets
+WEBSOCKET_BROADCAST_TIME = Histogram(
+    "airsports_websocket_broadcast_seconds",
+    "Time spent encoding and sending a message to a channel layer group",
+    ["message_type"],
+    buckets=PROCESSING_TIME_BUCKETS,
+)
+WEBSOCKET_FRAMES_SENT = Counter(
+    "airsports_websocket_frames_sent", "Frames sent to websocket clients", ["consumer"]
+)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    :return: A registry collecting the metrics of all processes in multiprocess mode, otherwise the default registry
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def mark_process_dead(pid: int):
+    """
+    Remove the live gauge values of a process that has exited, in multiprocess mode.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def generate_metrics() -> bytes:
+    """
+    :return: The metrics in the Prometheus text format
+    """
+    return generate_latest(get_registry())
+
+
+def start_metrics_server():
+    """
+    Serve the metrics of this process (or all processes in multiprocess mode) on METRICS_PORT, if it is set.
+    """
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT, registry=get_registry())
+        logger.info(f"Serving metrics on port {METRICS_PORT}")
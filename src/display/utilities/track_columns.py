@@ -0,0 +1,96 @@
+import datetime
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from django.db.models import QuerySet
+
+# Number of positions between each progress calculation when generating position data
+PROGRESS_INTERVAL = 30
+
+
+@dataclass
+class TrackColumns:
+    """
+    The track of a contestant as one array per field instead of one object per position. Used to generate the
+    position data for the tracking map without creating model instances, Position objects, or running the
+    serialisers for every position.
+    """
+
+    times: np.ndarray  # Seconds since the epoch
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    interpolated: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "TrackColumns":
+        return cls(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def latest_time(self) -> Optional[datetime.datetime]:
+        if len(self) == 0:
+            return None
+        return datetime.datetime.fromtimestamp(float(self.times[-1]), datetime.timezone.utc)
+
+    def time_strings(self) -> np.ndarray:
+        """
+        :return: ISO 8601 UTC time stamps, formatted as by the rest framework DateTimeField
+        """
+        microseconds = np.round(self.times * 1e6).astype("int64").astype("datetime64[us]")
+        return np.char.replace(np.datetime_as_string(microseconds, timezone="UTC"), ".000000Z", "Z")
+
+    def sampled_progress(self, calculate_progress: Callable[[datetime.datetime], float]) -> np.ndarray:
+        """
+        Calculate the progress every PROGRESS_INTERVAL positions, and use it for the following positions up to the
+        next calculation.
+        """
+        sampled = [
+            calculate_progress(datetime.datetime.fromtimestamp(float(time), datetime.timezone.utc))
+            for time in self.times[::PROGRESS_INTERVAL]
+        ]
+        return np.repeat(np.array(sampled, dtype=float), PROGRESS_INTERVAL)[: len(self)]
+
+    def to_position_data(self, device_id: str, progress: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        :return: The same data as PositionSerialiser(many=True) for the positions returned by Contestant.get_track()
+        """
+        if progress is None:
+            progress = np.zeros(len(self))
+        return [
+            {
+                "latitude": latitude,
+                "longitude": longitude,
+                "altitude": 0.0,
+                "time": time,
+                "progress": position_progress,
+                "device_id": device_id,
+                "position_id": index,
+            }
+            for index, (latitude, longitude, time, position_progress) in enumerate(
+                zip(
+                    self.latitudes.tolist(),
+                    self.longitudes.tolist(),
+                    self.time_strings().tolist(),
+                    progress.tolist(),
+                )
+            )
+        ]
+
+
+def load_track_columns(positions: QuerySet) -> TrackColumns:
+    """
+    :param positions: ContestantReceivedPosition query set
+    """
+    rows = list(positions.order_by("time").values_list("time", "latitude", "longitude", "interpolated"))
+    if len(rows) == 0:
+        return TrackColumns.empty()
+    times, latitudes, longitudes, interpolated = zip(*rows)
+    return TrackColumns(
+        np.fromiter((time.timestamp() for time in times), dtype=float, count=len(rows)),
+        np.array(latitudes, dtype=float),
+        np.array(longitudes, dtype=float),
+        np.array(interpolated, dtype=bool),
+    )
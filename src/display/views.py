@@ -6,6 +6,7 @@ from io import BytesIO
 from typing import Dict, List
 
 import gpxpy
+from prometheus_client import CONTENT_TYPE_LATEST
 import zipfile
 from crispy_forms.layout import Fieldset
 from django.contrib import messages
@@ -117,10 +118,12 @@ from display.contestant_scheduling.schedule_contestants import schedule_and_crea
 from display.tasks import (
     import_gpx_track,
     revert_gpx_track_to_traccar,
+    rescore_navigation_task,
 )
 from display.utilities.welcome_emails import render_welcome_email, render_contest_creation_email
 from display.waypoint import Waypoint
-from live_tracking_map.settings import SUPPORT_EMAIL
+from display.utilities.metrics import generate_metrics
+from live_tracking_map.settings import SUPPORT_EMAIL, METRICS_ENDPOINT
 from slack_facade import post_slack_message
 from websocket_channels import (
     WebsocketFacade,
@@ -136,6 +139,15 @@ def healthz(request):
     return HttpResponse(status=status.HTTP_200_OK)
 
 
+def metrics(request):
+    """
+    Prometheus metrics of the web server, served if METRICS_ENDPOINT is enabled
+    """
+    if not METRICS_ENDPOINT:
+        raise Http404
+    return HttpResponse(generate_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
 def readyz(request):
     """
     Probe used by kubernetes
@@ -1559,6 +1571,18 @@ def navigation_task_restore_original_scorecard_view(request, pk):
     return redirect(reverse("navigationtask_scoredetails", kwargs={"pk": navigation_task.pk}))
 
 
+@guardian_permission_required("display.change_contest", (Contest, "navigationtask__pk", "pk"))
+def navigation_task_rescore_view(request, pk):
+    """
+    Rescore all contestants of the navigation task with the current scorecard. Contestants with a running calculator
+    are not rescored.
+    """
+    navigation_task = get_object_or_404(NavigationTask, pk=pk)
+    rescore_navigation_task.apply_async((navigation_task.pk,))
+    messages.success(request, "Started rescoring all contestants")
+    return redirect(reverse("navigationtask_scoredetails", kwargs={"pk": navigation_task.pk}))
+
+
 @guardian_permission_required("display.change_contest", (Contest, "navigationtask__pk", "pk"))
 def navigation_task_scorecard_override_view(request, pk):
     """
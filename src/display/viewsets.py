@@ -90,14 +90,14 @@ from display.serialisers import (
     ExternalNavigationTaskTeamIdSerialiser,
     GateCumulativeScoreSerialiser,
     PlayingCardSerialiser,
-    PositionSerialiser,
     TrackAnnotationSerialiser,
     ScoreLogEntrySerialiser,
     TaskSerialiser,
     TaskTestSerialiser, ContestantNestedTeamSerialiser,
 )
 from display.utilities.show_slug_choices import ShowChoicesMetadata
-from websocket_channels import WebsocketFacade, generate_contestant_data_block
+from display.utilities.track_columns import TrackColumns
+from websocket_channels import WebsocketFacade, generate_contestant_data_block, get_score_sequence
 
 logger = logging.getLogger(__name__)
 
@@ -780,26 +780,19 @@ def _generate_data(contestant_pk):
     contestant = get_object_or_404(Contestant, pk=contestant_pk)  # type: Contestant
     logger.debug("Fetching track for {} {}".format(contestant.pk, contestant))
     # Do not include track if we have not started a calculator yet
-    position_data = (
-        contestant.get_track()
-        if hasattr(contestant, "contestanttrack") and contestant.contestanttrack.calculator_started
-        else []
-    )
-    if len(position_data) > 0:
-        global_latest_time = position_data[-1].time
+    if hasattr(contestant, "contestanttrack") and contestant.contestanttrack.calculator_started:
+        track = contestant.get_track_columns()
     else:
-        global_latest_time = datetime.datetime(2016, 1, 1, tzinfo=datetime.timezone.utc)
-    progress = 0
-    for index, item in enumerate(position_data):
-        if index % 30 == 0:
-            progress = contestant.calculate_progress(item.time, ignore_finished=True)
-        item.progress = progress
+        track = TrackColumns.empty()
+    global_latest_time = track.latest_time or datetime.datetime(2016, 1, 1, tzinfo=datetime.timezone.utc)
+    progress = track.sampled_progress(lambda time: contestant.calculate_progress(time, ignore_finished=True))
+    position_data = track.to_position_data(contestant.tracker_device_id, progress)
     logger.debug(
         "Completed generating data {} {} with {} positions".format(contestant.pk, contestant, len(position_data))
     )
     data = generate_contestant_data_block(
         contestant,
-        positions=PositionSerialiser(position_data, many=True).data,
+        positions=position_data,
         annotations=TrackAnnotationSerialiser(contestant.trackannotation_set.all(), many=True).data,
         log_entries=ScoreLogEntrySerialiser(contestant.scorelogentry_set.filter(type=ANOMALY), many=True).data,
         latest_time=global_latest_time,
@@ -807,6 +800,7 @@ def _generate_data(contestant_pk):
         playing_cards=PlayingCardSerialiser(contestant.playingcard_set.all(), many=True).data,
         include_contestant_track=True,
         gate_times=contestant.gate_times,
+        sequence=get_score_sequence(contestant),
     )
     return data
 
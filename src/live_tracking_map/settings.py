@@ -73,6 +73,19 @@ MEDIA_LOCATION = os.environ.get("MEDIA_LOCATION", "")
 REMOVE_BG_KEY = os.environ.get("REMOVE_BG_KEY", "")
 
 SLACK_DEVELOPMENT_WEBHOOK = os.environ.get("SLACK_DEVELOPMENT_WEBHOOK", "")
+# Enables debug output from the calculators, such as rendering the ANR corridor polygon to polygon.png
+CALCULATOR_DIAGNOSTICS = os.environ.get("CALCULATOR_DIAGNOSTICS", "false").lower() in ("1", "true")
+# Number of calculator worker processes that host the calculators for many contestants each. If 0, every contestant
+# gets its own calculator process (or kubernetes job in production).
+CALCULATOR_WORKERS = int(os.environ.get("CALCULATOR_WORKERS", "0"))
+# Maximum number of calculators running concurrently in a single calculator worker
+CALCULATOR_WORKER_MAX_CALCULATORS = int(os.environ.get("CALCULATOR_WORKER_MAX_CALCULATORS", "50"))
+# Default number of processes used by the rescorenavigationtask management command
+RESCORING_PROCESSES = int(os.environ.get("RESCORING_PROCESSES", "4"))
+# Port where the position processor and the calculators serve their Prometheus metrics. If 0, they are not served.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Serve the Prometheus metrics of the web server on /metrics
+METRICS_ENDPOINT = os.environ.get("METRICS_ENDPOINT", "false").lower() in ("1", "true")
 SUPPORT_EMAIL = "support@airsports.no"
 
 REDIS_GLOBAL_POSITIONS_KEY = "global_positions"
@@ -361,6 +374,9 @@ CELERY_TASK_ACKS_LATE = True
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_TASK_REJECT_ON_WORKER_LOST = True
 # CELERY_RESULT_BACKEND = "django-db"
+# Results are only stored for the tasks that need them (e.g. chords), which must set ignore_result=False
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+CELERY_TASK_IGNORE_RESULT = True
 
 CACHES = {
     "default": {
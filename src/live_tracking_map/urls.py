@@ -14,6 +14,7 @@ from display.views import (
     global_map,
     view_token,
     firebase_token_login,
+    metrics,
 )
 from . import api
 
@@ -52,5 +53,6 @@ urlpatterns = [
     path("firebase_login/", firebase_token_login),  # Required?
     path("docs/", docs.with_ui()),
     path("api/v1/", include(api.urlpatters)),
+    path("metrics", metrics),
     re_path(r"^.?", global_map, name="globalmap"),
 ]
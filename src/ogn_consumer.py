@@ -24,8 +24,9 @@ if __name__ == "__main__":
 
     django.setup()
 
-from live_tracking_map.settings import REDIS_GLOBAL_POSITIONS_KEY, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
-from websocket_channels import WebsocketFacade
+from display.utilities.external_traffic_publisher import ExternalTrafficPublisher, ExternalTrafficRecord
+from display.utilities.global_positions_store import GlobalPositionsStore
+from live_tracking_map.settings import REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(processName)-15s: %(threadName)-15s %(levelname)-8s %(message)s',
@@ -38,7 +39,14 @@ FETCH_INTERVAL = datetime.timedelta(seconds=5)
 from ogn.client import AprsClient
 from ogn.parser import parse, ParseError
 
-ws = WebsocketFacade()
+# Beacons are published in batches of up to BATCH_SIZE beacons, at least every BATCH_INTERVAL seconds
+BATCH_SIZE = 500
+BATCH_INTERVAL = 1
+publisher = ExternalTrafficPublisher()
+# The publisher is bound to the event loop, so the same loop is used for every batch
+event_loop = asyncio.new_event_loop()
+batch = []
+batch_timestamp = 0
 
 UNKNOWN = 0
 ICAO = 1
@@ -75,6 +83,17 @@ message_count = 0
 count_timestamp = 0
 
 
+def publish_batch():
+    global batch, batch_timestamp
+    records, batch = batch, []
+    batch_timestamp = time.time()
+    if len(records) > 0:
+        try:
+            event_loop.run_until_complete(publisher.publish(records))
+        except Exception:
+            logger.exception(f"Failed publishing {len(records)} beacons")
+
+
 def process_beacon(raw_message):
     global message_count, count_timestamp
     message_count += 1
@@ -83,6 +102,8 @@ def process_beacon(raw_message):
         logger.info(f"Messages per second: {message_count/(now-count_timestamp)}")
         message_count = 0
         count_timestamp = now
+    if len(batch) >= BATCH_SIZE or now > batch_timestamp + BATCH_INTERVAL:
+        publish_batch()
     if raw_message[0] == '#':
         # logger.info('Server Status: {}'.format(raw_message))
         return
@@ -97,17 +118,21 @@ def process_beacon(raw_message):
         if beacon.get("aprs_type") == "position" and beacon.get("altitude"):
             altitude_feet = beacon["altitude"] * 3.281
             if altitude_feet < 10000 and beacon.get("address"):
-                beacon["timestamp"] = beacon["timestamp"].replace(tzinfo=datetime.timezone.utc)
-                address = beacon.get("address").lower()
-                asyncio.run(
-                    ws.transmit_external_global_position_data(address, beacon["name"],
-                                                              beacon["timestamp"],
-                                                              beacon["latitude"], beacon["longitude"],
-                                                              beacon["altitude"],
-                                                              beacon["altitude"], beacon["ground_speed"]/1.852,  # is km/h
-                                                              beacon["track"],
-                                                              "ogn", raw_data=None,
-                                                              aircraft_type=beacon["aircraft_type"]))
+                batch.append(
+                    ExternalTrafficRecord(
+                        beacon.get("address").lower(),
+                        beacon["name"],
+                        beacon["timestamp"].replace(tzinfo=datetime.timezone.utc),
+                        beacon["latitude"],
+                        beacon["longitude"],
+                        beacon["altitude"],
+                        beacon["altitude"],
+                        beacon["ground_speed"] / 1.852,  # is km/h
+                        beacon["track"],
+                        "ogn",
+                        aircraft_type=beacon["aircraft_type"],
+                    )
+                )
         # print('Received {aprs_type}: {raw_message}'.format(**beacon))
         # print('Received {beacon_type} from {name}'.format(**beacon))
     except (ParseError, AttributeError) as e:
@@ -118,7 +143,7 @@ if __name__ == "__main__":
     logger.info("OGN consumer starting")
     redis = StrictRedis(REDIS_HOST, REDIS_PORT)#, password=REDIS_PASSWORD)
     # redis = StrictRedis(unix_socket_path="/tmp/docker/redis.sock")
-    redis.delete(REDIS_GLOBAL_POSITIONS_KEY)
+    GlobalPositionsStore(redis).clear()
     client = AprsClient(aprs_user='N0CALL')
     client.connect()
     logger.info("OGN consumer connected client")
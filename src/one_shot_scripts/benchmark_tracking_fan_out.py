@@ -0,0 +1,99 @@
+"""
+Measures the CPU time spent in the tracking consumers to fan out a single position data message to 500 connected
+sockets, comparing the legacy path (the facade encodes the data block, and each consumer encodes the message again) with
+the pre-encoded frame that the consumers send unchanged.
+
+Run from the src directory: python3 -m one_shot_scripts.benchmark_tracking_fan_out
+
+Example output (Python 3.11):
+    Legacy double encoding: 7.09 ms CPU per message to 500 sockets, 1982 bytes per frame
+    Pre-encoded frame: 1.55 ms CPU per message to 500 sockets, 1627 bytes per frame
+"""
+import asyncio
+import datetime
+import json
+import os
+import time
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "live_tracking_map.settings")
+    import django
+
+    django.setup()
+
+from display.consumers import TrackingConsumer, DateTimeEncoder
+from websocket_channels import encode_tracking_frame
+
+SOCKETS = 500
+MESSAGES = 20
+POSITIONS_PER_MESSAGE = 10
+
+
+class SimulatedSocket(TrackingConsumer):
+    """
+    Tracking consumer that records the size of the frames it sends instead of writing them to a socket.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sent_bytes = 0
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        self.sent_bytes += len(text_data)
+
+    async def legacy_tracking_data(self, event):
+        await self.send(text_data=json.dumps(event["data"], cls=DateTimeEncoder))
+
+
+def generate_channel_data(message_index: int) -> dict:
+    start = datetime.datetime(2022, 6, 1, 12, tzinfo=datetime.timezone.utc) + datetime.timedelta(seconds=message_index)
+    return {
+        "contestant_id": 1,
+        "positions": [
+            {
+                "time": start + datetime.timedelta(seconds=index),
+                "latitude": 60.0 + index / 1000,
+                "longitude": 11.0 + index / 1000,
+                "altitude": 1200.0,
+                "speed": 90.0,
+                "course": 45.0,
+                "battery_level": 0.8,
+                "progress": 12.5,
+            }
+            for index in range(POSITIONS_PER_MESSAGE)
+        ],
+        "progress": 12.5,
+    }
+
+
+async def legacy_fan_out(sockets, channel_data):
+    event = {
+        "type": "tracking.data",
+        "data": {"type": "position_data", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
+    }
+    for socket in sockets:
+        await socket.legacy_tracking_data(event)
+
+
+async def frame_fan_out(sockets, channel_data):
+    event = {"type": "tracking.frame", "frame": encode_tracking_frame("position_data", channel_data)}
+    for socket in sockets:
+        await socket.tracking_frame(event)
+
+
+async def measure(name: str, fan_out):
+    sockets = [SimulatedSocket() for _ in range(SOCKETS)]
+    messages = [generate_channel_data(index) for index in range(MESSAGES)]
+    start = time.process_time()
+    for channel_data in messages:
+        await fan_out(sockets, channel_data)
+    duration = time.process_time() - start
+    print(
+        f"{name}: {1000 * duration / MESSAGES:.2f} ms CPU per message to {SOCKETS} sockets, "
+        f"{sockets[0].sent_bytes // MESSAGES} bytes per frame"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(measure("Legacy double encoding", legacy_fan_out))
+    asyncio.run(measure("Pre-encoded frame", frame_fan_out))
@@ -76,3 +76,30 @@ class TestTimedQueue(TestCase):
         self.assertEqual("Test2", data2)
         self.assertGreaterEqual(time_difference, 0)
         self.assertLessEqual(time_difference, 0.1)
+
+    def test_get_many_releases_due_items(self):
+        start = now()
+        tq = TimedQueue()
+        for index in range(5):
+            tq.put(index, start - datetime.timedelta(seconds=8))
+        tq.put(5, start + datetime.timedelta(seconds=2))
+        self.assertListEqual([0, 1, 2], tq.get_many(3))
+        self.assertListEqual([3, 4], tq.get_many())
+        self.assertListEqual([5], tq.get_many())
+        time_difference = (now() - start).total_seconds()
+        self.assertGreaterEqual(time_difference, 2)
+        self.assertLessEqual(time_difference, 2.1)
+
+    def test_get_many_keeps_order(self):
+        start = now()
+        tq = TimedQueue()
+        tq.put("Test", start + datetime.timedelta(seconds=2))
+        tq.put("Test2", start - datetime.timedelta(seconds=8))
+        self.assertListEqual(["Test", "Test2"], tq.get_many())
+        time_difference = (now() - start).total_seconds()
+        self.assertGreaterEqual(time_difference, 2)
+
+    def test_get_many_closed(self):
+        tq = TimedQueue()
+        threading.Timer(1, lambda: tq.close()).start()
+        self.assertListEqual([], tq.get_many(timeout=3))
@@ -1,16 +1,21 @@
 import datetime
+import glob
+import hashlib
+import json
 import sys
 import time
 import logging
 import os
+import tempfile
+
+import numpy as np
 import pandas as pd
 import asyncio
 
 import redis
 # import sentry_sdk
-from opensky_api import OpenSkyApi
 from requests import ReadTimeout
-from typing import Optional
+from typing import Tuple
 
 # sentry_sdk.init(
 #     "https://56e7c26e749c45c585c7123ddd34df7a@o568590.ingest.sentry.io/5713804",
@@ -27,7 +32,7 @@ if __name__ == "__main__":
 
     django.setup()
 
-from websocket_channels import WebsocketFacade
+from display.utilities.external_traffic_publisher import ExternalTrafficPublisher, ExternalTrafficRecord
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s %(processName)-15s: %(threadName)-15s %(levelname)-8s %(message)s',
@@ -38,7 +43,21 @@ logger = logging.getLogger(__name__)
 FETCH_INTERVAL = datetime.timedelta(seconds=5)
 
 
+AIRCRAFT_DATABASE_DIRECTORY = "/aircraft_database"
+# The aircraft type lookup arrays built from the aircraft database are cached here
+AIRCRAFT_DATABASE_CACHE_DIRECTORY = os.environ.get("AIRCRAFT_DATABASE_CACHE_DIRECTORY", tempfile.gettempdir())
+
+
 class AircraftDatabase:
+    """
+    Maps ICAO 24-bit addresses to OGN aircraft types. The lookup is a sorted array of addresses with a matching array
+    of types, built from the aircraft database and aircraft types CSV files. The arrays are cached on disk, keyed on
+    the modification times and sizes of the CSV files, the type mappings, and CACHE_VERSION, and memory mapped, so
+    that a restart does not need to parse the CSV files again.
+    """
+
+    # Increment when _build changes so that caches built by earlier versions are not used
+    CACHE_VERSION = 1
     DEFAULT_TYPE = 9
     OGN_TYPE_MAP = {
         "piston": 8
@@ -47,86 +66,114 @@ class AircraftDatabase:
         "helicopter": 3
     }
 
-    def __init__(self):
-        self.aircraft_database = pd.read_csv("/aircraft_database/aircraft_database.csv")
-        self.aircraft_types = pd.read_csv("/aircraft_database/aircraft_types.csv").drop_duplicates(
-            subset=["Designator"])
-        self.aircraft_types.rename(columns={"Designator": "typecode"}, inplace=True)
-        self.ogn_aircraft_type_dictionary = {}
-        self.joined = self.join_frames()
-        self._build_dictionary()
-
-    def _get_ogn_map(self, row):
-        return self.AIRCRAFT_DESCRIPTIONS.get(row["AircraftDescription"].lower(),
-                                              self.OGN_TYPE_MAP.get(row["EngineType"].lower(), self.DEFAULT_TYPE))
-
-    def join_frames(self):
-        return pd.merge(self.aircraft_database, self.aircraft_types, on="typecode", how="left")
+    def __init__(self, directory: str = AIRCRAFT_DATABASE_DIRECTORY,
+                 cache_directory: str = AIRCRAFT_DATABASE_CACHE_DIRECTORY):
+        self.database_file = os.path.join(directory, "aircraft_database.csv")
+        self.types_file = os.path.join(directory, "aircraft_types.csv")
+        self.cache_directory = cache_directory
+        self.addresses, self.types = self._load()
 
     def get_aircraft_type(self, icao: str) -> int:
-        return self.ogn_aircraft_type_dictionary.get(icao.lower(), self.DEFAULT_TYPE)
-
-    def _build_dictionary(self):
-        length = len(self.joined)
-        last_index = 0
-        for index, row in self.joined.iterrows():
-            if index == last_index + 10000:
-                last_index = index
-                print(f"{100 * index / length:.0f}%")
-            icao = str(row["icao24"]).lower()
-            if pd.notna(row['EngineType']):
-                self.ogn_aircraft_type_dictionary[icao] = self._get_ogn_map(row)
-
-    def _get_type_for_id(self, icao) -> Optional[str]:
-        try:
-            matches = self.aircraft_database[self.aircraft_database["icao24"].str.contains(icao, na=False)]
-            type_code = matches["typecode"].iloc[0]
-            if pd.notna(type_code):
-                return type_code
-            return None
-        except IndexError:
-            return None
-
-    def _get_ogn_aircraft_type_code_for_aircraft_type(self, aircraft_type_code: str) -> int:
         try:
-            aircraft_type = self.aircraft_types[
-                self.aircraft_types["Designator"].str.contains(aircraft_type_code, na=False)].iloc[0]
-            engine_type = aircraft_type["EngineType"].lower()
-            return self.OGN_TYPE_MAP.get(engine_type, self.DEFAULT_TYPE)
-        except IndexError:
+            address = int(icao, 16)
+        except ValueError:
             return self.DEFAULT_TYPE
-
-    def _get_ogn_aircraft_type_code_for_id(self, icao):
-        aircraft_type = self._get_type_for_id(icao)
-        print(aircraft_type)
-        if aircraft_type is not None:
-            return self._get_ogn_aircraft_type_code_for_aircraft_type(aircraft_type)
+        index = np.searchsorted(self.addresses, address)
+        if index < len(self.addresses) and self.addresses[index] == address:
+            return int(self.types[index])
         return self.DEFAULT_TYPE
 
-
-
-
-async def transmit_states(states):
+    def _cache_files(self) -> Tuple[str, str]:
+        key = "_".join(
+            f"{os.stat(file).st_mtime_ns}_{os.stat(file).st_size}" for file in (self.database_file, self.types_file)
+        )
+        mapping = json.dumps(
+            [self.CACHE_VERSION, self.DEFAULT_TYPE, self.OGN_TYPE_MAP, self.AIRCRAFT_DESCRIPTIONS], sort_keys=True
+        )
+        key += f"_{hashlib.sha1(mapping.encode()).hexdigest()[:12]}"
+        prefix = os.path.join(self.cache_directory, f"aircraft_database_{key}")
+        return f"{prefix}_addresses.npy", f"{prefix}_types.npy"
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray]:
+        addresses_file, types_file = self._cache_files()
+        try:
+            return np.load(addresses_file, mmap_mode="r"), np.load(types_file, mmap_mode="r")
+        except (OSError, ValueError):
+            logger.info("Aircraft type cache is missing, building it from the aircraft database")
+        addresses, types = self._build()
+        try:
+            # Remove caches built from earlier versions of the CSV files
+            for file in glob.glob(os.path.join(self.cache_directory, "aircraft_database_*.npy")):
+                os.remove(file)
+            for file, array in ((addresses_file, addresses), (types_file, types)):
+                temporary_file = f"{file}.{os.getpid()}.tmp"
+                with open(temporary_file, "wb") as f:
+                    np.save(f, array)
+                os.replace(temporary_file, file)
+        except OSError:
+            logger.exception("Failed writing aircraft type cache")
+        return addresses, types
+
+    def _build(self) -> Tuple[np.ndarray, np.ndarray]:
+        aircraft_database = pd.read_csv(self.database_file, usecols=["icao24", "typecode"], dtype=str)
+        aircraft_types = pd.read_csv(
+            self.types_file, usecols=["Designator", "EngineType", "AircraftDescription"], dtype=str
+        ).drop_duplicates(subset=["Designator"])
+        aircraft_types.rename(columns={"Designator": "typecode"}, inplace=True)
+        joined = pd.merge(aircraft_database, aircraft_types, on="typecode", how="left")
+        joined = joined[joined["EngineType"].notna()]
+        icao = joined["icao24"].str.strip().str.lower()
+        joined = joined[icao.str.fullmatch("[0-9a-f]{1,6}", na=False)]
+        icao = icao[joined.index]
+        description_types = joined["AircraftDescription"].str.lower().map(self.AIRCRAFT_DESCRIPTIONS)
+        engine_types = joined["EngineType"].str.lower().map(self.OGN_TYPE_MAP).fillna(self.DEFAULT_TYPE)
+        lookup = pd.DataFrame(
+            {
+                "address": icao.map(lambda value: int(value, 16)).to_numpy(dtype=np.uint32),
+                "type": np.where(description_types.notna(), description_types, engine_types).astype(np.uint8),
+            }
+        )
+        # Later rows take precedence for duplicate addresses
+        lookup = lookup.drop_duplicates(subset=["address"], keep="last").sort_values("address")
+        logger.info(f"Built aircraft types for {len(lookup)} addresses")
+        return lookup["address"].to_numpy(), lookup["type"].to_numpy()
+
+
+def transmit_states(states):
+    records = []
     for state in states:
         if state.time_position and state.latitude and state.longitude and state.velocity and state.geo_altitude:
             altitude_feet = state.geo_altitude * 3.281
             if altitude_feet < 10000:
-                timestamp = datetime.datetime.fromtimestamp(state.time_position, datetime.timezone.utc)
-                await websocket_facade.transmit_external_global_position_data(state.icao24.lower(),
-                                                                              state.callsign or "", timestamp,
-                                                                              state.latitude, state.longitude,
-                                                                              state.geo_altitude,
-                                                                              state.baro_altitude,
-                                                                              state.velocity * 1.944,
-                                                                              state.heading, "opensky",
-                                                                              aircraft_type=aircraft_database.get_aircraft_type(
-                                                                                  state.icao24.lower()))
+                icao = state.icao24.lower()
+                records.append(
+                    ExternalTrafficRecord(
+                        icao,
+                        state.callsign or "",
+                        datetime.datetime.fromtimestamp(state.time_position, datetime.timezone.utc),
+                        state.latitude,
+                        state.longitude,
+                        state.geo_altitude,
+                        state.baro_altitude,
+                        state.velocity * 1.944,
+                        state.heading,
+                        "opensky",
+                        aircraft_type=aircraft_database.get_aircraft_type(icao),
+                    )
+                )
+    # The publisher is bound to the event loop, so the same loop is used for every batch
+    published = event_loop.run_until_complete(publisher.publish(records))
+    logger.info(f"Published {published} of {len(records)} states")
+
 
 if __name__ == "__main__":
+    from opensky_api import OpenSkyApi
+
     aircraft_database = AircraftDatabase()
     print(f"Type: {aircraft_database.get_aircraft_type('478745')}")
     username, password = sys.argv[1:]
-    websocket_facade = WebsocketFacade()
+    event_loop = asyncio.new_event_loop()
+    publisher = ExternalTrafficPublisher()
     api = OpenSkyApi(username, password)
     while True:
         logger.debug("Fetching states")
@@ -139,7 +186,7 @@ if __name__ == "__main__":
         last_fetch = datetime.datetime.now()
         if response:
             logger.info(f"Received {len(response.states)} states")
-            asyncio.run(transmit_states(response.states))
+            transmit_states(response.states)
             logger.debug("Done")
             elapsed = datetime.datetime.now() - last_fetch
             sleep_interval = (FETCH_INTERVAL - elapsed).total_seconds()
@@ -14,7 +14,7 @@ from display.models import Contestant, ContestantUploadedTrack
 
 import os
 
-from redis_queue import RedisQueue
+from redis_queue import RedisStreamQueue
 
 TRACCAR_HOST = os.environ.get("TRACCAR_HOST", "traccar")
 server = f"{TRACCAR_HOST}:5055"
@@ -108,18 +108,14 @@ def recalculate_traccar(contestant: "Contestant"):
         contestant.save(update_fields=["finished_by_time"])
     track = contestant.get_traccar_track()
     queue_name = f"override_{contestant.pk}"
-    q = RedisQueue(queue_name)
-    while not q.empty():
-        q.pop()
-    for i in track:
-        q.append(i)
-    q.append(None)
+    q = RedisStreamQueue(queue_name)
+    q.clear()
+    q.extend(track + [None])
     logger.debug(f"Loaded {len(track)} positions")
     cancel_termination_request(contestant.pk)
     contestant_processor = ContestantProcessor(contestant, live_processing=False, queue_name_override=queue_name)
     contestant_processor.run()
-    while not q.empty():
-        q.pop()
+    q.clear()
 
 
 def insert_gpx_file(contestant_object: "Contestant", file):
@@ -183,14 +179,10 @@ def insert_gpx_file(contestant_object: "Contestant", file):
     ContestantUploadedTrack.objects.create(contestant=contestant_object, track=positions)
     logger.debug("Created new uploaded track with {} positions".format(len(positions)))
     queue_name = f"override_{contestant_object.pk}"
-    q = RedisQueue(queue_name)
-    while not q.empty():
-        q.pop()
-    for i in positions:
-        q.append(i)
-    q.append(None)
+    q = RedisStreamQueue(queue_name)
+    q.clear()
+    q.extend(positions + [None])
     cancel_termination_request(contestant_object.pk)
     contestant_processor = ContestantProcessor(contestant_object, live_processing=False, queue_name_override=queue_name)
     contestant_processor.run()
-    while not q.empty():
-        q.pop()
+    q.clear()
@@ -17,6 +17,7 @@ from traccar_facade import Traccar
 from django.core.cache import cache
 from django.db import connections
 
+from display.utilities.metrics import WEBSOCKET_MESSAGES_RECEIVED, start_metrics_server, mark_process_dead
 from position_processor_process import initial_processor, LAST_DEBUG_KEY
 from live_position_transmitter import live_position_transmitter_process
 
@@ -33,6 +34,7 @@ received_messages = 0
 failed_traccar_connection_count = 0
 
 disconnected_time = None
+child_processes = []
 
 
 def print_messages_debug():
@@ -49,6 +51,7 @@ def on_message(ws, message):
     failed_traccar_connection_count = 0
     data = json.loads(message)
     received_messages += 1
+    WEBSOCKET_MESSAGES_RECEIVED.inc()
     # for item in data.get("positions", []):
     #     logger.debug(f"Received position ID {item['id']} for device ID {item['deviceId']}")
     processing_queue.put(data)
@@ -73,10 +76,22 @@ def on_open(ws):
 CONNECTION_CHECK_INTERVAL = 30
 
 
+def check_child_processes():
+    """
+    Used in the main process. Child processes that have exited are removed from the metrics.
+    """
+    for process in list(child_processes):
+        if not process.is_alive():
+            logger.error(f"Process {process.name} has exited with exit code {process.exitcode}")
+            mark_process_dead(process.pid)
+            child_processes.remove(process)
+
+
 def check_connection():
     """
     Used in the main process
     """
+    check_child_processes()
     last_debug = cache.get(LAST_DEBUG_KEY)
     if (
         (disconnected_time and time.time() - disconnected_time > 300)
@@ -111,21 +126,27 @@ if __name__ == "__main__":
     """
     django.db.connections.close_all()
     cache.clear()
-    Process(
-        target=live_position_transmitter_process,
-        args=(global_map_queue,),
-        daemon=True,
-        name="live_position_transmitter",
-    ).start()
-
+    child_processes.append(
+        Process(
+            target=live_position_transmitter_process,
+            args=(global_map_queue,),
+            daemon=True,
+            name="live_position_transmitter",
+        )
+    )
     logger.info(f"Creating initial processor")
-    Process(
-        target=initial_processor,
-        args=(processing_queue, global_map_queue),
-        daemon=False,
-        name="initial_processor",
-    ).start()
+    child_processes.append(
+        Process(
+            target=initial_processor,
+            args=(processing_queue, global_map_queue),
+            daemon=False,
+            name="initial_processor",
+        )
+    )
+    for process in child_processes:
+        process.start()
 
+    start_metrics_server()
     probes.readiness(True)
     check_connection()
     print_messages_debug()
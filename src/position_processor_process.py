@@ -19,9 +19,10 @@ from urllib3.exceptions import ProtocolError
 
 from display.utilities.calculator_running_utilities import is_calculator_running, calculator_is_alive
 from display.utilities.calculator_termination_utilities import is_termination_requested
+from display.utilities.calculator_worker_utilities import request_calculator
 from display.kubernetes_calculator.job_creator import JobCreator, AlreadyExists
 from live_tracking_map import settings
-from redis_queue import RedisQueue
+from redis_queue import RedisStreamQueue
 
 if __name__ == "__main__":
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "live_tracking_map.settings")
@@ -34,10 +35,13 @@ from django.db import connections, OperationalError, connection
 from display.calculators.contestant_processor import ContestantProcessor
 
 from display.models import Contestant
+from display.utilities.contestant_device_index import ContestantDeviceIndex
+from display.utilities.metrics import POSITIONS_RECEIVED
 from traccar_facade import Traccar
 
 CACHE_TTL = 60
 contestant_cache = {}
+contestant_device_index = ContestantDeviceIndex()
 
 logger = logging.getLogger(__name__)
 processes = {}
@@ -64,35 +68,88 @@ def print_contestant_positions_debug():
         cache.set(LAST_DEBUG_KEY, last_debug, 10 * DEBUG_INTERVAL)
 
 
+def _cache_contestant(
+    device_name: str, device_time: datetime.datetime, contestant: Optional[Contestant], is_simulator: bool
+):
+    """
+    Store the result of a contestant lookup in the process local contestant cache.
+    """
+    if contestant:
+        logger.info(f"Found contestant for incoming position {contestant}{' (simulator)' if is_simulator else ''}")
+        if is_simulator and not contestant.has_been_tracked_by_simulator:
+            contestant.has_been_tracked_by_simulator = True
+            contestant.save(update_fields=("has_been_tracked_by_simulator",))
+
+    contestant_cache[device_name] = (
+        contestant,
+        is_simulator,
+        device_time
+        + min(
+            datetime.timedelta(seconds=CACHE_TTL),
+            contestant.finished_by_time - device_time
+            if contestant is not None
+            else datetime.timedelta(seconds=CACHE_TTL),
+        ),
+    )
+
+
+def _get_cached_contestant(
+    device_name: str, device_time: datetime.datetime
+) -> Tuple[Optional[Contestant], bool]:
+    """
+    Raises KeyError if the device is not in the cache or the cached entry is no longer valid.
+    """
+    contestant, is_simulator, valid_to = contestant_cache[device_name]
+    if valid_to < device_time:
+        raise KeyError
+    return contestant, is_simulator
+
+
 def cached_find_contestant(device_name: str, device_time: datetime.datetime) -> Tuple[Optional[Contestant], bool]:
     try:
-        contestant, is_simulator, valid_to = contestant_cache[device_name]
-        if valid_to < device_time:
-            raise KeyError
+        contestant, is_simulator = _get_cached_contestant(device_name, device_time)
     except KeyError:
         contestant, is_simulator = Contestant.get_contestant_for_device_at_time(device_name, device_time)
-        if contestant:
-            logger.info(f"Found contestant for incoming position {contestant}{' (simulator)' if is_simulator else ''}")
-            if is_simulator and not contestant.has_been_tracked_by_simulator:
-                contestant.has_been_tracked_by_simulator = True
-                contestant.save(update_fields=("has_been_tracked_by_simulator",))
-
-        contestant_cache[device_name] = (
-            contestant,
-            is_simulator,
-            device_time
-            + min(
-                datetime.timedelta(seconds=CACHE_TTL),
-                contestant.finished_by_time - device_time
-                if contestant is not None
-                else datetime.timedelta(seconds=CACHE_TTL),
-            ),
-        )
+        _cache_contestant(device_name, device_time, contestant, is_simulator)
     if contestant and contestant.is_currently_tracked_by_device(device_name):
         return contestant, is_simulator
     return None, is_simulator
 
 
+def cached_find_contestants(
+    device_times: Dict[str, datetime.datetime]
+) -> Dict[str, Tuple[Optional[Contestant], bool]]:
+    """
+    Batch version of cached_find_contestant. If the contestant device index is available it is used to look up all
+    devices without touching the database. The index holds every contestant that is active within its horizon and is
+    kept up to date by the change notifications, so a device that is not found in the index is not tracking any
+    contestant. Otherwise, all devices that are missing from the contestant cache are resolved with a single database
+    query. Note that is_currently_tracked_by_device is not checked, this must be done by the caller for each position.
+    """
+    found = {}
+    if contestant_device_index.is_ready:
+        for device_name, device_time in device_times.items():
+            contestant, is_simulator = contestant_device_index.lookup(device_name, device_time)
+            if is_simulator and contestant and not contestant.has_been_tracked_by_simulator:
+                contestant.has_been_tracked_by_simulator = True
+                contestant.save(update_fields=("has_been_tracked_by_simulator",))
+            found[device_name] = (contestant, is_simulator)
+        return found
+    missing = {}
+    for device_name, device_time in device_times.items():
+        try:
+            found[device_name] = _get_cached_contestant(device_name, device_time)
+        except KeyError:
+            missing[device_name] = device_time
+    if len(missing) > 0:
+        for device_name, (contestant, is_simulator) in Contestant.get_contestants_for_devices_at_time(
+            missing
+        ).items():
+            _cache_contestant(device_name, missing[device_name], contestant, is_simulator)
+            found[device_name] = (contestant, is_simulator)
+    return found
+
+
 def clean_db_positions():
     for c in connections.all():
         c.close_if_unusable_or_obsolete()
@@ -102,6 +159,11 @@ def initial_processor(queue: Queue, global_map_queue: Queue):
     cache.set(LAST_DEBUG_KEY, last_debug, 10 * DEBUG_INTERVAL)
 
     connections.close_all()
+    try:
+        contestant_device_index.build()
+        contestant_device_index.start_listening()
+    except Exception:
+        logger.exception("Failed building the contestant device index, falling back to database lookups")
     while True:
         try:
             traccar = Traccar.create_from_configuration()
@@ -212,8 +274,14 @@ def add_positions_to_calculator(contestant: Contestant, positions: List):
                     wait_ms=500,
                 )
 
-            q = RedisQueue(str(contestant.pk))
-            if settings.PRODUCTION:
+            q = RedisStreamQueue(str(contestant.pk))
+            if settings.CALCULATOR_WORKERS > 0:
+                # Hand the contestant over to the calculator worker responsible for it
+                processes[key] = (q, None)
+                calculator_is_alive(contestant.pk, 300)  # Give the worker five minutes to start the calculator
+                request_calculator(contestant.pk, settings.CALCULATOR_WORKERS)
+                logger.info(f"Requested calculator for {contestant} from calculator worker")
+            elif settings.PRODUCTION:
                 # Create kubernetes job for the calculator
                 creator = JobCreator()
                 processes[key] = (q, None)
@@ -252,9 +320,7 @@ def add_positions_to_calculator(contestant: Contestant, positions: List):
             else:
                 start_internal_calculator()
     redis_queue = processes[key][0]
-    for position in positions:
-        # logger.debug(f"Adding position ID {position['id']} for device ID {position['deviceId']} to calculator")
-        redis_queue.append(position)
+    redis_queue.extend(positions)
 
 
 def cleanup_calculators():
@@ -267,11 +333,16 @@ def map_positions_to_contestants(traccar: Traccar, positions: List, global_map_q
     """
     Determine which contestant the position data belongs to. Forward the position with the associated person or
     contestant to the global queue.
+
+    The positions are handled as a batch. The last seen check for all positions is done using a single round trip to
+    the cache (get_many/set_many), and all devices that are not already in the contestant cache are resolved with a
+    single database query.
     """
     if len(positions) == 0:
         return {}
     # logger.info("Received {} positions".format(len(positions)))
-    received_tracks = {}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    named_positions = []
     for position_data in positions:
         # logger.info("Incoming position: {}".format(position_data))
         try:
@@ -282,31 +353,60 @@ def map_positions_to_contestants(traccar: Traccar, positions: List, global_map_q
                 device_name = traccar.device_map[position_data["deviceId"]]
             except KeyError:
                 logger.error("Could not find device {}.".format(position_data["deviceId"]))
+                POSITIONS_RECEIVED.labels("dropped").inc()
                 continue
-        device_time = dateutil.parser.parse(position_data["deviceTime"])
         # Store this so that we do not have to parse the datetime string again
-        position_data["device_time"] = device_time
+        position_data["device_time"] = dateutil.parser.parse(position_data["deviceTime"])
         position_data["server_time"] = dateutil.parser.parse(position_data["serverTime"])
-        position_data["processor_received_time"] = datetime.datetime.now(datetime.timezone.utc)
-        now = datetime.datetime.now(datetime.timezone.utc)
+        position_data["processor_received_time"] = now
+        named_positions.append((device_name, position_data))
+
+    # Only check the cache if the position is old
+    last_seen = cache.get_many(
+        [
+            f"last_seen_{position_data['deviceId']}"
+            for _, position_data in named_positions
+            if (now - position_data["device_time"]).total_seconds() > 30
+        ]
+    )
+    new_positions = []
+    for device_name, position_data in named_positions:
+        device_time = position_data["device_time"]
         last_seen_key = f"last_seen_{position_data['deviceId']}"
         if (now - device_time).total_seconds() > 30:
-            # Only check the cache if the position is old
-            last_seen = cache.get(last_seen_key)
-            if last_seen == device_time or device_time < now - datetime.timedelta(hours=14):
+            if last_seen.get(last_seen_key) == device_time or device_time < now - datetime.timedelta(hours=14):
                 # If we have seen it or it is really old, ignore it
                 logger.debug(f"Received repeated position, disregarding: {device_name} {device_time}")
+                POSITIONS_RECEIVED.labels("duplicate").inc()
                 continue
-        cache.set(last_seen_key, device_time)
-        # print(device_time)
-        try:
-            contestant, is_simulator = cached_find_contestant(device_name, device_time)
-        except OperationalError:
-            logger.warning(f"Error when fetching person for app_tracking_id '{device_name}'. Attempting to reconnect")
-            connection.connect()
+        last_seen[last_seen_key] = device_time
+        new_positions.append((device_name, position_data))
+    if len(new_positions) == 0:
+        return {}
+    cache.set_many(
+        {f"last_seen_{position_data['deviceId']}": position_data["device_time"] for _, position_data in new_positions}
+    )
+
+    device_times = {}
+    for device_name, position_data in new_positions:
+        device_times.setdefault(device_name, position_data["device_time"])
+    try:
+        contestants = cached_find_contestants(device_times)
+    except OperationalError:
+        logger.warning(
+            f"Error when fetching persons for app_tracking_ids {list(device_times.keys())}. Attempting to reconnect"
+        )
+        connection.connect()
+        contestants = {}
+
+    received_tracks = {}
+    for device_name, position_data in new_positions:
+        device_time = position_data["device_time"]
+        contestant, is_simulator = contestants.get(device_name, (None, True))
+        if contestant and not contestant.is_currently_tracked_by_device(device_name):
             contestant = None
-            is_simulator = True
         if contestant:
+            POSITIONS_RECEIVED.labels("mapped").inc()
             try:
                 received_tracks[contestant].append(position_data)
             except KeyError:
@@ -321,5 +421,6 @@ def map_positions_to_contestants(traccar: Traccar, positions: List, global_map_q
                 )
             )
         else:
+            POSITIONS_RECEIVED.labels("unmapped").inc()
             global_map_queue.put((PERSON_TYPE, device_name, position_data, device_time, is_simulator))
     return received_tracks
@@ -1,7 +1,10 @@
+import datetime
 import logging
 import pickle
-from typing import Dict, Any, List, Tuple
+import socket
+from typing import Dict, Any, List, Tuple, Optional
 
+import msgpack
 import redis
 
 from live_tracking_map.settings import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
@@ -81,3 +84,219 @@ class RedisQueue:
             return False
         except RedisEmpty:
             return True
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _encode_time(stamp: Optional[datetime.datetime]) -> Optional[int]:
+    if stamp is None:
+        return None
+    return (stamp - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _decode_time(stamp: Optional[int]) -> Optional[datetime.datetime]:
+    if stamp is None:
+        return None
+    return EPOCH + datetime.timedelta(microseconds=stamp)
+
+
+def encode_position(position: Optional[Dict]) -> bytes:
+    """
+    Pack a traccar position dictionary into a msgpack array with a fixed field order. Only the fields used by the
+    calculator are kept, the rest of the traccar attributes are discarded. None is used as the end of track marker and
+    is encoded as msgpack nil.
+    """
+    if position is None:
+        return msgpack.packb(None)
+    return msgpack.packb(
+        [
+            _encode_time(position["device_time"]),
+            float(position["latitude"]),
+            float(position["longitude"]),
+            float(position["altitude"]),
+            float(position["speed"]),
+            float(position["course"]),
+            float(position["attributes"].get("batteryLevel", -1.0)),
+            position["id"],
+            position["deviceId"],
+            _encode_time(position.get("server_time")),
+            _encode_time(position.get("processor_received_time")),
+        ]
+    )
+
+
+def decode_position(data: bytes) -> Optional[Dict]:
+    """
+    Unpack a position packed by encode_position into a dictionary with the same keys as the traccar position.
+    """
+    record = msgpack.unpackb(data)
+    if record is None:
+        return None
+    (
+        device_time,
+        latitude,
+        longitude,
+        altitude,
+        speed,
+        course,
+        battery_level,
+        position_id,
+        device_id,
+        server_time,
+        processor_received_time,
+    ) = record
+    return {
+        "device_time": _decode_time(device_time),
+        "latitude": latitude,
+        "longitude": longitude,
+        "altitude": altitude,
+        "speed": speed,
+        "course": course,
+        "attributes": {"batteryLevel": battery_level},
+        "id": position_id,
+        "deviceId": device_id,
+        "server_time": _decode_time(server_time),
+        "processor_received_time": _decode_time(processor_received_time),
+    }
+
+
+class RedisStreamQueue:
+    """
+    Position queue based on a redis stream. Positions are packed using a fixed msgpack schema (see encode_position)
+    and can be appended and read in batches. The queue is read through a consumer group, and each entry must be
+    acknowledged when it has been processed.
+
+    Entries are not deleted when they are read, so the stream contains the complete history of positions for the
+    queue. A calculator that is restarted resets its state and can rewind the consumer group to replay the history
+    from redis instead of fetching everything again from traccar.
+    """
+
+    FIELD = b"p"
+
+    def __init__(
+        self,
+        queue_name: str,
+        namespace: str = "contestant_processor_stream",
+        group: str = "calculator",
+        max_length: int = 100000,
+    ):
+        self.queue_name = f"{namespace}:{queue_name}"
+        self.group = group
+        self.consumer = socket.gethostname()
+        self.max_length = max_length
+        try:
+            logger.debug("Attempting to connect to {}:{}".format(REDIS_HOST, REDIS_PORT))
+            self.redis_handle = redis.StrictRedis(REDIS_HOST, REDIS_PORT)
+            logger.info(
+                "Connected RedisStreamQueue to {}:{} with the stream {}".format(REDIS_HOST, REDIS_PORT, self.queue_name)
+            )
+        except:
+            self.redis_handle = None
+            logger.exception("Failed connecting to redis host")
+
+    def append(self, item: Optional[Dict]):
+        self.extend([item])
+
+    def extend(self, items: List[Optional[Dict]]):
+        """
+        Append all the items to the stream using a single round trip.
+        """
+        if self.redis_handle and len(items) > 0:
+            pipeline = self.redis_handle.pipeline(transaction=False)
+            for item in items:
+                pipeline.xadd(
+                    self.queue_name, {self.FIELD: encode_position(item)}, maxlen=self.max_length, approximate=True
+                )
+            pipeline.execute()
+
+    def _create_group(self, start_id: str):
+        try:
+            self.redis_handle.xgroup_create(self.queue_name, self.group, id=start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            self.redis_handle.xgroup_setid(self.queue_name, self.group, id=start_id)
+
+    def rewind(self):
+        """
+        Restart reading the stream from the beginning, including entries that have already been acknowledged.
+        """
+        if self.redis_handle:
+            self._create_group("0")
+
+    @property
+    def size(self) -> int:
+        return self.redis_handle.xlen(self.queue_name)
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of entries that have not yet been processed by the consumer group, i.e. entries that have not been read
+        (the lag of the group) and entries that have been read but not acknowledged.
+        """
+        try:
+            groups = self.redis_handle.xinfo_groups(self.queue_name)
+        except redis.ResponseError:
+            # The stream does not exist
+            return 0
+        for group in groups:
+            name = group["name"].decode() if isinstance(group["name"], bytes) else group["name"]
+            if name == self.group:
+                return (group.get("lag") or 0) + group["pending"]
+        return self.size
+
+    def pop_many(self, count: int = 100, blocking=False, timeout: float = 10) -> List[Tuple[bytes, Optional[Dict]]]:
+        """
+        Read up to count entries that have not yet been delivered to the consumer group. Returns a list of
+        (entry_id, position) that must be acknowledged when they have been processed. Raises RedisEmpty if there are
+        no entries available.
+        """
+        if not self.redis_handle:
+            return []
+        response = self.redis_handle.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.queue_name: ">"},
+            count=count,
+            block=int(timeout * 1000) if blocking else None,
+        )
+        if not response or len(response[0][1]) == 0:
+            raise RedisEmpty
+        items = []
+        for entry_id, fields in response[0][1]:
+            try:
+                items.append((entry_id, decode_position(fields[self.FIELD])))
+            except:
+                logger.exception(f"Failed decoding stream entry {entry_id}")
+                self.acknowledge([entry_id])
+        return items
+
+    def acknowledge(self, entry_ids: List[bytes]):
+        if self.redis_handle and len(entry_ids) > 0:
+            self.redis_handle.xack(self.queue_name, self.group, *entry_ids)
+
+    def peek(self) -> Optional[Dict]:
+        """
+        Return the first position in the stream, regardless of whether it has been read.
+        """
+        if self.redis_handle:
+            entries = self.redis_handle.xrange(self.queue_name, count=1)
+            if len(entries) == 0:
+                raise RedisEmpty
+            return decode_position(entries[0][1][self.FIELD])
+        return None
+
+    def empty(self) -> bool:
+        try:
+            self.peek()
+            return False
+        except RedisEmpty:
+            return True
+
+    def clear(self):
+        """
+        Delete the stream and the consumer group.
+        """
+        if self.redis_handle:
+            self.redis_handle.delete(self.queue_name)
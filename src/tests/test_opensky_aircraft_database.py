@@ -0,0 +1,65 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from opensky_consumer import AircraftDatabase
+
+AIRCRAFT_DATABASE = """icao24,typecode,registration
+478745,C172,LN-ABC
+4787AB,R44,LN-HEL
+47874c,B738,LN-JET
+xyz,C172,INVALID
+47874d,UNKNOWN,LN-UNK
+"""
+
+AIRCRAFT_TYPES = """Designator,EngineType,AircraftDescription
+C172,Piston,LandPlane
+R44,Piston,Helicopter
+B738,Jet,LandPlane
+"""
+
+
+class TestAircraftDatabase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(self.cache_directory.cleanup)
+        for name, content in (("aircraft_database.csv", AIRCRAFT_DATABASE), ("aircraft_types.csv", AIRCRAFT_TYPES)):
+            with open(os.path.join(self.directory.name, name), "w") as f:
+                f.write(content)
+
+    def create_database(self) -> AircraftDatabase:
+        return AircraftDatabase(self.directory.name, self.cache_directory.name)
+
+    def test_get_aircraft_type(self):
+        database = self.create_database()
+        self.assertEqual(8, database.get_aircraft_type("478745"))
+        # Helicopter description takes precedence over the engine type, and addresses are case insensitive
+        self.assertEqual(3, database.get_aircraft_type("4787ab"))
+        self.assertEqual(AircraftDatabase.DEFAULT_TYPE, database.get_aircraft_type("47874c"))
+        # Unknown type code
+        self.assertEqual(AircraftDatabase.DEFAULT_TYPE, database.get_aircraft_type("47874d"))
+        self.assertEqual(AircraftDatabase.DEFAULT_TYPE, database.get_aircraft_type("000001"))
+
+    def test_invalid_address(self):
+        database = self.create_database()
+        self.assertEqual(AircraftDatabase.DEFAULT_TYPE, database.get_aircraft_type("xyz"))
+        self.assertEqual(AircraftDatabase.DEFAULT_TYPE, database.get_aircraft_type(""))
+
+    def test_cache_round_trip(self):
+        database = self.create_database()
+        with patch.object(AircraftDatabase, "_build") as build:
+            cached = self.create_database()
+            build.assert_not_called()
+        self.assertListEqual(list(database.addresses), list(cached.addresses))
+        self.assertListEqual(list(database.types), list(cached.types))
+        self.assertEqual(3, cached.get_aircraft_type("4787ab"))
+
+    def test_cache_is_rebuilt_when_mapping_changes(self):
+        self.create_database()
+        with patch.object(AircraftDatabase, "AIRCRAFT_DESCRIPTIONS", {}):
+            database = self.create_database()
+            self.assertEqual(8, database.get_aircraft_type("4787ab"))
+        self.assertEqual(1, len([file for file in os.listdir(self.cache_directory.name) if "addresses" in file]))
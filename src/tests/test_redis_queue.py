@@ -0,0 +1,85 @@
+import datetime
+
+from django.test import TestCase
+
+from redis_queue import RedisStreamQueue, RedisEmpty, encode_position, decode_position
+
+
+def make_position(index: int) -> dict:
+    time = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(seconds=index)
+    return {
+        "id": index,
+        "deviceId": 3,
+        "latitude": 60.1 + index / 1000,
+        "longitude": 11.2,
+        "altitude": 100.0,
+        "speed": 50.0,
+        "course": 90.0,
+        "attributes": {"batteryLevel": 0.5, "motion": True, "distance": 12.3},
+        "device_time": time,
+        "server_time": time + datetime.timedelta(seconds=1),
+        "processor_received_time": time + datetime.timedelta(seconds=2),
+    }
+
+
+class TestPositionEncoding(TestCase):
+    def test_round_trip(self):
+        position = make_position(1)
+        decoded = decode_position(encode_position(position))
+        position["attributes"] = {"batteryLevel": 0.5}
+        self.assertDictEqual(position, decoded)
+
+    def test_round_trip_missing_optional_fields(self):
+        position = make_position(1)
+        del position["server_time"]
+        del position["processor_received_time"]
+        position["attributes"] = {}
+        position["deviceId"] = "tracker"
+        decoded = decode_position(encode_position(position))
+        self.assertEqual(-1.0, decoded["attributes"]["batteryLevel"])
+        self.assertEqual("tracker", decoded["deviceId"])
+        self.assertIsNone(decoded["server_time"])
+        self.assertIsNone(decoded["processor_received_time"])
+
+    def test_end_marker(self):
+        self.assertIsNone(decode_position(encode_position(None)))
+
+
+class TestRedisStreamQueue(TestCase):
+    def setUp(self):
+        self.queue = RedisStreamQueue("test_queue")
+        self.queue.clear()
+        self.queue.rewind()
+
+    def tearDown(self):
+        self.queue.clear()
+
+    def test_batch_read_and_acknowledge(self):
+        self.queue.extend([make_position(index) for index in range(5)] + [None])
+        self.assertEqual(6, self.queue.size)
+        entries = self.queue.pop_many(4)
+        self.assertListEqual([0, 1, 2, 3], [position["id"] for _, position in entries])
+        self.queue.acknowledge([entry_id for entry_id, _ in entries])
+        entries = self.queue.pop_many(4)
+        self.assertEqual(4, entries[0][1]["id"])
+        self.assertIsNone(entries[1][1])
+        with self.assertRaises(RedisEmpty):
+            self.queue.pop_many(4)
+
+    def test_rewind_replays_history(self):
+        self.queue.extend([make_position(index) for index in range(3)])
+        entries = self.queue.pop_many(10)
+        self.queue.acknowledge([entry_id for entry_id, _ in entries])
+        self.queue.rewind()
+        self.assertListEqual([0, 1, 2], [position["id"] for _, position in self.queue.pop_many(10)])
+        self.assertEqual(0, self.queue.peek()["id"])
+
+    def test_depth_counts_unprocessed_entries(self):
+        self.queue.extend([make_position(index) for index in range(5)])
+        self.assertEqual(5, self.queue.depth)
+        entries = self.queue.pop_many(3)
+        # Read but not acknowledged
+        self.assertEqual(5, self.queue.depth)
+        self.queue.acknowledge([entry_id for entry_id, _ in entries])
+        self.assertEqual(2, self.queue.depth)
+        self.assertEqual(5, self.queue.size)
@@ -0,0 +1,143 @@
+import datetime
+from unittest import TestCase
+from unittest.mock import Mock, PropertyMock, patch
+
+import orjson
+
+from traccar_facade import Traccar, parse_traccar_time, iter_json_array
+
+POSITIONS = [
+    {
+        "id": 4565767,
+        "attributes": {"batteryLevel": 53.0},
+        "deviceId": 11942,
+        "serverTime": "2021-09-17T10:56:54.000+00:00",
+        "deviceTime": "2021-09-17T10:55:03.000+00:00",
+        "latitude": 52.82202,
+        "longitude": 8.7318365,
+        "altitude": 455.001,
+        "speed": 77.2231,
+        "course": 214.099,
+    },
+    {
+        "id": 4565768,
+        "attributes": {},
+        "deviceId": 11942,
+        "serverTime": "2021-09-17T10:56:55.000+00:00",
+        "deviceTime": "2021-09-17T10:55:04.500+00:00",
+        "latitude": 52.8221,
+        "longitude": 8.7317,
+        "altitude": 456.0,
+        "speed": 77.0,
+        "course": 214.0,
+    },
+]
+
+
+def positions_response(status_code: int = 200) -> Mock:
+    return Mock(
+        status_code=status_code, text="Failed", url="http://traccar/api/positions", content=orjson.dumps(POSITIONS)
+    )
+
+
+def streamed_positions_response(chunk_size: int = 100) -> Mock:
+    body = orjson.dumps(POSITIONS)
+    response = positions_response()
+    response.__enter__ = Mock(return_value=response)
+    response.__exit__ = Mock(return_value=False)
+    response.iter_content.return_value = [body[index : index + chunk_size] for index in range(0, len(body), chunk_size)]
+    return response
+
+
+def chunked(body: bytes, chunk_size: int) -> list:
+    return [body[index : index + chunk_size] for index in range(0, len(body), chunk_size)]
+
+
+class TestIterJsonArray(TestCase):
+    def test_every_chunk_size(self):
+        values = POSITIONS + [{"name": "Ødegård"}, 12.5, "text", None, [1, 2]]
+        body = orjson.dumps(values)
+        for chunk_size in range(1, len(body) + 1):
+            self.assertEqual(values, list(iter_json_array(chunked(body, chunk_size))), chunk_size)
+
+    def test_whitespace(self):
+        self.assertEqual([{"a": 1}, 2], list(iter_json_array([b' [ {"a": 1} ,\n 2 ] '])))
+
+    def test_empty_array(self):
+        self.assertEqual([], list(iter_json_array([b"[", b"]"])))
+
+    def test_elements_are_yielded_before_the_end(self):
+        elements = iter_json_array(iter([b'[{"a": 1},', b'{"b": 2}']))
+        self.assertEqual({"a": 1}, next(elements))
+
+    def test_incomplete_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"a": 1}, {"b"']))
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"a": 1}']))
+
+
+class TestParseTraccarTime(TestCase):
+    def test_traccar_format(self):
+        self.assertEqual(
+            datetime.datetime(2021, 9, 17, 10, 55, 3, 123000, tzinfo=datetime.timezone.utc),
+            parse_traccar_time("2021-09-17T10:55:03.123+00:00"),
+        )
+
+    def test_offset(self):
+        self.assertEqual(
+            datetime.datetime(2021, 9, 17, 8, 55, 3, tzinfo=datetime.timezone.utc),
+            parse_traccar_time("2021-09-17T10:55:03.000+02:00"),
+        )
+
+    def test_fallback(self):
+        self.assertEqual(
+            datetime.datetime(2021, 9, 17, 10, 55, 3, tzinfo=datetime.timezone.utc),
+            parse_traccar_time("Fri, 17 Sep 2021 10:55:03 +0000"),
+        )
+
+
+class TestPositionFetch(TestCase):
+    def setUp(self):
+        self.traccar = Traccar("http", "traccar:8082", "user", "password")
+        self.session = Mock()
+        patcher = patch.object(Traccar, "session", new_callable=PropertyMock, return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.start_time = datetime.datetime(2021, 9, 17, 10, tzinfo=datetime.timezone.utc)
+        self.finish_time = datetime.datetime(2021, 9, 17, 11, tzinfo=datetime.timezone.utc)
+
+    def test_get_positions(self):
+        self.session.get.return_value = positions_response()
+        self.assertEqual(
+            POSITIONS, self.traccar.get_positions_for_device_id(11942, self.start_time, self.finish_time)
+        )
+
+    def test_get_positions_failure(self):
+        self.session.get.return_value = positions_response(status_code=400)
+        self.assertEqual([], self.traccar.get_positions_for_device_id(11942, self.start_time, self.finish_time))
+
+    def test_iter_positions_parses_times(self):
+        self.session.get.return_value = streamed_positions_response()
+        positions = list(self.traccar.iter_positions_for_device_id(11942, self.start_time, self.finish_time))
+        self.assertEqual([4565767, 4565768], [position["id"] for position in positions])
+        self.assertEqual(
+            datetime.datetime(2021, 9, 17, 10, 55, 4, 500000, tzinfo=datetime.timezone.utc),
+            positions[1]["device_time"],
+        )
+        self.assertEqual(
+            datetime.datetime(2021, 9, 17, 10, 56, 54, tzinfo=datetime.timezone.utc), positions[0]["server_time"]
+        )
+        self.assertTrue(self.session.get.call_args.kwargs["stream"])
+
+    def test_get_positions_for_device_ids(self):
+        self.session.get.side_effect = lambda *args, **kwargs: positions_response()
+        positions = self.traccar.get_positions_for_device_ids([1, 2, 3], self.start_time, self.finish_time)
+        self.assertEqual([1, 2, 3], list(positions.keys()))
+        for device_positions in positions.values():
+            self.assertEqual([4565767, 4565768], [position["id"] for position in device_positions])
+        self.assertEqual(
+            {1, 2, 3}, {call.kwargs["params"]["deviceId"] for call in self.session.get.call_args_list}
+        )
@@ -0,0 +1,49 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Records the duration of the named phases of a process start up, e.g. a calculator, and logs a summary when the
+    start up is completed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.monotonic()
+        self.phases = []  # type: List[Tuple[str, float]]
+        self.completed = False
+
+    def record(self, phase: str, duration: float):
+        self.phases.append((phase, duration))
+        logger.info(f"{self.name}: {phase} took {duration:.3f}s")
+
+    @contextmanager
+    def phase(self, phase: str):
+        """
+        Context manager recording the duration of the enclosed block.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(phase, time.monotonic() - start)
+
+    def complete(self, phase: str):
+        """
+        Record the time from the timer was created until now as the final phase, and log a summary of all phases.
+        Only the first call has any effect.
+        """
+        if self.completed:
+            return
+        self.completed = True
+        total = time.monotonic() - self.start
+        self.record(phase, total)
+        logger.info(f"{self.name}: Start up summary: {self.summary()}")
+
+    def summary(self) -> str:
+        return ", ".join(f"{phase}={duration:.3f}s" for phase, duration in self.phases)
@@ -1,4 +1,7 @@
 import threading
+import time
+from collections import deque
+from typing import Optional
 
 import datetime
 
@@ -8,46 +11,82 @@ class TimedOut(BaseException):
 
 
 class TimedQueue:
+    """
+    First in, first out queue where each item is held back until its release time stamp has passed. An item is never
+    released before the items that were put before it, even if its own release time is earlier.
+
+    Release times are converted to deadlines on the monotonic clock when the item is put, so waiting is not affected by
+    changes to the wall clock.
+    """
+
     def __init__(self):
-        self._ready_event = threading.Event()
-        self._lock = threading.Lock()
-        self._queue = []
+        self._condition = threading.Condition()
+        self._queue = deque()
         self._closed = False
 
     def close(self):
-        self._closed = True
-        self._ready_event.set()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
 
     def put(self, data, stamp: datetime.datetime):
-        with self._lock:
-            self._queue.append((data, stamp))
-            self._ready_event.set()
+        deadline = time.monotonic() + stamp.timestamp() - time.time()
+        with self._condition:
+            self._queue.append((data, deadline))
+            self._condition.notify()
 
     def peek(self):
-        try:
-            return self._queue[0][0]
-        except IndexError:
-            return None
+        with self._condition:
+            try:
+                return self._queue[0][0]
+            except IndexError:
+                return None
 
-    def get(self, timeout: float = None):
-        start = datetime.datetime.now(datetime.timezone.utc)
-        now = datetime.datetime.now(datetime.timezone.utc)
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _wait_for_due_item(self, end: Optional[float]) -> bool:
+        """
+        Wait until the first item in the queue is due. Must be called while holding the condition. Returns False if the
+        queue is closed and empty, raises TimedOut if the end deadline passes first.
+        """
         while True:
-            with self._lock:
-                if len(self._queue) == 0 and self._closed:
-                    return None
-                internal_timeout = max(0, (self._queue[0][1] - now).total_seconds()) if len(self._queue) > 0 else 10
-            if timeout is not None:
-                remaining_external_timeout = timeout-(now-start).total_seconds()
-                internal_timeout = min(remaining_external_timeout, internal_timeout)
-            self._ready_event.wait(timeout=internal_timeout)
-            self._ready_event.clear()
-            now = datetime.datetime.now(datetime.timezone.utc)
-            with self._lock:
-                if len(self._queue) > 0:
-                    data, stamp = self._queue[0]
-                    if stamp < now:
-                        self._queue.pop(0)
-                        return data
-            if timeout is not None and (now - start).total_seconds() >= timeout:
-                raise TimedOut
+            now = time.monotonic()
+            if len(self._queue) > 0:
+                wait_time = self._queue[0][1] - now
+                if wait_time <= 0:
+                    return True
+            elif self._closed:
+                return False
+            else:
+                wait_time = None
+            if end is not None:
+                if now >= end:
+                    raise TimedOut
+                wait_time = end - now if wait_time is None else min(wait_time, end - now)
+            self._condition.wait(timeout=wait_time)
+
+    def get(self, timeout: float = None):
+        """
+        Return the first item in the queue when it is due. Returns None if the queue is closed and empty.
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            if not self._wait_for_due_item(end):
+                return None
+            return self._queue.popleft()[0]
+
+    def get_many(self, max_items: int = None, timeout: float = None) -> list:
+        """
+        Wait until the first item in the queue is due, and return it together with all following items that are also
+        due, up to max_items. Returns an empty list if the queue is closed and empty.
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            if not self._wait_for_due_item(end):
+                return []
+            now = time.monotonic()
+            items = []
+            while len(self._queue) > 0 and self._queue[0][1] <= now and (max_items is None or len(items) < max_items):
+                items.append(self._queue.popleft()[0])
+            return items
@@ -1,15 +1,20 @@
 import datetime
 import json
 import logging
+from decimal import Decimal
 from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 
 import dateutil
-import pickle
+import orjson
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.db.models import Max
 from redis import StrictRedis
 
 from display.calculators.positions_and_gates import Position
+from display.utilities.global_positions_store import GlobalPositionsStore
+from display.utilities.global_traffic_tiles import global_traffic_groups
+from display.utilities.metrics import WEBSOCKET_BROADCAST_TIME
 from display.models import Contestant, ContestTeam, Task, TaskTest, MyUser, Team, ANOMALY
 from display.serialisers import (
     ContestantTrackSerialiser,
@@ -28,7 +33,7 @@ from display.serialisers import (
     ContestantSerialiser,
     ContestantNestedTeamSerialiser,
 )
-from live_tracking_map.settings import REDIS_GLOBAL_POSITIONS_KEY, REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
+from live_tracking_map.settings import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +51,24 @@ class DateTimeEncoder(json.JSONEncoder):
         return encoded_object
 
 
+def _encode_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+def encode_tracking_frame(message_type: str, channel_data: Dict) -> str:
+    """
+    Encode the complete websocket text frame for a tracking map message, {"type": message_type, "data": channel_data}.
+    Date times are encoded as ISO 8601 strings.
+    """
+    return orjson.dumps(
+        {"type": message_type, "data": channel_data},
+        default=_encode_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    ).decode()
+
+
 def generate_contestant_data_block(
     contestant: "Contestant",
     positions: List = None,
@@ -58,6 +81,7 @@ def generate_contestant_data_block(
     gate_times: Dict = None,
     gate_distance_and_estimate: Dict = None,
     danger_level: Dict = None,
+    sequence: int = None,
 ):
     if not hasattr(contestant, "contestanttrack"):
         include_contestant_track = False
@@ -86,115 +110,143 @@ def generate_contestant_data_block(
         data["contestant_track"] = ContestantTrackSerialiser(contestant_track).data
     if latest_time:
         data["progress"] = contestant.calculate_progress(latest_time)
+    if sequence is not None:
+        data["sequence"] = sequence
     return data
 
 
+def get_score_sequence(contestant: "Contestant") -> int:
+    """
+    The score sequence number of a contestant is the primary key of its latest score log entry. Every track annotation
+    belongs to a score log entry, so all annotations and score log entries that the client has not seen can be found
+    from the sequence number it has received.
+    """
+    return contestant.scorelogentry_set.aggregate(sequence=Max("pk"))["sequence"] or 0
+
+
+def generate_score_snapshot_block(contestant: "Contestant") -> Dict:
+    """
+    Data block with all annotations and anomalous score log entries of the contestant, together with the current
+    sequence number.
+    """
+    return generate_contestant_data_block(
+        contestant,
+        annotations=TrackAnnotationSerialiser(contestant.trackannotation_set.all(), many=True).data,
+        log_entries=ScoreLogEntrySerialiser(contestant.scorelogentry_set.filter(type=ANOMALY), many=True).data,
+        include_contestant_track=True,
+        sequence=get_score_sequence(contestant),
+    )
+
+
+def generate_score_delta_block(
+    contestant: "Contestant", since: int, include_contestant_track: bool = False
+) -> Tuple[Dict, int]:
+    """
+    Data block with the annotations and anomalous score log entries that have been created after the sequence number
+    since. The block contains both the sequence number it starts from (previous_sequence) and the new sequence number,
+    so that the client can detect if it has missed a delta and ask for the missing entries. Returns the block and the
+    new sequence number.
+    """
+    log_entries = list(contestant.scorelogentry_set.filter(pk__gt=since))
+    sequence = max([entry.pk for entry in log_entries], default=since)
+    channel_data = generate_contestant_data_block(
+        contestant,
+        annotations=TrackAnnotationSerialiser(
+            contestant.trackannotation_set.filter(score_log_entry_id__gt=since), many=True
+        ).data,
+        log_entries=ScoreLogEntrySerialiser([entry for entry in log_entries if entry.type == ANOMALY], many=True).data,
+        include_contestant_track=include_contestant_track,
+        sequence=sequence,
+    )
+    channel_data["delta"] = True
+    channel_data["previous_sequence"] = since
+    return channel_data, sequence
+
+
 class WebsocketFacade:
     def __init__(self):
         self.channel_layer = get_channel_layer()
         self.redis = StrictRedis(REDIS_HOST, REDIS_PORT)#, password=REDIS_PASSWORD)
+        self.global_positions = GlobalPositionsStore(self.redis)
+
+    def send_tracking_frame(self, group_key: str, message_type: str, channel_data: Dict):
+        """
+        Send a message to all the tracking map clients in the group. The websocket frame is encoded here, once, and
+        the consumers pass it on to each client unchanged.
+        """
+        with WEBSOCKET_BROADCAST_TIME.labels(message_type).time():
+            async_to_sync(self.channel_layer.group_send)(
+                group_key, {"type": "tracking.frame", "frame": encode_tracking_frame(message_type, channel_data)}
+            )
 
     def transmit_initial_load(self, contestant: "Contestant"):
         """Transmitted whenever a web socket connects. Primarily used to fill missing track after network outage"""
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
-        positions = contestant.get_track() if contestant.contestanttrack.calculator_started else []
-        if len(positions) > 0:
-            position_data = PositionSerialiser(positions, many=True).data
+        if not contestant.contestanttrack.calculator_started:
+            return
+        track = contestant.get_track_columns()
+        if len(track) > 0:
             channel_data = generate_contestant_data_block(
                 contestant,
-                positions=position_data,
-                latest_time=positions[-1].time,
-            )
-            async_to_sync(self.channel_layer.group_send)(
-                group_key,
-                {
-                    "type": "tracking.data",
-                    "data": {"type": "position_data", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-                },
+                positions=track.to_position_data(contestant.tracker_device_id),
+                latest_time=track.latest_time,
             )
+            self.send_tracking_frame(group_key, "position_data", channel_data)
 
     def transmit_annotations(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         annotation_data = TrackAnnotationSerialiser(contestant.trackannotation_set.all(), many=True).data
-        channel_data = generate_contestant_data_block(contestant, annotations=annotation_data)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "annotations", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
+        channel_data = generate_contestant_data_block(
+            contestant, annotations=annotation_data, sequence=get_score_sequence(contestant)
         )
+        self.send_tracking_frame(group_key, "annotations", channel_data)
 
     def transmit_score_log_entry(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         # Only push anomalous score logs to the GUI. Everything will be visible as annotations or on the contestant
         # table administration page.
         log_entries = ScoreLogEntrySerialiser(contestant.scorelogentry_set.filter(type=ANOMALY), many=True).data
-        channel_data = generate_contestant_data_block(contestant, log_entries=log_entries)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "score_log", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
+        channel_data = generate_contestant_data_block(
+            contestant, log_entries=log_entries, sequence=get_score_sequence(contestant)
         )
+        self.send_tracking_frame(group_key, "score_log", channel_data)
 
     def transmit_gate_score_entry(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         gate_scores = GateCumulativeScoreSerialiser(contestant.gatecumulativescore_set.all(), many=True).data
         channel_data = generate_contestant_data_block(contestant, gate_scores=gate_scores)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "gate_score", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "gate_score", channel_data)
 
     def transmit_playing_cards(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         playing_cards = PlayingCardSerialiser(contestant.playingcard_set.all(), many=True).data
         channel_data = generate_contestant_data_block(contestant, playing_cards=playing_cards)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "playing_cards", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "playing_cards", channel_data)
 
     def transmit_basic_information(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         channel_data = generate_contestant_data_block(contestant, include_contestant_track=True)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "basic_information", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "basic_information", channel_data)
+
+    def transmit_score_delta(self, contestant: "Contestant", since: int) -> int:
+        """
+        Transmit the annotations and anomalous score log entries created after the sequence number since, together with
+        the contestant track with the current score. Returns the new sequence number.
+        """
+        group_key = "tracking_{}".format(contestant.navigation_task.pk)
+        channel_data, sequence = generate_score_delta_block(contestant, since, include_contestant_track=True)
+        self.send_tracking_frame(group_key, "score_delta", channel_data)
+        return sequence
 
     def transmit_contestant(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         channel_data = ContestantNestedTeamSerialiser(instance=contestant).data
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "contestant", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "contestant", channel_data)
 
     def transmit_delete_contestant(self, contestant: "Contestant"):
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
         channel_data = {"contestant_id": contestant.pk}
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "contestant_delete", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "contestant_delete", channel_data)
 
     def transmit_navigation_task_position_data(self, contestant: "Contestant", positions: List["Position"]):
         if len(positions) == 0:
@@ -209,13 +261,7 @@ class WebsocketFacade:
         # for position in positions:
         #     logger.debug(f"Transmitting position ID {position.position_id} for device ID {position.device_id}")
 
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "position_data", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "position_data", channel_data)
 
     def transmit_seconds_to_crossing_time_and_crossing_estimate(
         self,
@@ -241,13 +287,7 @@ class WebsocketFacade:
             ).data,
         )
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "crossing_time", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "crossing_time", channel_data)
 
     def transmit_danger_estimate_and_accumulated_penalty(
         self, contestant: "Contestant", danger_level: float, accumulated_score: 0
@@ -259,13 +299,7 @@ class WebsocketFacade:
             ).data,
         )
         group_key = "tracking_{}".format(contestant.navigation_task.pk)
-        async_to_sync(self.channel_layer.group_send)(
-            group_key,
-            {
-                "type": "tracking.data",
-                "data": {"type": "danger_level", "data": json.dumps(channel_data, cls=DateTimeEncoder)},
-            },
-        )
+        self.send_tracking_frame(group_key, "danger_level", channel_data)
 
     def transmit_airsports_position_data(
         self,
@@ -290,7 +324,8 @@ class WebsocketFacade:
             "type": "tracking.data",
             "data": s,
         }
-        async_to_sync(self.channel_layer.group_send)("tracking_airsports", container)
+        with WEBSOCKET_BROADCAST_TIME.labels("airsports_position").time():
+            async_to_sync(self.channel_layer.group_send)("tracking_airsports", container)
 
     def transmit_global_position_data(
         self,
@@ -322,14 +357,13 @@ class WebsocketFacade:
             "latitude": float(position_data["latitude"]),
             "longitude": float(position_data["longitude"]),
         }
-        device_id = data["deviceId"]
-        # existing = self.redis.hget(REDIS_GLOBAL_POSITIONS_KEY, device_id)
-        # if existing:
-        #     existing = pickle.loads(existing)
-        #     if existing["time"] >= data["time"]:
-        #         return
-        self.redis.hset(REDIS_GLOBAL_POSITIONS_KEY, key=device_id, value=pickle.dumps(data))
-        async_to_sync(self.channel_layer.group_send)("tracking_global", container)
+        if not self.global_positions.store(
+            data["deviceId"], device_time, container["latitude"], container["longitude"], s
+        ):
+            return
+        with WEBSOCKET_BROADCAST_TIME.labels("global_position").time():
+            for group in global_traffic_groups(container["latitude"], container["longitude"]):
+                async_to_sync(self.channel_layer.group_send)(group, container)
 
     async def transmit_external_global_position_data(
         self,
@@ -365,13 +399,10 @@ class WebsocketFacade:
         }
         s = json.dumps(data, cls=DateTimeEncoder)
         container = {"type": "tracking.data", "data": s, "latitude": latitude, "longitude": longitude}
-        existing = self.redis.hget(REDIS_GLOBAL_POSITIONS_KEY, device_id)
-        if existing:
-            existing = pickle.loads(existing)
-            if existing["time"] >= data["time"]:
-                return
-        self.redis.hset(REDIS_GLOBAL_POSITIONS_KEY, key=device_id, value=pickle.dumps(data))
-        await self.channel_layer.group_send("tracking_global", container)
+        if not self.global_positions.store(device_id, time_stamp, latitude, longitude, s):
+            return
+        for group in global_traffic_groups(latitude, longitude):
+            await self.channel_layer.group_send(group, container)
 
     def contest_results_channel_name(self, contest: "Contest") -> str:
         return "contestresults_{}".format(contest.pk)